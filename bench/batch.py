@@ -0,0 +1,68 @@
+"""
+Throughput of the batch API versus a plain Python loop.
+
+Usage::
+
+    $ python bench/batch.py [nbuffers] [buffer_size] [nworkers]
+
+The buffers hold a noisy integer ramp, which compresses moderately well.
+"""
+
+from __future__ import print_function
+
+import array
+import random
+import sys
+import time
+
+import pycblosc as cblosc
+
+
+def make_buffers(nbuffers, size):
+    rnd = random.Random(1)
+    nitems = size // 4
+    return [array.array('i', (i + rnd.randint(0, 100) for i in range(nitems)))
+            for j in range(nbuffers)]
+
+
+def timeit(func, nbytes, nrep=3):
+    best = min(_timed(func) for i in range(nrep))
+    return best, nbytes / best / 2**20
+
+
+def _timed(func):
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def main(nbuffers=10000, size=16 * 1024, nworkers=None):
+    buffers = make_buffers(nbuffers, size)
+    nbytes = nbuffers * size
+    codec = cblosc.Codec(clevel=5, shuffle=cblosc.SHUFFLE, compressor="lz4")
+    cbuffers = cblosc.compress_many(buffers, codec=codec)
+
+    cases = [
+        ("compress: loop", lambda: [cblosc.compress_bytes(buf, codec=codec) for buf in buffers]),
+        ("compress: compress_many", lambda: cblosc.compress_many(buffers, codec=codec,
+                                                                 nworkers=nworkers)),
+        ("compress: contiguous", lambda: cblosc.compress_many(buffers, codec=codec,
+                                                              nworkers=nworkers,
+                                                              contiguous=True)),
+        ("decompress: loop", lambda: [cblosc.decompress_bytes(cbuf, codec=codec)
+                                      for cbuf in cbuffers]),
+        ("decompress: decompress_many", lambda: cblosc.decompress_many(cbuffers, codec=codec,
+                                                                       nworkers=nworkers)),
+        ("decompress: contiguous", lambda: cblosc.decompress_many(cbuffers, codec=codec,
+                                                                  nworkers=nworkers,
+                                                                  contiguous=True)),
+    ]
+    print("%d buffers of %d KB, nworkers=%s" % (nbuffers, size // 1024, nworkers or "auto"))
+    for name, func in cases:
+        elapsed, speed = timeit(func, nbytes)
+        print("%-30s %8.1f ms %10.1f MB/s" % (name, elapsed * 1e3, speed))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,68 @@
+"""
+Microbenchmark for the per-call overhead of the CFFI ABI and API modes.
+
+Usage::
+
+    $ python pycblosc/_build_ffi.py      # build the API-mode extension
+    $ python bench/ffi_overhead.py [niter]
+
+For every mode available, this reports the time per call of a trivial C
+function (`blosc_get_nthreads()`) and of compressing/decompressing small
+messages of typical sizes, so that the FFI dispatch cost can be compared
+with the actual compression work.
+"""
+
+from __future__ import print_function
+
+import array
+import sys
+import timeit
+
+from pycblosc import pycblosc
+
+
+def load_modes():
+    modes = [("abi", pycblosc._dlopen_abi())]
+    try:
+        from pycblosc import _cblosc
+    except ImportError:
+        print("API-mode extension not built; only measuring ABI mode",
+              file=sys.stderr)
+    else:
+        modes.append(("api", (_cblosc.ffi, _cblosc.lib)))
+    return modes
+
+
+def bench_mode(ffi, C, niter):
+    results = [("get_nthreads()", timeit.timeit(C.blosc_get_nthreads, number=niter))]
+    for size in (4 * 1024, 64 * 1024):
+        src = array.array('i', range(size // 4))
+        dest = bytearray(size + pycblosc.MAX_OVERHEAD)
+        out = bytearray(size)
+        psrc = ffi.from_buffer(src)
+        pdest = ffi.from_buffer(dest)
+        pout = ffi.from_buffer(out)
+
+        def comp():
+            return C.blosc_compress_ctx(5, 1, 4, size, psrc, pdest, len(dest),
+                                        b"blosclz", 0, 1)
+
+        def decomp():
+            return C.blosc_decompress_ctx(pdest, pout, size, 1)
+
+        comp()
+        label = "%dKB" % (size // 1024)
+        results.append(("compress_ctx(%s)" % label, timeit.timeit(comp, number=niter)))
+        results.append(("decompress_ctx(%s)" % label, timeit.timeit(decomp, number=niter)))
+    return results
+
+
+def main(niter=100000):
+    print("%-24s %12s %12s" % ("call", "mode", "ns/call"))
+    for mode, (ffi, C) in load_modes():
+        for name, t in bench_mode(ffi, C, niter):
+            print("%-24s %12s %12.1f" % (name, mode, t / niter * 1e9))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
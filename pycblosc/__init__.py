@@ -2,28 +2,92 @@
 Simple CFFI wrapper for the C-Blosc library.
 """
 
-import os
-import inspect
-from sys import platform as _platform
-from pkg_resources import get_distribution, DistributionNotFound
-from distutils.version import LooseVersion
+from .pycblosc import *
+from .highlevel import compress_bytes, decompress_bytes
+from .pool import BufferPool
+from .batch import compress_many, decompress_many, decompress_into
+from .bloscfile import BloscFile, MappedBloscFile
+from .tuner import TuneResult, tune, clear_tune_cache
+from .blocks import BlockCache, getitem_many, take
+from .header import ChunkHeader, scan_headers
+from .superchunk import SuperChunk
+from .packer import MessagePacker
+from .stream import compress_stream, decompress_stream
+from .cache import CompressedCache
+from . import instrument
 
-# Linux needs to add the path for the module in LD_LIBRARY_PATH
-if _platform == "linux" or _platform == "linux2":
-    os.environ['LD_LIBRARY_PATH'] = "{}:{}".format(os.environ['LD_LIBRARY_PATH'],
-                                                   os.path.dirname(os.path.abspath(inspect.stack()[0][1])))
 
-from .pycblosc import *
+def _version_tuple(version):
+    """Convert a version string like '1.14.0' or '1.21.6.dev' into a tuple of ints."""
+    numbers = []
+    for part in version.split(".")[:3]:
+        digits = ""
+        for char in part:
+            if not char.isdigit():
+                break
+            digits += char
+        numbers.append(int(digits or 0))
+    return tuple(numbers)
+
 
 # Check that we have a reasonable recent C-Blosc library installed
-min_blosc_version = LooseVersion("1.14.0")
-blosc_version = LooseVersion(get_version_string())
+min_blosc_version = (1, 14, 0)
+blosc_version = _version_tuple(get_version_string())
 if blosc_version < min_blosc_version:
-    raise ValueError("Underlying C-Blosc should be %s or higher" % min_blosc_version)
-
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    # package is not installed
-    from setuptools_scm import get_version as scm_get_version
-    __version__ = scm_get_version()
+    raise ValueError("Underlying C-Blosc should be %s or higher"
+                     % ".".join(str(n) for n in min_blosc_version))
+
+
+def _get_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        from importlib_metadata import version, PackageNotFoundError
+    try:
+        return version(__name__)
+    except PackageNotFoundError:
+        # package is not installed
+        from setuptools_scm import get_version as scm_get_version
+        return scm_get_version(root="..", relative_to=__file__)
+
+
+# Names from submodules that are slow to import (or that need optional
+# dependencies), imported on first access
+_lazy_attrs = {
+    "AsyncCodec": "aio",
+    "compress_async": "aio",
+    "decompress_async": "aio",
+    "FramedReader": "aio",
+    "FramedWriter": "aio",
+    "parallel_compress": "parallel",
+    "pack_array": "ndarray",
+    "unpack_array": "ndarray",
+    "array_copy_stats": "ndarray",
+    "Filter": "filters",
+    "Delta": "filters",
+    "Xor": "filters",
+    "Truncate": "filters",
+    "register_filter": "filters",
+    "compress_filtered": "filters",
+    "decompress_filtered": "filters",
+    "dumps": "serialize",
+    "loads": "serialize",
+}
+
+
+def __getattr__(name):
+    # Resolving the version may be slow, so do it only on demand
+    if name == "__version__":
+        global __version__
+        __version__ = _get_version()
+        return __version__
+    if name in _lazy_attrs:
+        from importlib import import_module
+        value = getattr(import_module("." + _lazy_attrs[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attrs))
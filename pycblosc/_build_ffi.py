@@ -0,0 +1,113 @@
+"""
+CFFI build script for the compiled (API mode) `pycblosc._cblosc` extension.
+
+This is used from `setup.py` via `cffi_modules`, but it can also be run
+directly from the root of the source tree for an in-place build::
+
+    $ python pycblosc/_build_ffi.py
+
+The C-Blosc headers and library are looked up in the system paths, in
+`$BLOSC_DIR/include` and `$BLOSC_DIR/lib`, and in the package directory
+itself (where `setup.py install` drops the library fetched via conan).
+
+When the extension is not available, `pycblosc` falls back to ABI mode
+using the `CDEF` declarations below.
+"""
+
+import os
+import sys
+
+
+CDEF = """
+    void blosc_init(void);
+
+    void blosc_destroy(void);
+
+    int blosc_compress(int clevel, int doshuffle, size_t typesize, size_t nbytes,
+                       const void* src, void* dest, size_t destsize);
+
+    int blosc_compress_ctx(int clevel, int doshuffle, size_t typesize, size_t nbytes,
+                           const void* src, void* dest, size_t destsize,
+                           const char* compressor, size_t blocksize,
+                           int numinternalthreads);
+
+    int blosc_decompress(const void* src, void* dest, size_t destsize);
+
+    int blosc_decompress_ctx(const void* src, void* dest, size_t destsize,
+                             int numinternalthreads);
+
+    int blosc_getitem(const void* src, int start, int nitems, void* dest);
+
+    int blosc_get_nthreads(void);
+
+    int blosc_set_nthreads(int nthreads);
+
+    const char* blosc_get_compressor(void);
+
+    int blosc_set_compressor(const char* compname);
+
+    int blosc_compcode_to_compname(int compcode, const char** compname);
+
+    int blosc_compname_to_compcode(const char* compname);
+
+    const char* blosc_list_compressors(void);
+
+    const char* blosc_get_version_string(void);
+
+    int blosc_get_complib_info(const char* compname, char** complib, char** version);
+
+    int blosc_free_resources(void);
+
+    void blosc_cbuffer_sizes(const void* cbuffer, size_t* nbytes, size_t* cbytes,
+                             size_t* blocksize);
+
+    void blosc_cbuffer_metainfo(const void* cbuffer, size_t* typesize, int* flags);
+
+    void blosc_cbuffer_versions(const void* cbuffer, int* version, int* versionlz);
+
+    const char* blosc_cbuffer_complib(const void* cbuffer);
+
+    int blosc_get_blocksize(void);
+
+    void blosc_set_blocksize(size_t blocksize);
+
+    void blosc_set_splitmode(int splitmode);
+    """
+
+
+def build_ffi():
+    """
+    Return a `cffi.FFI` builder for the `pycblosc._cblosc` extension.
+    """
+    from cffi import FFI
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    include_dirs = [os.path.join(here, "include")]
+    library_dirs = [here]
+    blosc_dir = os.environ.get("BLOSC_DIR")
+    if blosc_dir:
+        include_dirs.append(os.path.join(blosc_dir, "include"))
+        library_dirs.append(os.path.join(blosc_dir, "lib"))
+
+    extra_link_args = []
+    if sys.platform.startswith("linux"):
+        # Find a bundled libblosc next to the extension at run time
+        extra_link_args.append("-Wl,-rpath,$ORIGIN")
+    elif sys.platform == "darwin":
+        extra_link_args.append("-Wl,-rpath,@loader_path")
+
+    ffibuilder = FFI()
+    ffibuilder.cdef(CDEF)
+    ffibuilder.set_source(
+        "pycblosc._cblosc",
+        "#include <blosc.h>",
+        libraries=["blosc"],
+        include_dirs=include_dirs,
+        library_dirs=library_dirs,
+        extra_link_args=extra_link_args,
+    )
+    return ffibuilder
+
+
+if __name__ == "__main__":
+    build_ffi().compile(verbose=True)
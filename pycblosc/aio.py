@@ -0,0 +1,195 @@
+"""
+asyncio support: compression off the event loop and framed streams.
+
+Compressing large buffers inside the event loop stalls every other task, so
+the coroutines here run the C calls in a thread pool (where the GIL is
+released).  Every call goes through a `Codec`, so concurrent tasks never race
+on the global settings of C-Blosc, and the number of calls in flight is
+bounded so that producers faster than the pool are paused (backpressure).
+"""
+
+import asyncio
+import functools
+import os
+import weakref
+
+from .pycblosc import MIN_HEADER_LENGTH, SHUFFLE, cbuffer_sizes
+from .highlevel import compress_bytes, decompress_bytes
+from .batch import _default_codec, _get_executor
+
+
+class AsyncCodec(object):
+    """
+    Run compression and decompression in an executor, with backpressure.
+
+    Args:
+        codec (Codec): The default codec for the calls.  By default, one
+            with clevel 5, SHUFFLE and the global compressor and blocksize.
+        executor (concurrent.futures.Executor): Where the calls run.  By
+            default, the thread pool shared with `compress_many()`.
+        max_pending (int): The maximum number of calls in flight.  Further
+            calls wait for a slot before being submitted.  Defaults to twice
+            the number of cores.
+    """
+
+    def __init__(self, codec=None, executor=None, max_pending=None):
+        self.codec = codec if codec is not None else _default_codec(5, SHUFFLE)
+        self.executor = executor
+        self.max_pending = max_pending or 2 * (os.cpu_count() or 1)
+        # asyncio primitives may be bound to a loop, so keep one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self, loop):
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_pending)
+        return semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` in the executor as soon as a slot is free.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor if self.executor is not None else _get_executor()
+        async with self._semaphore(loop):
+            return await loop.run_in_executor(
+                executor, functools.partial(func, *args, **kwargs))
+
+    async def compress(self, src, typesize=None, codec=None, out=None):
+        """
+        Coroutine version of `compress_bytes()`, using `codec` or the default
+        codec of this object.
+        """
+        codec = codec if codec is not None else self.codec
+        return await self.run(compress_bytes, src, typesize=typesize, codec=codec,
+                              out=out)
+
+    async def decompress(self, src, codec=None, out=None):
+        """
+        Coroutine version of `decompress_bytes()`, using `codec` or the default
+        codec of this object.
+        """
+        codec = codec if codec is not None else self.codec
+        return await self.run(decompress_bytes, src, codec=codec, out=out)
+
+
+_default_async = None
+
+
+def _get_default_async():
+    global _default_async
+    if _default_async is None:
+        _default_async = AsyncCodec()
+    return _default_async
+
+
+async def compress_async(src, clevel=5, shuffle=SHUFFLE, typesize=None, codec=None,
+                         out=None):
+    """
+    Compress `src` without blocking the event loop.
+
+    This takes the same arguments as `compress_bytes()`.  When no `codec` is
+    given, one is created from `clevel`, `shuffle` and the global compressor
+    and blocksize, so the call never depends on global state at run time.
+    """
+    if codec is None:
+        codec = _default_codec(clevel, shuffle)
+    return await _get_default_async().compress(src, typesize, codec, out)
+
+
+async def decompress_async(src, codec=None, out=None):
+    """
+    Decompress `src` without blocking the event loop.
+
+    This takes the same arguments as `decompress_bytes()`.
+    """
+    return await _get_default_async().decompress(src, codec, out)
+
+
+class FramedWriter(object):
+    """
+    Write compressed frames to an `asyncio.StreamWriter`.
+
+    Every frame is a blosc chunk, whose header already carries its length,
+    so no extra framing bytes are needed.  Compression runs off the loop.
+
+    Args:
+        writer (asyncio.StreamWriter): The underlying stream.
+        codec (AsyncCodec): The codec used for compressing.  Defaults to
+            the shared one.
+        typesize (int): The typesize for the frames.  By default, it is the
+            itemsize of each buffer written.
+    """
+
+    def __init__(self, writer, codec=None, typesize=None):
+        self.writer = writer
+        self.codec = codec if codec is not None else _get_default_async()
+        self.typesize = typesize
+
+    async def write(self, data):
+        """
+        Compress `data` and send it as one frame, waiting for the stream to drain.
+        """
+        frame = await self.codec.compress(data, self.typesize)
+        self.writer.write(frame)
+        await self.writer.drain()
+
+    async def close(self):
+        """Close the underlying stream."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class FramedReader(object):
+    """
+    Read compressed frames from an `asyncio.StreamReader`.
+
+    This is the counterpart of `FramedWriter`.  Decompression runs off the
+    loop.  It can be used as an async iterator over the decompressed frames.
+
+    Args:
+        reader (asyncio.StreamReader): The underlying stream.
+        codec (AsyncCodec): The codec used for decompressing.  Defaults to
+            the shared one.
+        max_frame_size (int): The maximum size (compressed or not) accepted
+            for a frame, as a protection against corrupted or hostile peers.
+    """
+
+    def __init__(self, reader, codec=None, max_frame_size=2**30):
+        self.reader = reader
+        self.codec = codec if codec is not None else _get_default_async()
+        self.max_frame_size = max_frame_size
+
+    async def read(self):
+        """
+        Read and decompress the next frame.
+
+        Returns:
+            bytearray: The decompressed frame, or None at the end of the stream.
+
+        Raises:
+            ValueError: If the frame header is not valid or exceeds
+                `max_frame_size`.
+            asyncio.IncompleteReadError: If the stream ends inside a frame.
+        """
+        try:
+            header = await self.reader.readexactly(MIN_HEADER_LENGTH)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        nbytes, cbytes, _ = cbuffer_sizes(header)
+        if cbytes < MIN_HEADER_LENGTH or max(nbytes, cbytes) > self.max_frame_size:
+            raise ValueError("Invalid frame header (nbytes=%d, cbytes=%d)"
+                             % (nbytes, cbytes))
+        frame = header + await self.reader.readexactly(cbytes - MIN_HEADER_LENGTH)
+        return await self.codec.decompress(frame)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.read()
+        if data is None:
+            raise StopAsyncIteration
+        return data
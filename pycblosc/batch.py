@@ -0,0 +1,283 @@
+"""
+Compress or decompress many independent buffers in one call.
+
+The work is spread over a pool of worker threads.  Every call goes through
+the context (`_ctx`) entry points of C-Blosc, so the threads do not contend
+on the global lock and run in parallel with the GIL released.
+"""
+
+import functools
+import os
+import threading
+from array import array
+
+from . import pycblosc as _lowlevel
+from .pycblosc import (MAX_OVERHEAD, SHUFFLE, C, Codec, cbuffer_sizes,
+                       ffi, get_blocksize, get_compressor)
+from .highlevel import _byte_view, _check_result
+from .header import ChunkHeader
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the thread pool shared by the batch functions, creating it if needed."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Imported here, as it is comparatively slow to import
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                           thread_name_prefix="pycblosc")
+        return _executor
+
+
+def _run_batches(func, n, nworkers):
+    """Call `func(start, stop)` over `nworkers` contiguous slices of range(n)."""
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    nbatches = max(min(nworkers, n), 1)
+    if nbatches == 1:
+        func(0, n)
+        return
+    executor = _get_executor()
+    bounds = [n * i // nbatches for i in range(nbatches + 1)]
+    futures = [executor.submit(func, bounds[i], bounds[i + 1])
+               for i in range(nbatches)]
+    for future in futures:
+        future.result()
+
+
+def _default_codec(clevel, shuffle):
+    return Codec(clevel, shuffle, get_compressor(), get_blocksize(), 1)
+
+
+def _offsets(sizes):
+    """Return the n + 1 offsets of buffers with `sizes` laid out back to back."""
+    offsets = array('Q', [0]) * (len(sizes) + 1)
+    pos = 0
+    for i, size in enumerate(sizes):
+        pos += size
+        offsets[i + 1] = pos
+    return offsets
+
+
+def compress_many(buffers, clevel=5, shuffle=SHUFFLE, typesize=None, codec=None,
+                  nworkers=None, contiguous=False, out=None):
+    """
+    Compress many independent buffers using a pool of threads.
+
+    Args:
+        buffers (sequence): The source buffers.
+            Each one can be any Python object that supports the buffer protocol.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        typesize (int): The size of the atomic type in the buffers.  By
+            default, it is the `itemsize` of a memoryview on each of them.
+        codec (Codec): If given, compress with this codec (and its `clevel`
+            and `shuffle`).  Else, the global compressor and blocksize are
+            used.  The number of internal threads of the codec should
+            normally be 1.
+        nworkers (int): The number of worker threads.  Defaults to the
+            number of cores.
+        contiguous (bool): Whether to put all the compressed buffers back to
+            back in a single buffer.
+        out (object): An optional buffer for the contiguous output.  It must
+            have room for the sum of `nbytes` + MAX_OVERHEAD of every buffer.
+            Implies `contiguous`.
+
+    Returns:
+        list or tuple: A list of bytearrays with the compressed data in the
+        same order as `buffers`.  In contiguous mode, a tuple (`data`,
+        `offsets`) is returned instead, where `data` is a bytearray (or a
+        memoryview on `out`) and `offsets` is an array of n + 1 positions, so
+        that the i-th compressed buffer is ``data[offsets[i]:offsets[i+1]]``.
+
+    Raises:
+        ValueError: If `out` is too small.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    if codec is None:
+        codec = _default_codec(clevel, shuffle)
+    views = [memoryview(buf) for buf in buffers]
+    n = len(views)
+    cbytes = [0] * n
+    contiguous = contiguous or out is not None
+
+    if contiguous:
+        # Every buffer gets a worst-case slot first, and the result is
+        # compacted afterwards
+        slots = _offsets([view.nbytes + MAX_OVERHEAD for view in views])
+        buf = bytearray(slots[-1]) if out is None else out
+        dest = _byte_view(buf)
+        if len(dest) < slots[-1]:
+            raise ValueError("`out` is too small for the compressed data "
+                             "(%d < %d bytes)" % (len(dest), slots[-1]))
+        outputs = [dest[slots[i]:slots[i + 1]] for i in range(n)]
+    else:
+        outputs = [None] * n
+
+    def work(start, stop):
+        for i in range(start, stop):
+            view = views[i]
+            size = typesize if typesize is not None else view.itemsize
+            dest_i = outputs[i]
+            if dest_i is None:
+                # Allocate and shrink right away, so that memory stays hot
+                dest_i = outputs[i] = bytearray(view.nbytes + MAX_OVERHEAD)
+                cbytes[i] = codec.compress(size, view.nbytes, view, dest_i, len(dest_i))
+                if cbytes[i] > 0:
+                    del dest_i[cbytes[i]:]
+            else:
+                cbytes[i] = codec.compress(size, view.nbytes, view, dest_i, len(dest_i))
+
+    _run_batches(work, n, nworkers)
+    for code in cbytes:
+        _check_result(code, "compressing")
+
+    if not contiguous:
+        return outputs
+
+    offsets = _offsets(cbytes)
+    for view in outputs:
+        view.release()
+    with ffi.from_buffer(dest) as pdest:
+        for i in range(1, n):
+            if offsets[i] != slots[i]:
+                ffi.memmove(pdest + offsets[i], pdest + slots[i], cbytes[i])
+    if out is None:
+        dest.release()
+        del buf[offsets[-1]:]
+        return buf, offsets
+    return dest[:offsets[-1]], offsets
+
+
+def decompress_many(cbuffers, codec=None, nworkers=None, contiguous=False, out=None):
+    """
+    Decompress many independent compressed buffers using a pool of threads.
+
+    Args:
+        cbuffers (sequence): The buffers containing compressed data.
+            Each one can be any Python object that supports the buffer protocol.
+        codec (Codec): If given, decompress with the number of threads of this
+            codec (which should normally be 1).
+        nworkers (int): The number of worker threads.  Defaults to the
+            number of cores.
+        contiguous (bool): Whether to put all the decompressed buffers back to
+            back in a single buffer.
+        out (object): An optional buffer for the contiguous output.  It must
+            have room for all the decompressed data.  Implies `contiguous`.
+
+    Returns:
+        list or tuple: A list of bytearrays with the decompressed data in the
+        same order as `cbuffers`.  In contiguous mode, a tuple (`data`,
+        `offsets`) is returned instead, where `data` is a bytearray (or a
+        memoryview on `out`) and `offsets` is an array of n + 1 positions, so
+        that the i-th decompressed buffer is ``data[offsets[i]:offsets[i+1]]``.
+
+    Raises:
+        ValueError: If `out` is too small or some buffer is not valid.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    if codec is None:
+        codec = Codec(nthreads=1)
+    n = len(cbuffers)
+    sizes = [cbuffer_sizes(cbuf)[0] for cbuf in cbuffers]
+    dbytes = [0] * n
+    contiguous = contiguous or out is not None
+
+    if contiguous:
+        offsets = _offsets(sizes)
+        buf = bytearray(offsets[-1]) if out is None else out
+        dest = _byte_view(buf)
+        if len(dest) < offsets[-1]:
+            raise ValueError("`out` is too small for the decompressed data "
+                             "(%d < %d bytes)" % (len(dest), offsets[-1]))
+        outputs = [dest[offsets[i]:offsets[i + 1]] for i in range(n)]
+    else:
+        outputs = [None] * n
+
+    def work(start, stop):
+        for i in range(start, stop):
+            if outputs[i] is None:
+                outputs[i] = bytearray(sizes[i])
+            dbytes[i] = codec.decompress(cbuffers[i], outputs[i], sizes[i])
+
+    _run_batches(work, n, nworkers)
+    for i in range(n):
+        _check_result(dbytes[i], "decompressing")
+        if dbytes[i] != sizes[i]:
+            raise ValueError("Buffer %d is not a valid compressed buffer" % i)
+
+    if not contiguous:
+        return outputs
+    for view in outputs:
+        view.release()
+    if out is None:
+        dest.release()
+        return buf, offsets
+    return dest[:offsets[-1]], offsets
+
+
+def decompress_into(chunks, out, codec=None, nworkers=None):
+    """
+    Decompress many chunks back to back into `out` using a pool of threads.
+
+    This is meant for rebuilding a large buffer (e.g. a NumPy array) from its
+    compressed pieces.  The offset of every chunk in `out` is computed from
+    the chunk headers up front, and every chunk is decompressed straight into
+    its slot, with no intermediate buffers (nor slices of `out`).
+
+    Args:
+        chunks (sequence): The buffers containing compressed data.
+            Each one can be any Python object that supports the buffer protocol.
+        out (object): The destination buffer.  It must have room for all the
+            decompressed data.
+        codec (Codec): If given, decompress with the number of threads of this
+            codec (which should normally be 1).
+        nworkers (int): The number of worker threads.  Defaults to the
+            number of cores.
+
+    Returns:
+        array: The n + 1 offsets of the decompressed chunks in `out`.
+
+    Raises:
+        ValueError: If `out` is too small or some chunk is not valid.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    nthreads = codec.nthreads if codec is not None else 1
+    n = len(chunks)
+    srcs = [None] * n
+    sizes = [0] * n
+    for i, chunk in enumerate(chunks):
+        srcs[i] = src = ffi.from_buffer(chunk)
+        header = ChunkHeader(chunk)
+        if header.cbytes > len(src):
+            raise ValueError("Chunk %d is truncated (%d < %d bytes)"
+                             % (i, len(src), header.cbytes))
+        sizes[i] = header.nbytes
+    offsets = _offsets(sizes)
+    dest = _byte_view(out)
+    if len(dest) < offsets[-1]:
+        raise ValueError("`out` is too small for the decompressed data "
+                         "(%d < %d bytes)" % (len(dest), offsets[-1]))
+    dbytes = [0] * n
+
+    def work(start, stop):
+        decompress_ctx = C.blosc_decompress_ctx
+        if _lowlevel._observer is not None:
+            decompress_ctx = functools.partial(_lowlevel._observed, "decompress", None,
+                                               decompress_ctx)
+        for i in range(start, stop):
+            dbytes[i] = decompress_ctx(srcs[i], pdest + offsets[i], sizes[i], nthreads)
+
+    with ffi.from_buffer(dest) as pdest:
+        _run_batches(work, n, nworkers)
+    for i in range(n):
+        _check_result(dbytes[i], "decompressing")
+        if dbytes[i] != sizes[i]:
+            raise ValueError("Chunk %d is not a valid compressed buffer" % i)
+    return offsets
@@ -0,0 +1,315 @@
+"""
+Benchmark suite for PyCBlosc and the underlying C-Blosc library.
+
+Run it with::
+
+    $ python -m pycblosc.bench -o results.json
+
+This measures, for every combination of compressor, shuffle filter, typesize,
+number of threads and data pattern, the compression ratio, compression and
+decompression speeds (MB/s) and latency percentiles, plus the fixed per-call
+overhead of the FFI layer.  Results are printed and optionally written as
+JSON.  Two JSON files can be compared to flag regressions (e.g. when
+qualifying a new libblosc build)::
+
+    $ python -m pycblosc.bench --compare old.json new.json --threshold 0.1
+
+which exits with status 1 if any case got slower (or compresses worse) by
+more than the threshold.
+"""
+
+import argparse
+import array
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from . import pycblosc
+from .pycblosc import (BITSHUFFLE, MAX_OVERHEAD, NOSHUFFLE, SHUFFLE, Codec,
+                       get_version_string, list_compressors)
+
+
+PATTERNS = ("arange", "random", "sparse", "float_noise")
+SHUFFLE_NAMES = {NOSHUFFLE: "noshuffle", SHUFFLE: "shuffle", BITSHUFFLE: "bitshuffle"}
+_INT_CODES = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+def make_data(pattern, nbytes, typesize, seed=0):
+    """
+    Return `nbytes` of data following `pattern`, made of `typesize` items.
+
+    Patterns are: "arange" (a ramp of integers), "random" (uniformly random
+    bytes), "sparse" (mostly zeros with a few random values) and
+    "float_noise" (a smooth signal plus gaussian noise, as floats for
+    typesizes 4 and 8).
+    """
+    rnd = random.Random(seed)
+    nitems = nbytes // typesize
+    if pattern == "random":
+        return bytes(bytearray(rnd.getrandbits(8) for i in range(nbytes)))
+    if pattern == "float_noise" and typesize in (4, 8):
+        code = 'f' if typesize == 4 else 'd'
+        return array.array(code, (i * 1e-3 + rnd.gauss(0, 1e-2)
+                                  for i in range(nitems))).tobytes()
+    code = _INT_CODES.get(typesize, 'B')
+    maxval = 2 ** (8 * array.array(code).itemsize) - 1
+    if pattern == "arange":
+        data = array.array(code, (i & maxval for i in range(nitems)))
+    elif pattern == "sparse":
+        data = array.array(code, [0]) * nitems
+        for i in range(0, nitems, 97):
+            data[i] = rnd.randint(0, maxval)
+    elif pattern == "float_noise":
+        data = array.array(code, (int(i + rnd.gauss(0, 4)) & maxval for i in range(nitems)))
+    else:
+        raise ValueError("Unknown pattern: %r" % pattern)
+    return data.tobytes()
+
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    n = len(timings)
+
+    def pct(p):
+        return timings[min(int(p / 100. * n), n - 1)] * 1e6
+
+    return {"p50": pct(50), "p90": pct(90), "p99": pct(99)}
+
+
+def bench_case(data, compressor, shuffle, typesize, nthreads, repeats):
+    """
+    Benchmark one combination of settings on `data`.
+
+    Returns:
+        dict: `ratio`, `cspeed` and `dspeed` (MB/s, from the median time),
+        and `clatency`/`dlatency` percentiles in microseconds.
+    """
+    codec = Codec(5, shuffle, compressor, 0, nthreads)
+    nbytes = len(data)
+    dest = bytearray(nbytes + MAX_OVERHEAD)
+    out = bytearray(nbytes)
+    ctimes = []
+    dtimes = []
+    cbytes = 0
+    for i in range(repeats):
+        t0 = time.perf_counter()
+        cbytes = codec.compress(typesize, nbytes, data, dest, len(dest))
+        t1 = time.perf_counter()
+        codec.decompress(dest, out, nbytes)
+        t2 = time.perf_counter()
+        ctimes.append(t1 - t0)
+        dtimes.append(t2 - t1)
+    if out != data:
+        raise RuntimeError("Round trip failed for %s/%s" % (compressor, SHUFFLE_NAMES[shuffle]))
+    mbytes = nbytes / 2.**20
+    return {
+        "ratio": nbytes / float(cbytes),
+        "cspeed": mbytes / max(sorted(ctimes)[len(ctimes) // 2], 1e-9),
+        "dspeed": mbytes / max(sorted(dtimes)[len(dtimes) // 2], 1e-9),
+        "clatency": _percentiles(ctimes),
+        "dlatency": _percentiles(dtimes),
+    }
+
+
+def bench_ffi(niter=100000):
+    """
+    Measure the fixed per-call overhead of the FFI layer.
+
+    Returns:
+        dict: Nanoseconds per call of a trivial C function
+        (`blosc_get_nthreads()`) and of the `compress()` and `decompress()`
+        wrappers on a tiny (16 bytes) buffer.
+    """
+    C = pycblosc.C
+    src = bytes(16)
+    dest = bytearray(16 + MAX_OVERHEAD)
+    out = bytearray(16)
+    pycblosc.compress(5, SHUFFLE, 1, 16, src, dest, len(dest))
+
+    def timeit(func, *args):
+        t0 = time.perf_counter()
+        for i in range(niter):
+            func(*args)
+        return (time.perf_counter() - t0) / niter * 1e9
+
+    return {
+        "mode": pycblosc.FFI_MODE,
+        "call_ns": timeit(C.blosc_get_nthreads),
+        "compress_ns": timeit(pycblosc.compress, 5, SHUFFLE, 1, 16, src, dest, len(dest)),
+        "decompress_ns": timeit(pycblosc.decompress, dest, out, 16),
+    }
+
+
+def run(nbytes=2**20, repeats=5, compressors=None, shuffles=None, typesizes=(1, 4, 8),
+        threads=None, patterns=PATTERNS, ffi_iterations=100000, verbose=False):
+    """
+    Run the benchmark suite.
+
+    Args:
+        nbytes (int): The size of the data for every case.
+        repeats (int): The number of times every case is run.
+        compressors (sequence): The compressors to benchmark.  Defaults to
+            all the ones in this build.
+        shuffles (sequence): The shuffle filters.  Defaults to all.
+        typesizes (sequence): The typesizes.
+        threads (sequence): The numbers of internal threads.  Defaults to 1
+            and the number of cores.
+        patterns (sequence): The data patterns (see `make_data()`).
+        ffi_iterations (int): The iterations for measuring the FFI overhead.
+        verbose (bool): Whether to print the results as they are obtained.
+
+    Returns:
+        dict: With `meta` (info on the environment), `ffi` (see
+        `bench_ffi()`) and `results` (a list with the settings and the
+        output of `bench_case()` for every case).
+    """
+    if compressors is None:
+        compressors = list_compressors()
+        if not isinstance(compressors, str):
+            compressors = compressors.decode()
+        compressors = compressors.split(",")
+    if shuffles is None:
+        shuffles = (NOSHUFFLE, SHUFFLE, BITSHUFFLE)
+    if threads is None:
+        threads = sorted(set((1, os.cpu_count() or 1)))
+    report = {
+        "meta": {
+            "blosc_version": get_version_string(),
+            "ffi_mode": pycblosc.FFI_MODE,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "nbytes": nbytes,
+            "repeats": repeats,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "ffi": bench_ffi(ffi_iterations),
+        "results": [],
+    }
+    if verbose:
+        print("FFI overhead (%(mode)s mode): call %(call_ns).0f ns, compress "
+              "%(compress_ns).0f ns, decompress %(decompress_ns).0f ns" % report["ffi"])
+        print("%-11s %-8s %-10s %3s %3s %8s %10s %10s %10s %10s" % (
+            "pattern", "codec", "shuffle", "ts", "nt", "ratio", "C MB/s", "D MB/s",
+            "C p99 us", "D p99 us"))
+    for pattern in patterns:
+        for typesize in typesizes:
+            data = make_data(pattern, nbytes, typesize)
+            for compressor in compressors:
+                for shuffle in shuffles:
+                    for nthreads in threads:
+                        result = {"pattern": pattern, "compressor": compressor,
+                                  "shuffle": SHUFFLE_NAMES[shuffle], "typesize": typesize,
+                                  "nthreads": nthreads}
+                        result.update(bench_case(data, compressor, shuffle, typesize,
+                                                 nthreads, repeats))
+                        report["results"].append(result)
+                        if verbose:
+                            print("%-11s %-8s %-10s %3d %3d %8.2f %10.1f %10.1f %10.1f %10.1f" % (
+                                pattern, compressor, result["shuffle"], typesize, nthreads,
+                                result["ratio"], result["cspeed"], result["dspeed"],
+                                result["clatency"]["p99"], result["dlatency"]["p99"]))
+    return report
+
+
+def _case_key(result):
+    return (result["pattern"], result["compressor"], result["shuffle"],
+            result["typesize"], result["nthreads"])
+
+
+def compare(base, new, threshold=0.1):
+    """
+    Compare two benchmark reports (as returned by `run()`).
+
+    Args:
+        base (dict): The reference report.
+        new (dict): The report to check.
+        threshold (float): The relative drop that is considered a regression.
+
+    Returns:
+        list: One tuple (`case`, `metric`, `base_value`, `new_value`) per
+        regression found, where `case` identifies the settings.  Cases that
+        are not in both reports, and metrics that are not positive in `base`,
+        are ignored.
+    """
+    base_results = dict((_case_key(r), r) for r in base["results"])
+    regressions = []
+    for result in new["results"]:
+        key = _case_key(result)
+        if key not in base_results:
+            continue
+        old = base_results[key]
+        for metric in ("ratio", "cspeed", "dspeed"):
+            if old[metric] <= 0:
+                continue
+            if result[metric] < old[metric] * (1 - threshold):
+                regressions.append((key, metric, old[metric], result[metric]))
+    return regressions
+
+
+def _parse_list(value, convert=str):
+    return [convert(item) for item in value.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pycblosc.bench",
+                                     description="Benchmark PyCBlosc / C-Blosc.")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--nbytes", type=int, default=2**20,
+                        help="size of the data per case (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="runs per case (default: %(default)s)")
+    parser.add_argument("--compressors", type=_parse_list,
+                        help="comma-separated compressors (default: all)")
+    parser.add_argument("--shuffles", type=_parse_list,
+                        help="comma-separated shuffles among noshuffle,shuffle,bitshuffle")
+    parser.add_argument("--typesizes", type=lambda v: _parse_list(v, int), default=[1, 4, 8],
+                        help="comma-separated typesizes (default: 1,4,8)")
+    parser.add_argument("--threads", type=lambda v: _parse_list(v, int),
+                        help="comma-separated numbers of threads (default: 1 and #cores)")
+    parser.add_argument("--patterns", type=_parse_list, default=list(PATTERNS),
+                        help="comma-separated data patterns (default: %s)" % ",".join(PATTERNS))
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two JSON result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative drop flagged as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compare(base, new, args.threshold)
+        for key, metric, old, value in regressions:
+            change = "%+.1f%%" % ((value / old - 1) * 100) if old else "n/a"
+            print("REGRESSION %s %s: %.2f -> %.2f (%s)" % (
+                "/".join(str(k) for k in key), metric, old, value, change))
+        print("%d regression(s) found" % len(regressions))
+        return 1 if regressions else 0
+
+    shuffles = None
+    if args.shuffles:
+        by_name = dict((name, code) for code, name in SHUFFLE_NAMES.items())
+        unknown = [name for name in args.shuffles if name not in by_name]
+        if unknown:
+            parser.error("unknown shuffle(s): %s (choose among %s)"
+                         % (",".join(unknown), ",".join(by_name)))
+        shuffles = [by_name[name] for name in args.shuffles]
+    unknown = [name for name in args.patterns if name not in PATTERNS]
+    if unknown:
+        parser.error("unknown pattern(s): %s (choose among %s)"
+                     % (",".join(unknown), ",".join(PATTERNS)))
+    report = run(args.nbytes, args.repeats, args.compressors, shuffles, args.typesizes,
+                 args.threads, args.patterns, verbose=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Reads of many scattered ranges of items from a compressed chunk.
+
+C-Blosc compresses a chunk as a sequence of independent internal blocks of
+`blocksize` bytes (see `ChunkHeader`), and `getitem()` decompresses the
+blocks overlapping the requested range.  Fetching many small ranges with one
+`getitem()` call each therefore decompresses the same blocks again and again.
+`getitem_many()` groups the ranges by block instead, decompresses every
+touched block once and copies the pieces out in a single pass.
+
+Decompressed blocks can also be kept in a `BlockCache` between calls, so
+repeated reads of the same hot regions do not decompress anything.
+"""
+
+import threading
+from collections import OrderedDict
+
+from .pycblosc import decompress, getitem
+from .highlevel import _byte_view, _check_result
+from .header import ChunkHeader
+
+
+class BlockCache(object):
+    """
+    A thread-safe LRU cache of decompressed internal blocks.
+
+    Blocks are keyed by the identity of their chunk plus their index in it,
+    and kept up to `max_bytes`; beyond that, the least recently used ones
+    are evicted.  Pass it as `cache` to `getitem_many()`, `take()`,
+    `BloscFile` or `MappedBloscFile`.
+
+    Args:
+        max_bytes (int): The maximum amount of decompressed data kept.
+
+    Attributes:
+        hits (int): Number of blocks served from the cache.
+        misses (int): Number of blocks that had to be decompressed.
+        evictions (int): Number of blocks dropped to honor `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()
+        self._nbytes = 0
+
+    @property
+    def nbytes(self):
+        """The amount of decompressed data currently cached."""
+        return self._nbytes
+
+    def get(self, key):
+        """
+        Return the block cached under `key`, or None.
+        """
+        with self._lock:
+            data = self._blocks.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """
+        Cache the block `data` under `key`, evicting old blocks if needed.
+
+        Blocks larger than `max_bytes` are not cached.
+        """
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._blocks.pop(key, None)
+            if old is not None:
+                self._nbytes -= len(old)
+            while self._blocks and self._nbytes + size > self.max_bytes:
+                _, evicted = self._blocks.popitem(last=False)
+                self._nbytes -= len(evicted)
+                self.evictions += 1
+            self._blocks[key] = data
+            self._nbytes += size
+
+    def clear(self):
+        """
+        Drop all the cached blocks.
+        """
+        with self._lock:
+            self._blocks.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """
+        Get a snapshot of the cache counters.
+
+        Returns:
+            dict: The `hits`, `misses`, `evictions`, the number of cached
+            `blocks` and the `nbytes` kept in them.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "blocks": len(self._blocks),
+                    "nbytes": self._nbytes}
+
+
+def _chunk_layout(view):
+    """Return (`nbytes`, `blocksize`, `typesize`) of the chunk in `view`."""
+    header = ChunkHeader(view)
+    nbytes, blocksize, typesize = header.nbytes, header.blocksize, header.typesize
+    if nbytes and (blocksize <= 0 or typesize <= 0):
+        raise ValueError("`src` is not a valid compressed buffer")
+    return nbytes, blocksize, typesize
+
+
+def _fetch_block(view, block, layout):
+    """Decompress the internal block number `block` of the chunk in `view`."""
+    nbytes, blocksize, typesize = layout
+    start = block * blocksize
+    stop = min(start + blocksize, nbytes)
+    if stop % typesize:
+        # A trailing partial item cannot be fetched with getitem()
+        data = bytearray(nbytes)
+        _check_result(decompress(view, data, nbytes), "decompressing")
+        del data[:start]
+        return data
+    data = bytearray(stop - start)
+    _check_result(getitem(view, start // typesize, (stop - start) // typesize, data),
+                  "reading items")
+    return data
+
+
+def _split_ranges(ranges, blocksize):
+    """
+    Split the byte `ranges` (pairs of start and stop) in pieces that do not
+    cross block boundaries.
+
+    Returns:
+        tuple: A dict of (source offset, length, destination offset) pieces
+        per block, and the total length.
+    """
+    pieces = {}
+    pos = 0
+    for lo, hi in ranges:
+        while lo < hi:
+            block = lo // blocksize
+            stop = min(hi, (block + 1) * blocksize)
+            pieces.setdefault(block, []).append((lo, stop - lo, pos))
+            pos += stop - lo
+            lo = stop
+    return pieces, pos
+
+
+def _read_pieces(load, layout, pieces, out, cache=None, key=None):
+    """
+    Copy the `pieces` (see `_split_ranges()`) of a chunk into `out`.
+
+    The compressed chunk is only obtained (calling `load()`) if some block
+    is not in `cache`.
+    """
+    blocksize = layout[1]
+    view = None
+    for block in sorted(pieces):
+        data = cache.get((key, block)) if cache is not None else None
+        if data is None:
+            if view is None:
+                view = load()
+            data = _fetch_block(view, block, layout)
+            if cache is not None:
+                cache.put((key, block), data)
+        data = memoryview(data)
+        base = block * blocksize
+        for lo, size, dpos in pieces[block]:
+            out[dpos:dpos + size] = data[lo - base:lo - base + size]
+
+
+def getitem_many(src, starts, counts, dest, cache=None, key=None):
+    """
+    Get several ranges of items from the `src` buffer.
+
+    This is the equivalent of calling `getitem(src, start, count, ...)` for
+    every pair in `starts` and `counts` and concatenating the results in
+    `dest`, but every internal block of `src` is decompressed at most once
+    (and the whole buffer is decompressed in one call if most of its blocks
+    are needed).
+
+    Args:
+        src (object): The source buffer containing compressed data.
+            Can be any Python object that supports the buffer protocol.
+        starts (sequence): The first item of every range.
+        counts (sequence): The number of items of every range.
+        dest (object): The destination buffer.  It must have room for
+            sum(`counts`) items.
+            Can be any Python object that supports the buffer protocol.
+        cache (BlockCache): If given, decompressed blocks are looked up in
+            (and added to) this cache.
+        key (hashable): The identity of `src` in `cache`, required with
+            `cache`.  It must change whenever the contents of `src` do.
+            Keying on `src` itself would keep every cached buffer alive
+            outside the budget of `cache`.
+
+    Returns:
+        int: The number of bytes copied to `dest`.
+
+    Raises:
+        ValueError: If a range is out of bounds, `dest` is too small,
+            `src` is not a valid compressed buffer, or `cache` is given
+            without a `key`.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    if cache is not None and key is None:
+        raise ValueError("A `key` identifying `src` is needed to cache its blocks")
+    view = _byte_view(src)
+    out = _byte_view(dest)
+    layout = nbytes, blocksize, typesize = _chunk_layout(view)
+    nitems = nbytes // typesize if nbytes else 0
+    if len(starts) != len(counts):
+        raise ValueError("`starts` and `counts` must have the same length")
+    ranges = []
+    for start, count in zip(starts, counts):
+        start = int(start)
+        count = int(count)
+        if start < 0 or count < 0 or start + count > nitems:
+            raise ValueError("Range of %d items at %d is out of bounds (%d items)"
+                             % (count, start, nitems))
+        ranges.append((start * typesize, (start + count) * typesize))
+    pieces, total = _split_ranges(ranges, blocksize or 1)
+    if total > len(out):
+        raise ValueError("`dest` is too small for the items (%d < %d bytes)"
+                         % (len(out), total))
+
+    nblocks = -(-nbytes // blocksize) if nbytes else 0
+    if cache is None and len(pieces) > nblocks // 2:
+        data = bytearray(nbytes)
+        _check_result(decompress(view, data, nbytes), "decompressing")
+        data = memoryview(data)
+        for block_pieces in pieces.values():
+            for lo, size, dpos in block_pieces:
+                out[dpos:dpos + size] = data[lo:lo + size]
+    else:
+        _read_pieces(lambda: view, layout, pieces, out, cache, key)
+    return total
+
+
+def take(src, indices, cache=None, key=None):
+    """
+    Get the items at `indices` from the `src` buffer.
+
+    Every internal block of `src` is decompressed at most once, no matter
+    how many indices fall in it (see `getitem_many()`, also for `cache` and
+    `key`).
+
+    Args:
+        src (object): The source buffer containing compressed data.
+            Can be any Python object that supports the buffer protocol.
+        indices (sequence): The indices of the items, in any order (and
+            possibly repeated).
+
+    Returns:
+        bytearray: The items, in the order of `indices`.
+
+    Raises:
+        ValueError: If an index is out of bounds or `src` is not a valid
+            compressed buffer.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    typesize = _chunk_layout(_byte_view(src))[2]
+    dest = bytearray(len(indices) * typesize)
+    getitem_many(src, indices, [1] * len(indices), dest, cache, key)
+    return dest
@@ -0,0 +1,504 @@
+"""
+Streaming access to chunked blosc files.
+
+Data larger than memory is split in fixed-size chunks that are compressed
+independently.  The layout of a chunked file is::
+
+    [chunk 0][chunk 1]...[chunk n-1][index][trailer]
+
+where the index holds n + 1 little-endian uint64 offsets of the chunks
+(relative to the start of chunk 0; the last one is the end of the data) and
+the trailer is made of an 8-byte magic string plus the chunksize, the total
+number of uncompressed bytes and the number of chunks as uint64.  Every chunk
+but the last one holds exactly `chunksize` uncompressed bytes, so locating the
+chunk for any offset is O(1).  A chunksize of 0 means that the chunks have
+variable sizes (as written by `SuperChunk`), which the readers here do not
+support.
+"""
+
+import io
+import mmap
+import struct
+import sys
+from array import array
+
+from .pycblosc import (MAX_OVERHEAD, SHUFFLE, Codec, get_blocksize, get_compressor,
+                       get_nthreads, getitem)
+from .highlevel import _byte_view, _check_result
+from .blocks import _chunk_layout, _read_pieces, _split_ranges
+from .header import ChunkHeader
+
+
+_MAGIC = b"BLSCIDX1"
+_TRAILER = struct.Struct("<8sQQQ")
+
+
+def _pack_index(offsets, chunksize, nbytes):
+    """Return the index and trailer for chunks at `offsets` (an array('Q'))."""
+    index = array('Q', offsets)
+    if sys.byteorder == "big":
+        index.byteswap()
+    return index.tobytes() + _TRAILER.pack(_MAGIC, chunksize, nbytes, len(offsets) - 1)
+
+
+def _unpack_trailer(buf, variable=False):
+    """
+    Return (`chunksize`, `nbytes`, `nchunks`) from the trailer bytes in `buf`.
+
+    Chunks of variable size (a `chunksize` of 0) are only accepted if
+    `variable` is true.
+    """
+    if len(buf) != _TRAILER.size:
+        raise ValueError("Not a chunked blosc file (too short)")
+    magic, chunksize, nbytes, nchunks = _TRAILER.unpack(buf)
+    if magic != _MAGIC:
+        raise ValueError("Not a chunked blosc file (bad magic %r)" % magic)
+    if chunksize == 0 and nchunks and not variable:
+        raise ValueError("Chunks of variable size are not supported (use SuperChunk)")
+    return chunksize, nbytes, nchunks
+
+
+def _unpack_offsets(buf):
+    offsets = array('Q')
+    offsets.frombytes(buf)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return offsets
+
+
+def _index_size(nchunks):
+    """The size of the index plus the trailer for `nchunks` chunks."""
+    return 8 * (nchunks + 1) + _TRAILER.size
+
+
+def _read_cached(load, layout, start, dest, cache, key):
+    """
+    Copy len(`dest`) bytes at `start` of the compressed chunk returned by
+    `load()` (with the given `_chunk_layout()`) into `dest`, going through
+    the blocks in `cache`.
+    """
+    pieces = _split_ranges([(start, start + len(dest))], layout[1])[0]
+    _read_pieces(load, layout, pieces, dest, cache, key)
+
+
+def _read_range(cchunk, chunk_nbytes, start, dest, codec):
+    """
+    Copy len(`dest`) bytes at `start` of the compressed chunk `cchunk` into
+    `dest`, using getitem() so that only the blocks involved are decompressed.
+    """
+    nbytes = len(dest)
+    typesize = ChunkHeader(cchunk).typesize
+    first = start // typesize
+    last = -(-(start + nbytes) // typesize)
+    if last * typesize > chunk_nbytes:
+        # A trailing partial item cannot be fetched with getitem()
+        chunk = bytearray(chunk_nbytes)
+        _check_result(codec.decompress(cchunk, chunk, chunk_nbytes), "decompressing")
+        dest[:] = memoryview(chunk)[start:start + nbytes]
+    elif first * typesize == start and last * typesize == start + nbytes:
+        # Aligned to items: fetch them straight into `dest`
+        _check_result(getitem(cchunk, first, last - first, dest), "reading items")
+    else:
+        items = bytearray((last - first) * typesize)
+        _check_result(getitem(cchunk, first, last - first, items), "reading items")
+        skip = start - first * typesize
+        dest[:] = memoryview(items)[skip:skip + nbytes]
+
+
+class BloscFile(io.RawIOBase):
+    """
+    A file object that transparently compresses to (or decompresses from)
+    a chunked blosc file.
+
+    In write mode, data is accumulated in a buffer of `chunksize` bytes which
+    is compressed and written out when full, so memory usage is bounded no
+    matter the size of the data.  The index of chunks is appended on
+    `close()`.
+
+    In read mode, only the index is read on open, and chunks are read and
+    decompressed lazily.  Any offset can be reached with `seek()`.  Small
+    reads inside a chunk use `getitem()` so that only the internal blocks
+    involved are decompressed, and the last chunk decompressed as a whole
+    is kept around for sequential reads.
+
+    Args:
+        file (str or file object): A path or a binary file object.  In read
+            mode, it must be seekable.  File objects are not closed on
+            `close()`.
+        mode (str): Either 'rb' (or 'r') or 'wb' (or 'w').
+        chunksize (int): The number of uncompressed bytes per chunk (only
+            used in write mode).  It must be positive.
+        clevel (int): The compression level (write mode).
+        shuffle (int): The shuffle filter (write mode).
+        typesize (int): The size of the atomic type in the data (write mode).
+            By default, it is the itemsize of the first buffer written.
+        codec (Codec): A codec to use instead of `clevel` and `shuffle`
+            plus the global compressor, blocksize and number of threads.
+        cache (BlockCache): If given, the blocks decompressed by small reads
+            are kept in this cache (read mode), so that reading them again
+            does not even touch the file.
+    """
+
+    def __init__(self, file, mode="rb", chunksize=2**20, clevel=5, shuffle=SHUFFLE,
+                 typesize=None, codec=None, cache=None):
+        super(BloscFile, self).__init__()
+        if mode not in ("r", "rb", "w", "wb"):
+            raise ValueError("Invalid mode: %r" % mode)
+        self._writing = mode.startswith("w")
+        if self._writing and chunksize <= 0:
+            raise ValueError("`chunksize` must be positive")
+        if isinstance(file, (str, bytes)):
+            self._file = open(file, "wb" if self._writing else "rb")
+            self._closefile = True
+        else:
+            self._file = file
+            self._closefile = False
+        if codec is None:
+            codec = Codec(clevel, shuffle, get_compressor(), get_blocksize(),
+                          get_nthreads())
+        self.codec = codec
+        self.cache = cache
+        self._pos = 0
+        if self._writing:
+            self.chunksize = chunksize
+            self.typesize = typesize
+            self._base = self._file.tell() if self._file.seekable() else 0
+            self._offsets = array('Q', [0])
+            self._staging = bytearray(chunksize)
+            self._nstaged = 0
+            self._cbuffer = bytearray(chunksize + MAX_OVERHEAD)
+        else:
+            try:
+                self._read_index()
+            except BaseException:
+                if self._closefile:
+                    self._file.close()
+                super(BloscFile, self).close()
+                raise
+            self._cached = -1
+            self._chunk = None
+            # The identity of this file in `cache` and the layout of its chunks
+            self._cache_token = object()
+            self._layouts = {}
+
+    def _read_index(self):
+        f = self._file
+        end = f.seek(0, io.SEEK_END)
+        if end < _TRAILER.size:
+            raise ValueError("Not a chunked blosc file (too short)")
+        f.seek(end - _TRAILER.size)
+        self.chunksize, self.nbytes, nchunks = _unpack_trailer(f.read(_TRAILER.size))
+        index_start = end - _index_size(nchunks)
+        f.seek(index_start)
+        self._offsets = _unpack_offsets(f.read(8 * (nchunks + 1)))
+        self._base = index_start - self._offsets[-1]
+
+    @property
+    def nchunks(self):
+        """The number of chunks in the file (so far, when writing)."""
+        return len(self._offsets) - 1
+
+    # Capabilities
+
+    def readable(self):
+        return not self._writing
+
+    def writable(self):
+        return self._writing
+
+    def seekable(self):
+        return not self._writing
+
+    # Writing
+
+    def _flush_chunk(self, data):
+        nbytes = len(data)
+        typesize = self.typesize or 1
+        cbytes = self.codec.compress(typesize, nbytes, data, self._cbuffer,
+                                     len(self._cbuffer))
+        _check_result(cbytes, "compressing")
+        with memoryview(self._cbuffer) as cview:
+            self._file.write(cview[:cbytes])
+        self._offsets.append(self._offsets[-1] + cbytes)
+        self._pos += nbytes
+
+    def write(self, b):
+        """
+        Write the bytes-like object `b`, compressing full chunks as they fill.
+
+        Returns:
+            int: The number of bytes written (always the size of `b`).
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if not self._writing:
+            raise io.UnsupportedOperation("File not open for writing")
+        view = memoryview(b)
+        if self.typesize is None:
+            self.typesize = view.itemsize
+        view = _byte_view(view)
+        nbytes = len(view)
+        chunksize = self.chunksize
+        done = 0
+        if self._nstaged:
+            done = min(chunksize - self._nstaged, nbytes)
+            self._staging[self._nstaged:self._nstaged + done] = view[:done]
+            self._nstaged += done
+            if self._nstaged < chunksize:
+                return nbytes
+            self._flush_chunk(self._staging)
+            self._nstaged = 0
+        # Full chunks are compressed straight from `b`, without staging
+        while nbytes - done >= chunksize:
+            self._flush_chunk(view[done:done + chunksize])
+            done += chunksize
+        rest = nbytes - done
+        if rest:
+            self._staging[:rest] = view[done:]
+            self._nstaged = rest
+        return nbytes
+
+    # Reading
+
+    def _read_chunk(self, i):
+        """Return the compressed data of chunk `i`."""
+        self._file.seek(self._base + self._offsets[i])
+        return self._file.read(self._offsets[i + 1] - self._offsets[i])
+
+    def _chunk_nbytes(self, i):
+        return min(self.chunksize, self.nbytes - i * self.chunksize)
+
+    def _load_chunk(self, i):
+        """Decompress chunk `i` into the cache, if not there already."""
+        if self._cached != i:
+            cchunk = self._read_chunk(i)
+            nbytes = self._chunk_nbytes(i)
+            if self._chunk is None or len(self._chunk) < nbytes:
+                self._chunk = bytearray(self.chunksize)
+            dbytes = self.codec.decompress(cchunk, self._chunk, nbytes)
+            _check_result(dbytes, "decompressing")
+            self._cached = i
+        return self._chunk
+
+    def _read_partial(self, i, start, dest):
+        """Read len(`dest`) bytes from chunk `i` at `start` via getitem()."""
+        if self.cache is None:
+            _read_range(self._read_chunk(i), self._chunk_nbytes(i), start, dest, self.codec)
+            return
+        layout = self._layouts.get(i)
+        if layout is None:
+            cchunk = self._read_chunk(i)
+            layout = self._layouts[i] = _chunk_layout(cchunk)
+            load = lambda: cchunk
+        else:
+            load = lambda: self._read_chunk(i)
+        _read_cached(load, layout, start, dest, self.cache, (self._cache_token, i))
+
+    def readinto(self, b):
+        """
+        Read up to len(`b`) bytes into `b`, decompressing only what is needed.
+
+        Returns:
+            int: The number of bytes read (0 at the end of the file).
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if self._writing:
+            raise io.UnsupportedOperation("File not open for reading")
+        dest = _byte_view(b)
+        nbytes = min(len(dest), max(self.nbytes - self._pos, 0))
+        chunksize = self.chunksize
+        done = 0
+        while done < nbytes:
+            i, start = divmod(self._pos, chunksize)
+            chunk_nbytes = self._chunk_nbytes(i)
+            n = min(chunk_nbytes - start, nbytes - done)
+            out = dest[done:done + n]
+            if self._cached == i:
+                out[:] = memoryview(self._chunk)[start:start + n]
+            elif start == 0 and n == chunk_nbytes:
+                # The whole chunk is wanted: decompress it in place
+                dbytes = self.codec.decompress(self._read_chunk(i), out, n)
+                _check_result(dbytes, "decompressing")
+            elif n < chunk_nbytes // 2:
+                self._read_partial(i, start, out)
+            else:
+                out[:] = memoryview(self._load_chunk(i))[start:start + n]
+            done += n
+            self._pos += n
+        return nbytes
+
+    def readall(self):
+        """Read until the end of the file."""
+        buf = bytearray(max(self.nbytes - self._pos, 0))
+        self.readinto(buf)
+        return bytes(buf)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """
+        Move to the uncompressed `offset` (relative to `whence`).
+
+        Returns:
+            int: The new absolute position.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if self._writing:
+            raise io.UnsupportedOperation("Cannot seek while writing")
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.nbytes
+        elif whence != io.SEEK_SET:
+            raise ValueError("Invalid whence: %r" % whence)
+        if offset < 0:
+            raise ValueError("Negative seek position %d" % offset)
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        """Return the current (uncompressed) position."""
+        return self._pos + (self._nstaged if self._writing else 0)
+
+    def close(self):
+        """
+        Flush the last chunk and the index when writing, and close the file.
+        """
+        if self.closed:
+            return
+        try:
+            if self._writing:
+                if self._nstaged:
+                    with memoryview(self._staging) as staged:
+                        self._flush_chunk(staged[:self._nstaged])
+                    self._nstaged = 0
+                self._file.write(_pack_index(self._offsets, self.chunksize, self._pos))
+                self._file.flush()
+        finally:
+            if self._closefile:
+                self._file.close()
+            super(BloscFile, self).close()
+
+
+class MappedBloscFile(object):
+    """
+    A zero-copy reader for chunked blosc files based on `mmap`.
+
+    The compressed chunks are handed to C-Blosc as memoryview slices of the
+    mapping, so they are never copied into Python objects (nor duplicated
+    out of the page cache), and data is decompressed straight into
+    caller-provided buffers.
+
+    Args:
+        path (str): The path of a chunked blosc file (as written by
+            `BloscFile`).
+        codec (Codec): The codec used for decompressing (only its number of
+            threads matters).
+        cache (BlockCache): If given, the blocks decompressed by partial
+            reads are kept in this cache.
+
+    Note:
+        Memoryviews returned by `chunk()` must be released before calling
+        `close()`.
+    """
+
+    def __init__(self, path, codec=None, cache=None):
+        self.codec = codec if codec is not None else Codec(nthreads=get_nthreads())
+        self.cache = cache
+        self._cache_token = object()
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        try:
+            # Slicing the mmap copies the (small) index and trailer
+            end = len(self._mmap)
+            self.chunksize, self.nbytes, nchunks = _unpack_trailer(
+                self._mmap[max(end - _TRAILER.size, 0):])
+            index_start = end - _index_size(nchunks)
+            self._offsets = _unpack_offsets(self._mmap[index_start:end - _TRAILER.size])
+            self._base = index_start - self._offsets[-1]
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.nbytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def nchunks(self):
+        """The number of chunks in the file."""
+        return len(self._offsets) - 1
+
+    @property
+    def closed(self):
+        return self._mmap.closed
+
+    def close(self):
+        """Release the mapping."""
+        self._view.release()
+        self._mmap.close()
+
+    def chunk(self, i):
+        """
+        Return the compressed chunk `i` as a memoryview on the mapping.
+        """
+        return self._view[self._base + self._offsets[i]:self._base + self._offsets[i + 1]]
+
+    def chunk_nbytes(self, i):
+        """Return the number of uncompressed bytes in chunk `i`."""
+        return min(self.chunksize, self.nbytes - i * self.chunksize)
+
+    def read_into(self, offset, out):
+        """
+        Decompress the bytes at the uncompressed `offset` straight into `out`.
+
+        Whole chunks are decompressed directly into `out`, and partial chunks
+        at the edges use `getitem()`.
+
+        Args:
+            offset (int): The uncompressed offset to start reading at.
+            out (object): The destination buffer (e.g. a NumPy array).  Up to
+                its size in bytes are read.
+
+        Returns:
+            int: The number of bytes read (less than the size of `out` only
+            at the end of the data).
+
+        Raises:
+            ValueError: If `offset` is negative.
+        """
+        if offset < 0:
+            raise ValueError("Negative offset %d" % offset)
+        dest = _byte_view(out)
+        nbytes = min(len(dest), max(self.nbytes - offset, 0))
+        chunksize = self.chunksize
+        done = 0
+        while done < nbytes:
+            i, start = divmod(offset + done, chunksize)
+            chunk_nbytes = self.chunk_nbytes(i)
+            n = min(chunk_nbytes - start, nbytes - done)
+            with self.chunk(i) as cchunk, dest[done:done + n] as out_i:
+                if start == 0 and n == chunk_nbytes:
+                    dbytes = self.codec.decompress(cchunk, out_i, n)
+                    _check_result(dbytes, "decompressing")
+                elif self.cache is not None:
+                    _read_cached(lambda: cchunk, _chunk_layout(cchunk), start, out_i,
+                                 self.cache, (self._cache_token, i))
+                else:
+                    _read_range(cchunk, chunk_nbytes, start, out_i, self.codec)
+            done += n
+        return nbytes
+
+    def read(self, offset, nbytes):
+        """
+        Return a new bytearray with `nbytes` bytes at the uncompressed `offset`.
+        """
+        out = bytearray(max(min(nbytes, self.nbytes - offset), 0))
+        self.read_into(offset, out)
+        return out
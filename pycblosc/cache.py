@@ -0,0 +1,243 @@
+"""
+An in-memory mapping that keeps its values compressed.
+
+A `CompressedCache` stores byte blobs and NumPy arrays compressed, within a
+budget of compressed bytes, and evicts the least recently used ones beyond
+it.  The values of the most recently read keys are also kept decompressed
+(the hot tier), so reading them again costs nothing.  Other hits decompress
+the value once, straight into a buffer taken from a `BufferPool`; a buffer
+goes back to the pool once its value has left the hot tier and every value
+or view handed out on it is gone (tracked with a `weakref.finalize` on the
+object exporting it), so steady workloads do not allocate.  The hot tier is not counted in the
+budget: it takes up to `hot_keys` decompressed values on top of it.
+"""
+
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from .pycblosc import SHUFFLE
+from .highlevel import _byte_view, compress_bytes, decompress_bytes
+from .pool import BufferPool
+from .batch import _default_codec
+
+
+def _is_ndarray(value):
+    # Do not import NumPy just to find out that a value is not an array
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(value, np.ndarray)
+
+
+class CompressedCache(MutableMapping):
+    """
+    A thread-safe LRU mapping whose values are kept compressed.
+
+    Values can be NumPy arrays (packed with their dtype, shape and order
+    by `pack_array()`) or any other object supporting the buffer protocol.
+    Reading a value returns a read-only NumPy array or a read-only byte
+    memoryview, shared with the hot tier, so it must be copied before
+    modifying it.
+
+    Args:
+        max_bytes (int): The budget for the compressed values.  Values that
+            do not fit in it on their own are not stored.  The hot tier is
+            not included (see `hot_keys`).
+        hot_keys (int): How many of the most recently read values are kept
+            decompressed.  They take up to `hot_keys` times the size of the
+            largest value on top of `max_bytes` (reported as `hot_nbytes` by
+            `stats()`); use 0 to keep memory within `max_bytes`.
+        clevel (int): The compression level.
+        shuffle (int): The shuffle filter.
+        codec (Codec): A codec to use instead of `clevel` and `shuffle`
+            plus the global compressor and blocksize.
+        pool (BufferPool): Where the buffers of decompressed values come
+            from.  By default, a new pool for this cache.
+
+    Attributes:
+        hot_hits (int): Number of reads served from the hot tier.
+        hits (int): Number of reads that had to decompress their value.
+        misses (int): Number of reads of missing keys.
+        evictions (int): Number of values dropped to honor `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, hot_keys=8, clevel=5, shuffle=SHUFFLE,
+                 codec=None, pool=None):
+        self.max_bytes = max_bytes
+        self.hot_keys = hot_keys
+        self.codec = codec if codec is not None else _default_codec(clevel, shuffle)
+        self.pool = pool if pool is not None else BufferPool()
+        self.hot_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (compressed data, uncompressed size, is an array)
+        self._entries = OrderedDict()
+        # key -> decompressed value
+        self._hot = OrderedDict()
+        # Pooled buffers whose values are gone, to be given back to the pool
+        # (finalizers may run anywhere, so they do not touch the pool)
+        self._released = []
+        self._cbytes = 0
+        self._nbytes = 0
+
+    def _drop_hot(self, key=None):
+        """
+        Remove `key` (or the least recently used key) from the hot tier.
+        """
+        if key is None:
+            self._hot.popitem(last=False)
+        else:
+            del self._hot[key]
+
+    def _exporter(self, nbytes):
+        """
+        Return an object exporting the first `nbytes` of a pooled buffer,
+        which goes back to the pool when the object is collected.
+
+        Values are built on this object, so that it lives as long as any
+        value or view on the buffer (memoryviews and arrays keep their
+        exporter, but not the intermediate objects, alive).
+        """
+        import ctypes
+
+        buf = self.pool.acquire(nbytes)
+        exporter = (ctypes.c_ubyte * nbytes).from_buffer(buf)
+        weakref.finalize(exporter, self._released.append, buf).atexit = False
+        return exporter
+
+    def _recycle(self):
+        """Give the buffers of the values that are gone back to the pool."""
+        while self._released:
+            self.pool.release(self._released.pop())
+
+    def _remove(self, key):
+        cdata, nbytes, _ = self._entries.pop(key)
+        self._cbytes -= len(cdata)
+        self._nbytes -= nbytes
+        if key in self._hot:
+            self._drop_hot(key)
+
+    def __setitem__(self, key, value):
+        if _is_ndarray(value):
+            from .ndarray import pack_array
+            cdata = pack_array(value, codec=self.codec)
+            entry = (cdata, value.nbytes, True)
+        else:
+            cdata = compress_bytes(value, codec=self.codec)
+            entry = (cdata, len(_byte_view(value)), False)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(cdata) > self.max_bytes:
+                return
+            while self._entries and self._cbytes + len(cdata) > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = entry
+            self._cbytes += len(cdata)
+            self._nbytes += entry[1]
+
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            hot_entry = self._hot.get(key)
+            if hot_entry is not None:
+                self._hot.move_to_end(key)
+                self.hot_hits += 1
+                return hot_entry
+            self.hits += 1
+        self._recycle()
+        cdata, nbytes, is_array = entry
+        if is_array:
+            value = self._unpack_array(cdata, nbytes)
+        else:
+            out = memoryview(self._exporter(nbytes)).cast("B")
+            value = decompress_bytes(cdata, self.codec, out=out).toreadonly()
+        if self.hot_keys > 0:
+            with self._lock:
+                # Unless the key changed while decompressing
+                if self._entries.get(key) is entry:
+                    if key in self._hot:
+                        self._drop_hot(key)
+                    self._hot[key] = value
+                    while len(self._hot) > self.hot_keys:
+                        self._drop_hot()
+        self._recycle()
+        return value
+
+    def _unpack_array(self, cdata, nbytes):
+        """Decompress a packed array into a pooled buffer."""
+        from .ndarray import _unpack_header, unpack_array
+        import numpy as np
+
+        dtype, shape, order, _ = _unpack_header(memoryview(cdata))
+        arr = np.frombuffer(self._exporter(nbytes), dtype=dtype,
+                            count=nbytes // dtype.itemsize if nbytes else 0)
+        arr = unpack_array(cdata, out=arr.reshape(shape, order=order), codec=self.codec)
+        arr.flags.writeable = False
+        return arr
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __iter__(self):
+        with self._lock:
+            keys = list(self._entries)
+        return iter(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Drop all the values.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+        self._recycle()
+
+    @property
+    def cbytes(self):
+        """The size of the compressed values."""
+        return self._cbytes
+
+    @property
+    def nbytes(self):
+        """The size of the values once decompressed."""
+        return self._nbytes
+
+    def stats(self):
+        """
+        Get a snapshot of the cache counters.
+
+        Returns:
+            dict: The `hot_hits`, `hits`, `misses`, `evictions`, the number
+            of `keys` and of `hot_keys`, the `nbytes` and `cbytes` of the
+            values, their compression `ratio`, the `hot_nbytes` held
+            decompressed by the hot tier (outside `max_bytes`), and the
+            `hit_rate` (of all the reads) and `hot_hit_rate` (of the hits).
+        """
+        with self._lock:
+            hits = self.hot_hits + self.hits
+            reads = hits + self.misses
+            return {"hot_hits": self.hot_hits, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "keys": len(self._entries),
+                    "hot_keys": len(self._hot), "nbytes": self._nbytes,
+                    "cbytes": self._cbytes,
+                    "hot_nbytes": sum(self._entries[key][1] for key in self._hot),
+                    "ratio": self._nbytes / self._cbytes if self._cbytes else 0.0,
+                    "hit_rate": hits / reads if reads else 0.0,
+                    "hot_hit_rate": self.hot_hits / hits if hits else 0.0}
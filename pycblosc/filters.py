@@ -0,0 +1,333 @@
+"""
+Filters applied to NumPy arrays before compression (and inverted after
+decompression).
+
+Shuffling reorders bytes, but it does not change them.  For numerical data
+like telemetry, replacing every value by its difference (`Delta`) or its
+XOR (`Xor`) with the previous one leaves mostly small numbers or zero bits,
+and dropping the least significant mantissa bits of floats (`Truncate`,
+lossy) removes noise that does not compress at all.  Both can raise the
+compression ratio a lot.
+
+`compress_filtered()` runs a chain of filters and records it in a small
+header in front of the data (followed by a `pack_array()` payload), so
+`decompress_filtered()` needs nothing but the buffer.  Filters work on the
+bits of the items (as unsigned integers) and run vectorized, from the input
+into scratch buffers taken from a `BufferPool`, and the result is compressed
+straight after the header, so the input is never modified and no other
+full-size copies are made (except for arrays that are neither C- nor
+Fortran-contiguous, copied once as by `pack_array()`).  New filters can be
+added by subclassing `Filter` and calling `register_filter()`.
+
+The filter header is made of the magic b"BLFT", a version byte and the number
+of filters, followed by the id and parameter (uint8 each) of every filter,
+padded to a multiple of 16 bytes.
+"""
+
+import struct
+
+import numpy as np
+
+from .pycblosc import SHUFFLE
+from .highlevel import _byte_view
+from .pool import BufferPool
+from .ndarray import unpack_array, _aligned_empty, _contiguous, _pack, _unpack_header
+
+
+_MAGIC = b"BLFT"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBB")
+_MANTISSA_BITS = {2: 10, 4: 23, 8: 52}
+
+_filters = {}
+_pool = BufferPool()
+
+
+class Filter(object):
+    """
+    The base class of filters.
+
+    Subclasses set a unique `id` (values from 128 on are reserved for user
+    filters) and implement `encode()` and `decode()`.  Filters can take an
+    integer parameter from 0 to 255, which is stored in the header.
+
+    Args:
+        param (int): The parameter of the filter.
+
+    Raises:
+        ValueError: If `param` is not in [0, 255].
+    """
+
+    id = None
+
+    def __init__(self, param=0):
+        if not 0 <= param <= 255:
+            raise ValueError("The parameter of %s must be in [0, 255] (got %r)"
+                             % (type(self).__name__, param))
+        self.param = param
+
+    def __repr__(self):
+        return "%s(%d)" % (type(self).__name__, self.param)
+
+    def check(self, dtype):
+        """
+        Raise ValueError if the filter cannot be applied to items of `dtype`.
+        """
+
+    def encode(self, src, dest):
+        """
+        Write the filtered `src` into `dest`.
+
+        Both are 1-dimensional arrays of unsigned integers with the bits of
+        the items, of the same length.  They never overlap.
+        """
+        raise NotImplementedError
+
+    def decode(self, src, dest):
+        """
+        Write the inverse of the filter applied to `src` into `dest`.
+        """
+        raise NotImplementedError
+
+
+def register_filter(cls):
+    """
+    Register a `Filter` subclass, so that it can be decoded from headers.
+
+    It can be used as a class decorator.
+
+    Raises:
+        ValueError: If another filter has the same id.
+    """
+    if not 0 <= cls.id <= 255:
+        raise ValueError("Filter ids must be in [0, 255]")
+    if _filters.get(cls.id, cls) is not cls:
+        raise ValueError("Filter id %d is already taken by %s"
+                         % (cls.id, _filters[cls.id].__name__))
+    _filters[cls.id] = cls
+    return cls
+
+
+@register_filter
+class Delta(Filter):
+    """
+    Replace every item by its difference with the previous one (with
+    wrap-around, so it is lossless for any type).
+    """
+
+    id = 1
+
+    def encode(self, src, dest):
+        if len(src):
+            dest[0] = src[0]
+            np.subtract(src[1:], src[:-1], out=dest[1:])
+
+    def decode(self, src, dest):
+        np.cumsum(src, dtype=src.dtype, out=dest)
+
+
+@register_filter
+class Xor(Filter):
+    """
+    Replace every item by its XOR with the previous one.  For floats that
+    change slowly, this leaves the sign, exponent and top mantissa bits at
+    zero.
+    """
+
+    id = 2
+
+    def encode(self, src, dest):
+        if len(src):
+            dest[0] = src[0]
+            np.bitwise_xor(src[1:], src[:-1], out=dest[1:])
+
+    def decode(self, src, dest):
+        np.bitwise_xor.accumulate(src, out=dest)
+
+
+@register_filter
+class Truncate(Filter):
+    """
+    Zero the least significant bits of the mantissa of floats, keeping
+    `param` bits (lossy).
+
+    Args:
+        param (int): The number of mantissa bits to keep.
+    """
+
+    id = 3
+
+    def check(self, dtype):
+        if dtype.kind != 'f' or dtype.itemsize not in _MANTISSA_BITS:
+            raise ValueError("Truncate only applies to float16, float32 and float64")
+        if not 0 <= self.param <= _MANTISSA_BITS[dtype.itemsize]:
+            raise ValueError("Cannot keep %d mantissa bits of %s" % (self.param, dtype))
+
+    def encode(self, src, dest):
+        drop = _MANTISSA_BITS[src.dtype.itemsize] - self.param
+        mask = src.dtype.type(~((1 << drop) - 1) & ((1 << (8 * src.dtype.itemsize)) - 1))
+        np.bitwise_and(src, mask, out=dest)
+
+    def decode(self, src, dest):
+        dest[...] = src
+
+
+def _scratch(pool, nbytes, dtype):
+    """Return a pooled buffer and an array of `dtype` over its first `nbytes`."""
+    buf = pool.acquire(nbytes)
+    return buf, np.frombuffer(buf, dtype=dtype, count=nbytes // dtype.itemsize)
+
+
+def _bits_dtype(dtype):
+    """Return the unsigned integer dtype (same size and byte order) of `dtype`."""
+    if dtype.itemsize not in (1, 2, 4, 8) or dtype.hasobject or dtype.fields:
+        raise ValueError("Filters cannot be applied to items of %s" % dtype)
+    return np.dtype("%su%d" % (dtype.byteorder.replace("|", "="), dtype.itemsize))
+
+
+def compress_filtered(arr, filters, clevel=5, shuffle=SHUFFLE, codec=None, pool=None):
+    """
+    Apply a chain of filters to a NumPy array and compress the result.
+
+    Arrays that are neither C- nor Fortran-contiguous are first made
+    C-contiguous with a single copy, which is counted in
+    `array_copy_stats()`.
+
+    Args:
+        arr (numpy.ndarray): The array to compress.  It is not modified.
+        filters (sequence): The `Filter` instances to apply, in order.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE) after the filters.
+        codec (Codec): If given, compress with this codec (and its
+            `clevel` and `shuffle`) instead of using the global settings.
+        pool (BufferPool): Where the scratch buffers come from.  By default,
+            a pool shared by all the calls.
+
+    Returns:
+        bytearray: The filter header followed by the packed array, to be
+        passed to `decompress_filtered()`.
+
+    Raises:
+        ValueError: If some filter cannot be applied to the dtype of `arr`,
+            or if it holds Python objects.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    arr = np.asanyarray(arr)
+    filters = list(filters)
+    if len(filters) > 255:
+        raise ValueError("Too many filters")
+    for f in filters:
+        if _filters.get(f.id) is not type(f):
+            raise ValueError("Filter %r is not registered" % f)
+        f.check(arr.dtype)
+    header = _HEADER.pack(_MAGIC, _VERSION, len(filters)) + b"".join(
+        struct.pack("<BB", f.id, f.param) for f in filters)
+    header += b"\0" * (-len(header) % 16)
+    if arr.dtype.hasobject:
+        raise ValueError("Arrays of Python objects cannot be packed")
+    arr, order = _contiguous(arr)
+    if not filters:
+        return _pack(arr, order, clevel, shuffle, codec, prefix=header)
+
+    pool = pool if pool is not None else _pool
+    bits = _bits_dtype(arr.dtype)
+    buffers = []
+    try:
+        scratch = []
+        for i in range(min(len(filters), 2)):
+            buf, array = _scratch(pool, arr.nbytes, bits)
+            buffers.append(buf)
+            scratch.append(array)
+        current = arr.reshape(-1, order="A").view(bits)
+        for i, f in enumerate(filters):
+            f.encode(current, scratch[i % 2])
+            current = scratch[i % 2]
+        packed = _pack(current.view(arr.dtype).reshape(arr.shape, order=order.decode()),
+                       order, clevel, shuffle, codec, prefix=header)
+        del current, scratch
+    finally:
+        for buf in buffers:
+            pool.release(buf)
+    return packed
+
+
+def _unpack_filters(view):
+    """Return the filters and the size of the filter header in `view`."""
+    if len(view) < _HEADER.size:
+        raise ValueError("Buffer too small for a filter header")
+    magic, version, nfilters = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a filtered buffer (or unsupported version)")
+    end = _HEADER.size + 2 * nfilters
+    if len(view) < end:
+        raise ValueError("Truncated filter header")
+    filters = []
+    for i in range(nfilters):
+        fid, param = struct.unpack_from("<BB", view, _HEADER.size + 2 * i)
+        if fid not in _filters:
+            raise ValueError("Unknown filter id %d" % fid)
+        filters.append(_filters[fid](param))
+    return filters, end + (-end % 16)
+
+
+def decompress_filtered(buf, out=None, codec=None, pool=None):
+    """
+    Decompress a buffer made by `compress_filtered()` and invert its filters.
+
+    Args:
+        buf (object): The filtered and compressed data.
+            Can be any Python object that supports the buffer protocol.
+        out (numpy.ndarray): An optional array where the data is written.
+            It must have the dtype and shape of the original array, and be
+            writeable and contiguous in its order.
+        codec (Codec): If given, decompress with the threads of this codec
+            instead of using the global settings.
+        pool (BufferPool): Where the scratch buffers come from.
+
+    Returns:
+        numpy.ndarray: `out`, or a new array aligned to ALIGNMENT bytes and
+        equal to the original one (up to the precision kept by lossy
+        filters).
+
+    Raises:
+        ValueError: If `buf` is not valid or `out` does not match it.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    view = _byte_view(buf)
+    filters, offset = _unpack_filters(view)
+    payload = view[offset:]
+    if not filters:
+        return unpack_array(payload, out, codec)
+    dtype, shape, order, _ = _unpack_header(payload)
+    if out is None:
+        out = _aligned_empty(shape, dtype, order)
+    else:
+        contiguous = out.flags.c_contiguous if order == "C" else out.flags.f_contiguous
+        if out.dtype != dtype or out.shape != shape:
+            raise ValueError("`out` must have dtype %s and shape %s" % (dtype, shape))
+        if not (contiguous and out.flags.writeable):
+            raise ValueError("`out` must be writeable and %s-contiguous" % order)
+    pool = pool if pool is not None else _pool
+    bits = _bits_dtype(dtype)
+    nbytes = out.nbytes
+    buffers = []
+    try:
+        # Decompress into scratch, and make the last inverse land in `out`
+        scratch = []
+        for i in range(min(len(filters), 2)):
+            sbuf, array = _scratch(pool, nbytes, bits)
+            buffers.append(sbuf)
+            scratch.append(array)
+        unpack_array(payload, scratch[0].view(dtype).reshape(shape, order=order), codec)
+        current = scratch[0]
+        result = out.reshape(-1, order=order).view(bits)
+        for i, f in enumerate(reversed(filters)):
+            dest = result if i == len(filters) - 1 else scratch[(i + 1) % 2]
+            f.decode(current, dest)
+            current = dest
+        del current, dest, result, scratch
+    finally:
+        for sbuf in buffers:
+            pool.release(sbuf)
+    return out
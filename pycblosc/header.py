@@ -0,0 +1,131 @@
+"""
+Decoding of the headers of compressed buffers without calling into C-Blosc.
+
+Every compressed buffer starts with a 16-byte header::
+
+    version (uint8), versionlz (uint8), flags (uint8), typesize (uint8),
+    nbytes (LE uint32), blocksize (LE uint32), cbytes (LE uint32)
+
+`ChunkHeader` decodes all of it at once (where `cbuffer_sizes()`,
+`cbuffer_metainfo()`, `cbuffer_versions()` and `cbuffer_complib()` need a
+call into the library each), and `scan_headers()` decodes the headers of
+many chunks of a buffer into a NumPy array in a few vectorized operations.
+"""
+
+import struct
+
+
+_HEADER = struct.Struct("<BBBBIII")
+
+# Bits of the `flags` byte
+DOSHUFFLE = 0x1
+MEMCPYED = 0x2
+DOBITSHUFFLE = 0x4
+
+# Compressor formats (the top 3 bits of `flags`) and the names of their
+# libraries, as returned by `cbuffer_complib()`
+COMPLIB_NAMES = ("BloscLZ", "LZ4", "Snappy", "Zlib", "Zstd")
+
+# The NumPy dtype matching the header layout, as returned by `scan_headers()`
+HEADER_DTYPE = [("version", "u1"), ("versionlz", "u1"), ("flags", "u1"),
+                ("typesize", "u1"), ("nbytes", "<u4"), ("blocksize", "<u4"),
+                ("cbytes", "<u4")]
+
+
+class ChunkHeader(object):
+    """
+    The decoded header of a compressed buffer.
+
+    Args:
+        buffer (object): The compressed buffer (only its first
+            MIN_HEADER_LENGTH bytes after `offset` are needed).
+            Can be any Python object that supports the buffer protocol.
+        offset (int): Where the header starts in `buffer`.
+
+    Attributes:
+        version (int): The C-Blosc format version.
+        versionlz (int): The format version of the internal compressor.
+        flags (int): The raw flags byte.
+        typesize (int): The size of the type of the items.
+        nbytes (int): The number of uncompressed bytes.
+        blocksize (int): The size of the internal blocks.
+        cbytes (int): The number of compressed bytes (header included).
+
+    Raises:
+        ValueError: If `buffer` is too short for a header.
+    """
+
+    __slots__ = ("version", "versionlz", "flags", "typesize", "nbytes", "blocksize",
+                 "cbytes")
+
+    def __init__(self, buffer, offset=0):
+        try:
+            (self.version, self.versionlz, self.flags, self.typesize, self.nbytes,
+             self.blocksize, self.cbytes) = _HEADER.unpack_from(buffer, offset)
+        except struct.error:
+            raise ValueError("Buffer too short for a blosc header")
+
+    @property
+    def shuffle(self):
+        """Whether the byte-wise shuffle filter has been applied."""
+        return bool(self.flags & DOSHUFFLE)
+
+    @property
+    def bitshuffle(self):
+        """Whether the bit-wise shuffle filter has been applied."""
+        return bool(self.flags & DOBITSHUFFLE)
+
+    @property
+    def memcpyed(self):
+        """Whether the data is stored uncompressed."""
+        return bool(self.flags & MEMCPYED)
+
+    @property
+    def compformat(self):
+        """The code of the compressor format (0 for BloscLZ, 1 for LZ4...)."""
+        return self.flags >> 5
+
+    @property
+    def complib(self):
+        """The name of the compressor library, like `cbuffer_complib()`."""
+        compformat = self.flags >> 5
+        return COMPLIB_NAMES[compformat] if compformat < len(COMPLIB_NAMES) else "Unknown"
+
+    @property
+    def nblocks(self):
+        """The number of internal blocks."""
+        return -(-self.nbytes // self.blocksize) if self.blocksize else 0
+
+    def __repr__(self):
+        return "ChunkHeader(%s)" % ", ".join(
+            "%s=%d" % (name, getattr(self, name)) for name in self.__slots__)
+
+
+def scan_headers(buffer, offsets):
+    """
+    Decode the headers of the compressed chunks at `offsets` of `buffer`.
+
+    This needs NumPy.
+
+    Args:
+        buffer (object): The buffer holding the chunks, e.g. a chunked file
+            read or mapped in memory.
+            Can be any Python object that supports the buffer protocol.
+        offsets (sequence): The offsets of the chunks in `buffer`.
+
+    Returns:
+        numpy.ndarray: A structured array with one element per chunk and
+        the fields of `HEADER_DTYPE` (`version`, `versionlz`, `flags`,
+        `typesize`, `nbytes`, `blocksize` and `cbytes`).
+
+    Raises:
+        ValueError: If some header does not fit in `buffer`.
+    """
+    import numpy as np
+
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1)
+    if len(offsets) and (offsets.min() < 0 or offsets.max() + _HEADER.size > len(data)):
+        raise ValueError("Some header does not fit in the buffer")
+    rows = data[offsets[:, np.newaxis] + np.arange(_HEADER.size)]
+    return rows.view(np.dtype(HEADER_DTYPE)).reshape(-1)
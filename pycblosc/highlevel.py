@@ -0,0 +1,145 @@
+"""
+Higher-level helpers built on top of the low-level wrappers.
+
+These functions take care of sizing the output buffers, so there is no need
+to allocate `nbytes` + MAX_OVERHEAD bytes before compressing or to call
+`cbuffer_sizes()` before decompressing.  The output buffers can also be taken
+from a `BufferPool`.
+"""
+
+from .pycblosc import (MAX_OVERHEAD, MIN_HEADER_LENGTH, SHUFFLE, compress,
+                       decompress, cbuffer_sizes)
+
+
+def _byte_view(obj):
+    """Return a flat, byte-oriented memoryview over `obj`."""
+    view = memoryview(obj)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+
+def _check_result(code, what):
+    if code < 0:
+        raise RuntimeError("Internal C-Blosc error while %s (code %d)" % (what, code))
+
+
+def compress_bytes(src, clevel=5, shuffle=SHUFFLE, typesize=None, codec=None,
+                   out=None, pool=None):
+    """
+    Compress the `src` buffer and return the compressed data.
+
+    Args:
+        src (object): The source buffer.
+            Can be any Python object that supports the buffer protocol.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        typesize (int): The size of the atomic type in `src`.  By default,
+            it is the `itemsize` of a memoryview on `src`.
+        codec (Codec): If given, compress with this codec (and its
+            `clevel` and `shuffle`) instead of using the global settings.
+        out (object): An optional buffer where the compressed data is written.
+            If it is smaller than `nbytes` + MAX_OVERHEAD, the compression
+            may fail.
+        pool (BufferPool): If given (and `out` is not), the output buffer is
+            acquired from this pool.  Give it back with `pool.release()` on
+            the returned memoryview when done.
+
+    Returns:
+        bytearray or memoryview: A bytearray with the compressed data, shrunk
+        in place to the compressed size, or a memoryview of that size on `out`
+        (or on the pooled buffer).
+
+    Raises:
+        ValueError: If the compressed data does not fit in `out`.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    view = memoryview(src)
+    nbytes = view.nbytes
+    if typesize is None:
+        typesize = view.itemsize
+    if out is None and pool is not None:
+        out = pool.acquire(nbytes + MAX_OVERHEAD)
+    else:
+        pool = None
+    try:
+        if out is None:
+            dest = bytearray(nbytes + MAX_OVERHEAD)
+        else:
+            dest = _byte_view(out)
+        if codec is None:
+            cbytes = compress(clevel, shuffle, typesize, nbytes, view, dest, len(dest))
+        else:
+            cbytes = codec.compress(typesize, nbytes, view, dest, len(dest))
+        _check_result(cbytes, "compressing")
+        if cbytes == 0:
+            raise ValueError("`out` is too small for the compressed data")
+    except Exception:
+        if pool is not None:
+            pool.release(out)
+        raise
+    if out is None:
+        del dest[cbytes:]
+        return dest
+    return dest[:cbytes]
+
+
+def decompress_bytes(src, codec=None, out=None, pool=None):
+    """
+    Decompress the `src` buffer and return the decompressed data.
+
+    Args:
+        src (object): The source buffer containing compressed data.
+            Can be any Python object that supports the buffer protocol.
+        codec (Codec): If given, decompress with the threads of this codec
+            instead of using the global settings.
+        out (object): An optional buffer where the decompressed data is
+            written.  It must be large enough for it.
+        pool (BufferPool): If given (and `out` is not), the output buffer is
+            acquired from this pool.  Give it back with `pool.release()` on
+            the returned memoryview when done.
+
+    Returns:
+        bytearray or memoryview: A new bytearray with the decompressed data,
+        or a memoryview of the decompressed size on `out` (or on the pooled
+        buffer).
+
+    Raises:
+        ValueError: If `out` is too small or `src` is not a valid compressed
+            buffer.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    srclen = len(_byte_view(src))
+    if srclen < MIN_HEADER_LENGTH:
+        raise ValueError("`src` is too small for a blosc header (%d bytes)" % srclen)
+    nbytes, cbytes, _ = cbuffer_sizes(src)
+    if not MIN_HEADER_LENGTH <= cbytes <= srclen:
+        raise ValueError("`src` is not a valid compressed buffer (cbytes=%d, %d bytes)"
+                         % (cbytes, srclen))
+    if out is None and pool is not None:
+        out = pool.acquire(nbytes)
+    else:
+        pool = None
+    try:
+        if out is None:
+            dest = bytearray(nbytes)
+        else:
+            dest = _byte_view(out)
+            if len(dest) < nbytes:
+                raise ValueError("`out` is too small for the decompressed data "
+                                 "(%d < %d bytes)" % (len(dest), nbytes))
+        if codec is None:
+            dbytes = decompress(src, dest, nbytes)
+        else:
+            dbytes = codec.decompress(src, dest, nbytes)
+        _check_result(dbytes, "decompressing")
+        if dbytes != nbytes:
+            raise ValueError("`src` is not a valid compressed buffer")
+    except Exception:
+        if pool is not None:
+            pool.release(out)
+        raise
+    if out is None:
+        return dest
+    return dest[:nbytes]
@@ -0,0 +1,177 @@
+"""
+Opt-in instrumentation of the compress, decompress and getitem calls.
+
+When enabled, every call to `compress()`, `decompress()`, `getitem()` and to
+the methods of `Codec` (and hence every higher-level function built on them)
+is counted per operation and compression library (the one recorded in the
+chunk headers, so "lz4hc" is counted as "lz4" on both sides): number of
+calls, bytes in and out, errors (zero and negative return codes), total time
+and a latency histogram.  User callbacks can also be registered for tracing.  When
+disabled (the default), the cost is a single check of a module global.
+
+Usage::
+
+    >>> from pycblosc import instrument
+    >>> instrument.enable()
+    >>> ...
+    >>> instrument.stats()["compress"]["lz4"]["ratio"]
+"""
+
+import threading
+
+from . import pycblosc
+from .pycblosc import ffi, C, get_compressor, get_complib_info
+
+
+# Upper bounds (in microseconds) of the latency histogram buckets; the last
+# bucket collects everything above the previous bound
+HISTOGRAM_BOUNDS_US = tuple(2 ** i for i in range(21)) + (float("inf"),)
+
+_lock = threading.Lock()
+_counters = {}
+_callbacks = []
+# compressor name -> (lowercase) name of its library
+_complibs = {}
+
+
+def _bucket(elapsed):
+    us = int(elapsed * 1e6)
+    return min(max(us - 1, 0).bit_length(), len(HISTOGRAM_BOUNDS_US) - 1)
+
+
+def _header_cbytes(src):
+    """Return the compressed size stored in the header of the chunk at `src`."""
+    # Pointers (from offsets) have been checked to have room for a header
+    if ffi.typeof(src).kind == "array" and len(src) < 16:
+        return 0
+    return int.from_bytes(ffi.buffer(src, 16)[12:16], "little")
+
+
+def _complib(compname):
+    """
+    Return the library of the compressor `compname`, as named by
+    `cbuffer_complib()` for the chunks it compresses (lowercased).
+    """
+    complib = _complibs.get(compname)
+    if complib is None:
+        info = get_complib_info(compname.encode())
+        complib = info[0].decode().lower() if info is not None else compname
+        _complibs[compname] = complib
+    return complib
+
+
+def _chunk_complib(src):
+    """
+    Return the (lowercase) library named in the header of the chunk at
+    `src`, or "unknown" for a short or corrupt header.
+    """
+    if ffi.typeof(src).kind == "array" and len(src) < 16:
+        return "unknown"
+    complib = C.blosc_cbuffer_complib(src)
+    if complib == ffi.NULL:
+        return "unknown"
+    return ffi.string(complib).decode().lower()
+
+
+def _record(op, codec, args, result, elapsed):
+    if op == "compress":
+        nbytes_in = args[3]
+        codec = _complib(codec if codec is not None else get_compressor())
+    else:
+        src = args[0]
+        codec = _chunk_complib(src)
+        nbytes_in = _header_cbytes(src) if op == "decompress" else 0
+    key = (op, codec)
+    with _lock:
+        counters = _counters.get(key)
+        if counters is None:
+            counters = _counters[key] = {
+                "calls": 0, "bytes_in": 0, "bytes_out": 0, "errors_zero": 0,
+                "errors_negative": 0, "time": 0.,
+                "histogram": [0] * len(HISTOGRAM_BOUNDS_US)}
+        counters["calls"] += 1
+        counters["time"] += elapsed
+        counters["histogram"][_bucket(elapsed)] += 1
+        if result > 0:
+            counters["bytes_in"] += nbytes_in
+            counters["bytes_out"] += result
+        elif result == 0:
+            counters["errors_zero"] += 1
+        else:
+            counters["errors_negative"] += 1
+    for callback in _callbacks:
+        callback(op, codec, nbytes_in, result, elapsed)
+
+
+def enable():
+    """
+    Start recording every compress, decompress and getitem call.
+    """
+    pycblosc._observer = _record
+
+
+def disable():
+    """
+    Stop recording calls.  The counters collected so far are kept.
+    """
+    pycblosc._observer = None
+
+
+def is_enabled():
+    """Return whether instrumentation is enabled."""
+    return pycblosc._observer is not None
+
+
+def reset():
+    """
+    Zero all the counters.
+    """
+    with _lock:
+        _counters.clear()
+
+
+def add_callback(callback):
+    """
+    Register a function to be called after every instrumented call.
+
+    It is called (in the calling thread) as
+    ``callback(op, codec, nbytes_in, result, elapsed)``, where `op` is
+    "compress", "decompress" or "getitem", `codec` the compression library,
+    `nbytes_in` the size of the input (0 for getitem), `result` the return
+    value of the C-Blosc call and `elapsed` its duration in seconds.
+    Callbacks only run while instrumentation is enabled.
+    """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    """
+    Unregister a function added with `add_callback()`.
+    """
+    _callbacks.remove(callback)
+
+
+def stats():
+    """
+    Get a snapshot of the counters.
+
+    Returns:
+        dict: For every operation ("compress", "decompress", "getitem"),
+        a dict keyed by compression library (like "blosclz", "lz4" or
+        "zlib") with the `calls`, `bytes_in`, `bytes_out`, `errors_zero`,
+        `errors_negative`, total `time` (seconds), mean
+        `latency` (seconds), `ratio` (uncompressed / compressed bytes, for
+        compress and decompress) and the latency `histogram` (a list of
+        counts, one per bucket in `HISTOGRAM_BOUNDS_US`).
+    """
+    snapshot = {}
+    with _lock:
+        for (op, codec), counters in _counters.items():
+            entry = dict(counters, histogram=list(counters["histogram"]))
+            entry["latency"] = entry["time"] / entry["calls"]
+            if op == "compress" and entry["bytes_out"]:
+                entry["ratio"] = entry["bytes_in"] / float(entry["bytes_out"])
+            elif op == "decompress" and entry["bytes_in"]:
+                entry["ratio"] = entry["bytes_out"] / float(entry["bytes_in"])
+            snapshot.setdefault(op, {})[codec] = entry
+    return snapshot
@@ -0,0 +1,190 @@
+"""
+Compression of NumPy arrays.
+
+`pack_array()` stores the dtype, shape and memory order of an array in a
+small header in front of the compressed data, so `unpack_array()` can
+rebuild it without the caller having to keep (or compute) that information.
+Contiguous arrays are compressed straight from their memory, and the data is
+decompressed straight into the memory of the resulting array.
+
+The packed format is::
+
+    magic (4 bytes), version (uint8), order (b"C" or b"F"), ndim (uint8),
+    length of the dtype description (LE uint16), dtype description (the
+    repr of its NumPy descr), shape (ndim LE uint64), padding up to a
+    multiple of 16 bytes, blosc chunk
+"""
+
+import ast
+import struct
+import threading
+
+import numpy as np
+from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+from .pycblosc import MAX_OVERHEAD, MIN_HEADER_LENGTH, SHUFFLE, cbuffer_sizes
+from .highlevel import _byte_view, compress_bytes, decompress_bytes
+
+
+_MAGIC = b"BLNP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBcBH")
+# Alignment (in bytes) of the arrays allocated by `unpack_array()`
+ALIGNMENT = 64
+
+_copies_lock = threading.Lock()
+_copies = {"count": 0, "nbytes": 0}
+
+
+def _pack_header(dtype, shape, order):
+    descr = repr(dtype_to_descr(dtype)).encode()
+    header = (_HEADER.pack(_MAGIC, _VERSION, order, len(shape), len(descr)) + descr
+              + struct.pack("<%dQ" % len(shape), *shape))
+    return header + b"\0" * (-len(header) % 16)
+
+
+def _unpack_header(view):
+    """Return (dtype, shape, order, header size) from the packed `view`."""
+    if len(view) < _HEADER.size:
+        raise ValueError("Buffer too small for a packed array header")
+    magic, version, order, ndim, descr_len = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _VERSION or order not in (b"C", b"F"):
+        raise ValueError("Not a packed array (or unsupported version)")
+    pos = _HEADER.size + descr_len
+    end = pos + 8 * ndim
+    if len(view) < end:
+        raise ValueError("Truncated packed array header")
+    try:
+        dtype = descr_to_dtype(ast.literal_eval(bytes(view[_HEADER.size:pos]).decode()))
+    except (ValueError, TypeError, SyntaxError, UnicodeDecodeError):
+        raise ValueError("Invalid dtype in packed array header")
+    shape = struct.unpack_from("<%dQ" % ndim, view, pos)
+    return dtype, shape, order.decode(), end + (-end % 16)
+
+
+def _aligned_empty(shape, dtype, order):
+    """Return an empty array whose data starts at a multiple of ALIGNMENT."""
+    nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    raw = np.empty(nbytes + ALIGNMENT, dtype=np.uint8)
+    start = -raw.ctypes.data % ALIGNMENT
+    flat = raw[start:start + nbytes].view(dtype)
+    return flat.reshape(shape, order=order)
+
+
+def _flat_bytes(arr):
+    """Return a flat uint8 view over the memory of the contiguous `arr`."""
+    return arr.reshape(-1, order="A").view(np.uint8)
+
+
+def _contiguous(arr):
+    """
+    Return `arr` and its order (b"C" or b"F"), or a C-contiguous copy if it
+    is neither, counting the copy in `array_copy_stats()`.
+    """
+    if arr.flags.c_contiguous:
+        return arr, b"C"
+    if arr.flags.f_contiguous:
+        return arr, b"F"
+    arr = np.ascontiguousarray(arr)
+    with _copies_lock:
+        _copies["count"] += 1
+        _copies["nbytes"] += arr.nbytes
+    return arr, b"C"
+
+
+def _pack(arr, order, clevel, shuffle, codec, prefix=b""):
+    """
+    Pack the contiguous `arr` after `prefix`, compressing it straight into
+    the result.
+    """
+    header = prefix + _pack_header(arr.dtype, arr.shape, order)
+    src = _flat_bytes(arr)
+    packed = bytearray(len(header) + src.nbytes + MAX_OVERHEAD)
+    packed[:len(header)] = header
+    with memoryview(packed) as view:
+        cbytes = len(compress_bytes(src, clevel, shuffle, arr.dtype.itemsize, codec,
+                                    out=view[len(header):]))
+    del packed[len(header) + cbytes:]
+    return packed
+
+
+def pack_array(arr, clevel=5, shuffle=SHUFFLE, codec=None):
+    """
+    Compress a NumPy array, together with its dtype, shape and order.
+
+    The `typesize` is taken from the dtype.  C- and Fortran-contiguous
+    arrays are compressed without copies; other arrays are made
+    C-contiguous with a single copy, which is counted in
+    `array_copy_stats()`.
+
+    Args:
+        arr (numpy.ndarray): The array to compress.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        codec (Codec): If given, compress with this codec (and its
+            `clevel` and `shuffle`) instead of using the global settings.
+
+    Returns:
+        bytearray: The packed array, to be passed to `unpack_array()`.
+
+    Raises:
+        ValueError: If the dtype holds Python objects.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    arr = np.asanyarray(arr)
+    if arr.dtype.hasobject:
+        raise ValueError("Arrays of Python objects cannot be packed")
+    arr, order = _contiguous(arr)
+    return _pack(arr, order, clevel, shuffle, codec)
+
+
+def unpack_array(buf, out=None, codec=None):
+    """
+    Decompress an array packed with `pack_array()`.
+
+    Args:
+        buf (object): The packed array.
+            Can be any Python object that supports the buffer protocol.
+        out (numpy.ndarray): An optional array where the data is written.
+            It must have the packed dtype and shape, and be writeable and
+            contiguous in the packed order.
+        codec (Codec): If given, decompress with the threads of this codec
+            instead of using the global settings.
+
+    Returns:
+        numpy.ndarray: `out`, or a new array aligned to ALIGNMENT bytes,
+        with the packed dtype, shape and order.
+
+    Raises:
+        ValueError: If `buf` is not a valid packed array, or if `out` does
+            not match it.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    view = _byte_view(buf)
+    dtype, shape, order, offset = _unpack_header(view)
+    chunk = view[offset:]
+    nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    if len(chunk) < MIN_HEADER_LENGTH or cbuffer_sizes(chunk)[0] != nbytes:
+        raise ValueError("The packed data does not match the array header")
+    if out is None:
+        out = _aligned_empty(shape, dtype, order)
+    else:
+        contiguous = out.flags.c_contiguous if order == "C" else out.flags.f_contiguous
+        if out.dtype != dtype or out.shape != shape:
+            raise ValueError("`out` must have dtype %s and shape %s" % (dtype, shape))
+        if not (contiguous and out.flags.writeable):
+            raise ValueError("`out` must be writeable and %s-contiguous" % order)
+    decompress_bytes(chunk, codec, out=_flat_bytes(out))
+    return out
+
+
+def array_copy_stats():
+    """
+    Return how many copies of non-contiguous arrays `pack_array()` made.
+
+    Returns:
+        dict: The number of copies (`count`) and the bytes copied (`nbytes`).
+    """
+    with _copies_lock:
+        return dict(_copies)
@@ -0,0 +1,209 @@
+"""
+Packing of many small messages into a single compressed chunk.
+
+Compressing tiny records one at a time gives poor ratios (every chunk pays
+the MAX_OVERHEAD bytes of its header, and there is little data for the
+compressor to find repetitions in) and pays the cost of a call for each of
+them.  A `MessagePacker` accumulates records and compresses them together,
+with an offsets table so that they can be split again, or fetched one by one
+without decompressing the whole batch.
+
+The uncompressed layout of a batch is::
+
+    [record 0][record 1]...[record n-1][offsets][n]
+
+where the offsets are n + 1 LE uint32 positions of the records and n is a
+LE uint32.
+"""
+
+import sys
+import time
+from array import array
+
+from .pycblosc import MAX_OVERHEAD, SHUFFLE
+from .highlevel import _byte_view, _check_result
+from .header import ChunkHeader
+from .batch import _default_codec
+from .bloscfile import _read_range
+
+
+def _pack_uint32(values):
+    values = array('I', values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack_uint32(buf):
+    values = array('I')
+    values.frombytes(buf)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class MessagePacker(object):
+    """
+    Accumulate small records and compress them together in batches.
+
+    A batch is emitted when the records added reach `max_bytes`, when
+    `max_delay` seconds have passed since the first record of the batch
+    (checked on `add()` and `poll()`), or on `flush()`.
+
+    Args:
+        max_bytes (int): The size of the records that triggers a batch.
+        max_delay (float): The maximum age (in seconds) of a pending record
+            before its batch is emitted.  None means no limit.
+        clevel (int): The compression level.
+        shuffle (int): The shuffle filter.
+        typesize (int): The typesize used for compressing (records are
+            treated as plain bytes by default).
+        codec (Codec): A codec to use instead of `clevel` and `shuffle`
+            plus the global compressor and blocksize.
+    """
+
+    def __init__(self, max_bytes=64 * 1024, max_delay=None, clevel=5, shuffle=SHUFFLE,
+                 typesize=1, codec=None):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.typesize = typesize
+        self.codec = codec if codec is not None else _default_codec(clevel, shuffle)
+        self._staging = bytearray()
+        self._offsets = array('I', [0])
+        self._since = None
+
+    def __len__(self):
+        """The number of pending records."""
+        return len(self._offsets) - 1
+
+    @property
+    def pending_bytes(self):
+        """The size of the pending records."""
+        return len(self._staging)
+
+    def add(self, record):
+        """
+        Add a record (any bytes-like object) to the current batch.
+
+        Returns:
+            bytearray: The compressed batch if this record completed one
+            (see `max_bytes` and `max_delay`), else None.
+        """
+        if len(self._offsets) == 1:
+            self._since = time.monotonic()
+        self._staging += _byte_view(record)
+        self._offsets.append(len(self._staging))
+        if len(self._staging) >= self.max_bytes:
+            return self.flush()
+        return self.poll()
+
+    def poll(self):
+        """
+        Emit the current batch if its first record is older than `max_delay`.
+
+        Returns:
+            bytearray: The compressed batch, or None.
+        """
+        if (self.max_delay is not None and len(self._offsets) > 1
+                and time.monotonic() - self._since >= self.max_delay):
+            return self.flush()
+        return None
+
+    def flush(self):
+        """
+        Compress the pending records as a batch.
+
+        Returns:
+            bytearray: The compressed batch, or None if there are no
+            pending records.
+
+        Raises:
+            RuntimeError: If C-Blosc reports an internal error.
+        """
+        n = len(self._offsets) - 1
+        if not n:
+            return None
+        data = self._staging
+        end = len(data)
+        data += _pack_uint32(self._offsets)
+        data += _pack_uint32([n])
+        nbytes = len(data)
+        dest = bytearray(nbytes + MAX_OVERHEAD)
+        try:
+            cbytes = self.codec.compress(self.typesize, nbytes, data, dest, len(dest))
+            _check_result(cbytes, "compressing")
+        except BaseException:
+            # Drop the offsets table, so that the records are still pending
+            del data[end:]
+            raise
+        del dest[cbytes:]
+        self._staging = bytearray()
+        self._offsets = array('I', [0])
+        self._since = None
+        return dest
+
+    def unpack(self, batch):
+        """
+        Decompress a batch and split it into its records.
+
+        Returns:
+            list: A memoryview per record, all of them on a single buffer
+            with the decompressed batch (records are not copied).
+
+        Raises:
+            ValueError: If `batch` is not a valid batch.
+            RuntimeError: If C-Blosc reports an internal error.
+        """
+        nbytes = ChunkHeader(batch).nbytes
+        if nbytes < 8:
+            raise ValueError("Not a batch of messages")
+        data = bytearray(nbytes)
+        dbytes = self.codec.decompress(batch, data, nbytes)
+        _check_result(dbytes, "decompressing")
+        if dbytes != nbytes:
+            raise ValueError("Not a valid compressed buffer")
+        view = memoryview(data)
+        n = _unpack_uint32(view[nbytes - 4:])[0]
+        table = nbytes - 4 - 4 * (n + 1)
+        if table < 0:
+            raise ValueError("Not a batch of messages")
+        offsets = _unpack_uint32(view[table:nbytes - 4])
+        if offsets[-1] != table:
+            raise ValueError("Not a batch of messages")
+        return [view[offsets[i]:offsets[i + 1]] for i in range(n)]
+
+    def getitem(self, batch, i):
+        """
+        Get record `i` of a batch, decompressing only the blocks involved.
+
+        Returns:
+            bytearray: The record.
+
+        Raises:
+            IndexError: If there is no record `i`.
+            ValueError: If `batch` is not a valid batch.
+            RuntimeError: If C-Blosc reports an internal error.
+        """
+        nbytes = ChunkHeader(batch).nbytes
+        if nbytes < 8:
+            raise ValueError("Not a batch of messages")
+        view = _byte_view(batch)
+        tail = bytearray(4)
+        _read_range(view, nbytes, nbytes - 4, tail, self.codec)
+        n = _unpack_uint32(tail)[0]
+        table = nbytes - 4 - 4 * (n + 1)
+        if table < 0:
+            raise ValueError("Not a batch of messages")
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("Record index out of range")
+        pair = bytearray(8)
+        _read_range(view, nbytes, table + 4 * i, pair, self.codec)
+        start, stop = _unpack_uint32(pair)
+        if not start <= stop <= table:
+            raise ValueError("Not a batch of messages")
+        record = bytearray(stop - start)
+        if record:
+            _read_range(view, nbytes, start, record, self.codec)
+        return record
@@ -0,0 +1,154 @@
+"""
+Compression of huge buffers with a pool of processes.
+
+The internal threads of C-Blosc stop scaling past a single socket, and they
+compete with other CPU-bound Python work for the same process.  Here the
+source is placed in shared memory and worker processes compress disjoint
+chunks of it straight into a shared output region, so only small
+descriptions of the work (and the compressed sizes) cross process
+boundaries.  The result is a chunked container in the format of `BloscFile`,
+which can be read with `BloscFile` or `MappedBloscFile`.
+"""
+
+import os
+from array import array
+from multiprocessing import shared_memory
+
+from .pycblosc import MAX_OVERHEAD, SHUFFLE, Codec, get_blocksize, get_compressor
+from .highlevel import _byte_view, _check_result
+from .bloscfile import _pack_index
+
+
+def _compress_chunks(src_name, dest_name, nbytes, chunksize, first, last, settings):
+    """
+    Compress chunks [`first`, `last`) of the shared source into their slots
+    of the shared destination.  This runs in the worker processes.
+
+    Returns:
+        list: The compressed size of every chunk.
+    """
+    clevel, shuffle, compressor, blocksize, typesize = settings
+    codec = Codec(clevel, shuffle, compressor, blocksize, 1)
+    slotsize = chunksize + MAX_OVERHEAD
+    src_shm = shared_memory.SharedMemory(src_name)
+    dest_shm = shared_memory.SharedMemory(dest_name)
+    try:
+        src = src_shm.buf
+        dest = dest_shm.buf
+        cbytes = []
+        for i in range(first, last):
+            start = i * chunksize
+            stop = min(start + chunksize, nbytes)
+            cbytes.append(codec.compress(typesize, stop - start, src, dest, slotsize,
+                                         src_offset=start, dest_offset=i * slotsize))
+        del src, dest
+        return cbytes
+    finally:
+        src_shm.close()
+        dest_shm.close()
+
+
+def parallel_compress(src, nworkers=None, chunksize=2**22, clevel=5, shuffle=SHUFFLE,
+                      typesize=None, compressor=None, file=None, executor=None):
+    """
+    Compress a (huge) buffer into a chunked container using worker processes.
+
+    Args:
+        src (object): The source buffer, e.g. a NumPy array.
+            Can be any Python object that supports the buffer protocol.
+        nworkers (int): The number of worker processes.  Defaults to the
+            number of cores.
+        chunksize (int): The number of uncompressed bytes per chunk.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        typesize (int): The size of the atomic type in `src`.  By default,
+            it is the `itemsize` of a memoryview on `src`.
+        compressor (str): The compressor name.  Defaults to the global one.
+        file (str or file object): If given, the container is written there
+            instead of being returned.
+        executor (concurrent.futures.Executor): An executor (normally a
+            `ProcessPoolExecutor`) to run the work in.  By default, a new
+            process pool with `nworkers` processes is used for this call.
+
+    Returns:
+        bytearray or int: The chunked container, or the number of bytes
+        written to `file` if given.
+
+    Raises:
+        ValueError: If `chunksize` is not positive.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    if chunksize <= 0:
+        raise ValueError("`chunksize` must be positive")
+    view = memoryview(src)
+    if typesize is None:
+        typesize = view.itemsize
+    view = _byte_view(view)
+    nbytes = len(view)
+    nchunks = -(-nbytes // chunksize)
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    settings = (clevel, shuffle, compressor or get_compressor(), get_blocksize(), typesize)
+    slotsize = chunksize + MAX_OVERHEAD
+
+    src_shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    dest_shm = shared_memory.SharedMemory(create=True, size=max(nchunks * slotsize, 1))
+    try:
+        src_shm.buf[:nbytes] = view
+        ntasks = max(min(nworkers, nchunks), 1)
+        bounds = [nchunks * i // ntasks for i in range(ntasks + 1)]
+        tasks = [(src_shm.name, dest_shm.name, nbytes, chunksize, bounds[i], bounds[i + 1],
+                  settings) for i in range(ntasks)]
+        if ntasks == 1 and executor is None:
+            results = [_compress_chunks(*tasks[0])]
+        else:
+            own_executor = executor is None
+            if own_executor:
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(max_workers=nworkers)
+            try:
+                futures = [executor.submit(_compress_chunks, *task) for task in tasks]
+                results = [future.result() for future in futures]
+            finally:
+                if own_executor:
+                    executor.shutdown()
+        cbytes = [size for result in results for size in result]
+        for size in cbytes:
+            _check_result(size, "compressing")
+
+        offsets = array('Q', [0])
+        for size in cbytes:
+            offsets.append(offsets[-1] + size)
+        index = _pack_index(offsets, chunksize, nbytes)
+        dest = dest_shm.buf
+        slots = [dest[i * slotsize:i * slotsize + cbytes[i]] for i in range(nchunks)]
+        try:
+            if file is None:
+                container = bytearray(offsets[-1] + len(index))
+                for i, slot in enumerate(slots):
+                    container[offsets[i]:offsets[i + 1]] = slot
+                container[offsets[-1]:] = index
+                return container
+            if isinstance(file, (str, bytes)):
+                with open(file, "wb") as f:
+                    return _write_container(f, slots, index)
+            return _write_container(file, slots, index)
+        finally:
+            for slot in slots:
+                slot.release()
+            del dest
+    finally:
+        src_shm.close()
+        src_shm.unlink()
+        dest_shm.close()
+        dest_shm.unlink()
+
+
+def _write_container(f, slots, index):
+    written = 0
+    for slot in slots:
+        f.write(slot)
+        written += len(slot)
+    f.write(index)
+    return written + len(index)
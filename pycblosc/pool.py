@@ -0,0 +1,130 @@
+"""
+A pool of reusable destination buffers.
+
+Allocating a fresh destination for every compressed or decompressed message
+puts pressure on the allocator and fragments memory.  A `BufferPool` hands
+out `bytearray` objects rounded up to a few size classes and takes them back
+when the caller is done, so steady-state traffic does not allocate at all.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class BufferPool(object):
+    """
+    A thread-safe pool of `bytearray` buffers grouped in size classes.
+
+    Buffer sizes are rounded up to size classes (4 classes per power of two,
+    starting at `min_size`), so that a released buffer can serve later
+    requests of similar sizes.  Free buffers are kept up to `max_bytes`;
+    beyond that, the least recently released ones are evicted.
+
+    Args:
+        max_bytes (int): The maximum amount of memory kept in free buffers.
+        min_size (int): The smallest size class.
+
+    Attributes:
+        hits (int): Number of `acquire()` calls served from the pool.
+        misses (int): Number of `acquire()` calls that had to allocate.
+        evictions (int): Number of free buffers dropped to honor `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20, min_size=4096):
+        self.max_bytes = max_bytes
+        self.min_size = min_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Free buffers per size class, and all of them in LRU order
+        self._classes = {}
+        self._lru = OrderedDict()
+        self._nbytes = 0
+
+    def size_class(self, nbytes):
+        """
+        Return the size of the buffers used for requests of `nbytes`.
+        """
+        if nbytes <= self.min_size:
+            return self.min_size
+        base = 1 << ((nbytes - 1).bit_length() - 1)
+        step = max(base // 4, 1)
+        return base + -(-(nbytes - base) // step) * step
+
+    @property
+    def nbytes(self):
+        """The amount of memory currently kept in free buffers."""
+        return self._nbytes
+
+    def acquire(self, nbytes):
+        """
+        Get a buffer of at least `nbytes` from the pool.
+
+        Returns:
+            bytearray: A buffer with the size of the class for `nbytes`.
+            Its contents are undefined.
+        """
+        size = self.size_class(nbytes)
+        with self._lock:
+            free = self._classes.get(size)
+            if free:
+                key, buf = free.popitem()
+                del self._lru[key]
+                self._nbytes -= size
+                self.hits += 1
+                return buf
+            self.misses += 1
+        return bytearray(size)
+
+    def release(self, buf):
+        """
+        Give a buffer obtained with `acquire()` back to the pool.
+
+        Args:
+            buf (bytearray or memoryview): The buffer, or a memoryview on it
+                (like the ones returned by the helpers when using a pool).
+                The buffer must not be used after releasing it.
+
+        Raises:
+            ValueError: If `buf` has not been obtained from this pool.
+        """
+        if isinstance(buf, memoryview):
+            buf = buf.obj
+        size = len(buf)
+        if not isinstance(buf, bytearray) or self.size_class(size) != size:
+            raise ValueError("The buffer does not come from this pool")
+        key = id(buf)
+        with self._lock:
+            if key in self._lru:
+                return
+            self._classes.setdefault(size, OrderedDict())[key] = buf
+            self._lru[key] = size
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                old_key, old_size = self._lru.popitem(last=False)
+                del self._classes[old_size][old_key]
+                self._nbytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop all the free buffers in the pool.
+        """
+        with self._lock:
+            self._classes.clear()
+            self._lru.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """
+        Get a snapshot of the pool counters.
+
+        Returns:
+            dict: The `hits`, `misses`, `evictions`, the number of free
+            `buffers` and the `nbytes` kept in them.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "buffers": len(self._lru),
+                    "nbytes": self._nbytes}
@@ -7,61 +7,39 @@ to usual Python idioms.
 For a detailed info, see the docstrings on the different functions.
 """
 
-from cffi import FFI
 
+import os as _os
+from time import perf_counter as _perf_counter
 
-ffi = FFI()
-ffi.cdef(
-    """
-    void blosc_init(void);
-
-    void blosc_destroy(void);
-
-    int blosc_compress(int clevel, int doshuffle, size_t typesize, size_t nbytes,
-                       const void* src, void* dest, size_t destsize);
-
-    int blosc_decompress(const void* src, void* dest, size_t destsize);
-
-    int blosc_getitem(const void* src, int start, int nitems, void* dest);
-
-    int blosc_get_nthreads(void);
-
-    int blosc_set_nthreads(int nthreads);
-
-    char* blosc_get_compressor(void);
-
-    int blosc_set_compressor(const char* compname);
-
-    int blosc_compcode_to_compname(int compcode, char** compname);
-
-    int blosc_compname_to_compcode(const char* compname);
-
-    char* blosc_list_compressors(void);
 
-    char* blosc_get_version_string(void);
+def _bundled_library():
+    """Return the absolute path of the C-Blosc library shipped with the package, if any."""
+    here = _os.path.dirname(_os.path.abspath(__file__))
+    for name in sorted(_os.listdir(here)):
+        if name.startswith("libblosc.") or name in ("blosc.dll", "libblosc.dll"):
+            return _os.path.join(here, name)
+    return None
 
-    int blosc_get_complib_info(char* compname, char** complib, char** version);
 
-    int blosc_free_resources(void);
+def _dlopen_abi():
+    """Load the C-Blosc library in CFFI ABI mode (no compiler needed)."""
+    from cffi import FFI
+    from ._build_ffi import CDEF
+    ffi = FFI()
+    ffi.cdef(CDEF)
+    # Setting LD_LIBRARY_PATH from a running process has no effect on
+    # dlopen(), so load a bundled library by its absolute path instead.
+    return ffi, ffi.dlopen(_bundled_library() or "blosc")
 
-    void blosc_cbuffer_sizes(const void* cbuffer, size_t* nbytes, size_t* cbytes,
-                             size_t* blocksize);
 
-    void blosc_cbuffer_metainfo(const void* cbuffer, size_t* typesize, int* flags);
-
-    void blosc_cbuffer_versions(const void* cbuffer, int* version, int* versionlz);
-
-    char* blosc_cbuffer_complib(const void* cbuffer);
-
-    int blosc_get_blocksize(void);
-
-    void blosc_set_blocksize(size_t blocksize);
-
-    void blosc_set_splitmode(int splitmode);
-    """
-)
-
-C = ffi.dlopen("blosc")
+# Prefer the compiled API-mode extension, which is faster to import and to
+# call, and fall back to ABI mode when it has not been built.
+try:
+    from ._cblosc import ffi, lib as C
+    FFI_MODE = "api"
+except ImportError:
+    ffi, C = _dlopen_abi()
+    FFI_MODE = "abi"
 
 # Most used constants
 MIN_HEADER_LENGTH = 16
@@ -74,6 +52,33 @@ NEVER_SPLIT = 2
 AUTO_SPLIT = 3
 FORWARD_COMPAT_SPLIT = 4
 
+_splitmode = FORWARD_COMPAT_SPLIT
+
+# Set by `pycblosc.instrument.enable()` to a function receiving
+# (op, codec, args, result, elapsed) after every call; None when disabled
+_observer = None
+
+
+def _observed(op, codec, func, *args):
+    """Call `func(*args)` and report it to the observer."""
+    observer = _observer
+    t0 = _perf_counter()
+    result = func(*args)
+    if observer is not None:
+        observer(op, codec, args, result, _perf_counter() - t0)
+    return result
+
+
+def _offset(ptr, offset, size, name):
+    """
+    Return `ptr` + `offset`, checking that `size` bytes from there are still
+    inside the buffer `ptr` points to.
+    """
+    if offset < 0 or offset + size > len(ptr):
+        raise ValueError("`%s` out of bounds (%d + %d > %d bytes)"
+                         % (name, offset, size, len(ptr)))
+    return ptr + offset
+
 
 def init():
     """
@@ -103,7 +108,8 @@ def destroy():
     return C.blosc_destroy()
 
 
-def compress(clevel, doshuffle, typesize, nbytes, src, dest, destsize):
+def compress(clevel, doshuffle, typesize, nbytes, src, dest, destsize, src_offset=0,
+             dest_offset=0):
     """
     Compress a block of data in the `src` buffer to `dest` buffer.
 
@@ -132,6 +138,9 @@ def compress(clevel, doshuffle, typesize, nbytes, src, dest, destsize):
             (`nbytes` + MAX_OVERHEAD), the compression will always succeed.
             The `src` buffer and the `dest` buffer can not overlap.
         destsize (int): The size of `dest` buffer in bytes.
+        src_offset (int): Where the data to compress starts in `src`.
+        dest_offset (int): Where to write the compressed data in `dest`.
+            `destsize` counts from there.
 
     Returns:
         int: The size of the compressed block.
@@ -185,10 +194,16 @@ def compress(clevel, doshuffle, typesize, nbytes, src, dest, destsize):
     """
     src = ffi.from_buffer(src)
     dest = ffi.from_buffer(dest)
-    return C.blosc_compress(clevel, doshuffle, typesize, nbytes, src, dest, destsize)
+    if src_offset or dest_offset:
+        src = _offset(src, src_offset, nbytes, "src_offset")
+        dest = _offset(dest, dest_offset, destsize, "dest_offset")
+    if _observer is None:
+        return C.blosc_compress(clevel, doshuffle, typesize, nbytes, src, dest, destsize)
+    return _observed("compress", None, C.blosc_compress,
+                     clevel, doshuffle, typesize, nbytes, src, dest, destsize)
 
 
-def decompress(src, dest, destsize):
+def decompress(src, dest, destsize, src_offset=0, dest_offset=0):
     """
     Decompress a block of compressed data in the `src` buffer to `dest` buffer.
 
@@ -203,6 +218,9 @@ def decompress(src, dest, destsize):
         dest (object): The destination buffer.
             Can be any Python object that supports the buffer protocol.
         destsize (int): The size of `dest` buffer in bytes.
+        src_offset (int): Where the compressed data starts in `src`.
+        dest_offset (int): Where to write the decompressed data in `dest`.
+            `destsize` counts from there.
 
     Returns:
         int: The size of the decompressed block
@@ -226,10 +244,15 @@ def decompress(src, dest, destsize):
     """
     src = ffi.from_buffer(src)
     dest = ffi.from_buffer(dest)
-    return C.blosc_decompress(src, dest, destsize)
+    if src_offset or dest_offset:
+        src = _offset(src, src_offset, MIN_HEADER_LENGTH, "src_offset")
+        dest = _offset(dest, dest_offset, destsize, "dest_offset")
+    if _observer is None:
+        return C.blosc_decompress(src, dest, destsize)
+    return _observed("decompress", None, C.blosc_decompress, src, dest, destsize)
 
 
-def getitem(src, start, nitems, dest):
+def getitem(src, start, nitems, dest, src_offset=0, dest_offset=0):
     """
     Get `nitems` (of typesize size) in `src` buffer starting in `start`.
 
@@ -243,14 +266,32 @@ def getitem(src, start, nitems, dest):
         nitems (int): The number of items to fetch.
         dest (object): The destination buffer.
             Can be any Python object that supports the buffer protocol.
+        src_offset (int): Where the compressed data starts in `src`.
+        dest_offset (int): Where to write the items in `dest`.
 
     Returns:
         int: The number of bytes copied to `dest` or a negative value if
         some error happens.
+
+    Raises:
+        ValueError: If `src` is too short for a header, or `dest` is too
+            small for the items.
     """
     src = ffi.from_buffer(src)
     dest = ffi.from_buffer(dest)
-    return C.blosc_getitem(src, start, nitems, dest)
+    if len(src) - src_offset < MIN_HEADER_LENGTH:
+        raise ValueError("`src` is too small for a blosc header")
+    # The typesize is the 4th byte of the header
+    typesize = ord(src[src_offset + 3])
+    if nitems > 0 and nitems * typesize > len(dest) - dest_offset:
+        raise ValueError("`dest` is too small for the items (%d < %d bytes)"
+                         % (len(dest) - dest_offset, nitems * typesize))
+    if src_offset or dest_offset:
+        src = _offset(src, src_offset, MIN_HEADER_LENGTH, "src_offset")
+        dest = _offset(dest, dest_offset, 0, "dest_offset")
+    if _observer is None:
+        return C.blosc_getitem(src, start, nitems, dest)
+    return _observed("getitem", None, C.blosc_getitem, src, start, nitems, dest)
 
 
 def get_nthreads():
@@ -326,7 +367,7 @@ def compcode_to_compname(compcode):
         If the compressor name is not recognized, or there is not support
         for it in this build, `None` is returned instead.
     """
-    compname = ffi.new("char **")
+    compname = ffi.new("const char **")
     code = C.blosc_compcode_to_compname(compcode, compname)
     if code < 0:
         return None
@@ -564,6 +605,144 @@ def set_splitmode(splitmode):
         None
 
     """
+    global _splitmode
+    _splitmode = splitmode
     return C.blosc_set_splitmode(splitmode)
 
 
+def get_splitmode():
+    """
+    Get the split mode.
+
+    C-Blosc does not provide a getter for this, so this is the last value
+    passed to `set_splitmode()` (note that the BLOSC_SPLITMODE environment
+    variable still overrides it during compression).
+
+    Returns:
+        int: The split mode.
+    """
+    return _splitmode
+
+
+
+
+class Codec(object):
+    """
+    A compression context with its own settings.
+
+    Unlike `compress()` and `decompress()`, which work through the global
+    state of the C-Blosc library (and hence are serialized by its global
+    lock), a `Codec` keeps its compression level, shuffle filter, compressor,
+    blocksize and number of internal threads to itself, and calls the
+    `blosc_compress_ctx()` / `blosc_decompress_ctx()` entry points.  This means
+    that different Python threads can use different codecs (or the same one)
+    at the same time, and they will actually run in parallel because the GIL
+    is released during the C calls.
+
+    Args:
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        compressor (str): The name of the compressor to be used.
+        blocksize (int): The internal blocksize.  If 0, an automatic
+            blocksize will be used (the default).
+        nthreads (int): The number of internal threads to be used.
+
+    Raises:
+        ValueError: If the compressor is not supported in this build.
+
+    Note:
+        The split mode is not part of the context in C-Blosc, so the value
+        set with `set_splitmode()` still applies to codecs.
+    """
+
+    def __init__(self, clevel=5, shuffle=SHUFFLE, compressor="blosclz",
+                 blocksize=0, nthreads=1):
+        self.clevel = clevel
+        self.shuffle = shuffle
+        self.compressor = compressor
+        self.blocksize = blocksize
+        self.nthreads = nthreads
+
+    @property
+    def compressor(self):
+        """The name of the compressor used by this codec."""
+        return self._compname.decode()
+
+    @compressor.setter
+    def compressor(self, compname):
+        if isinstance(compname, str):
+            compname = compname.encode()
+        if compname_to_compcode(compname) < 0:
+            raise ValueError("Compressor '%s' is not supported in this build"
+                             % compname.decode())
+        self._compname = compname
+
+    def __repr__(self):
+        return ("Codec(clevel=%d, shuffle=%d, compressor=%r, blocksize=%d, nthreads=%d)"
+                % (self.clevel, self.shuffle, self.compressor, self.blocksize,
+                   self.nthreads))
+
+    def compress(self, typesize, nbytes, src, dest, destsize, src_offset=0, dest_offset=0):
+        """
+        Compress a block of data in the `src` buffer to `dest` buffer.
+
+        This is the same as the `compress()` function, but using the
+        settings of this codec.
+
+        Args:
+            typesize (int): The number of bytes for the atomic type in `src`.
+            nbytes (int): The size of `src` buffer in bytes.
+            src (object): The source buffer.
+            dest (object): The destination buffer.  Setting `destsize` to, at
+                least, (`nbytes` + MAX_OVERHEAD) ensures that the compression
+                will always succeed.
+            destsize (int): The size of `dest` buffer in bytes.
+            src_offset (int): Where the data to compress starts in `src`.
+            dest_offset (int): Where to write the compressed data in `dest`.
+
+        Returns:
+            int: The size of the compressed block, 0 if `src` cannot be
+            compressed into `destsize`, or a negative value if an internal
+            error happened.
+        """
+        src = ffi.from_buffer(src)
+        dest = ffi.from_buffer(dest)
+        if src_offset or dest_offset:
+            src = _offset(src, src_offset, nbytes, "src_offset")
+            dest = _offset(dest, dest_offset, destsize, "dest_offset")
+        if _observer is None:
+            return C.blosc_compress_ctx(self.clevel, self.shuffle, typesize, nbytes,
+                                        src, dest, destsize, self._compname,
+                                        self.blocksize, self.nthreads)
+        return _observed("compress", self.compressor, C.blosc_compress_ctx,
+                         self.clevel, self.shuffle, typesize, nbytes, src, dest,
+                         destsize, self._compname, self.blocksize, self.nthreads)
+
+    def decompress(self, src, dest, destsize, src_offset=0, dest_offset=0):
+        """
+        Decompress a block of compressed data in the `src` buffer to `dest` buffer.
+
+        This is the same as the `decompress()` function, but using the
+        number of threads of this codec.
+
+        Args:
+            src (object): The source buffer containing compressed data.
+            dest (object): The destination buffer.
+            destsize (int): The size of `dest` buffer in bytes.
+            src_offset (int): Where the compressed data starts in `src`.
+            dest_offset (int): Where to write the decompressed data in `dest`.
+
+        Returns:
+            int: The size of the decompressed block, or 0 (zero) or a negative
+            value if an error occurs.
+        """
+        src = ffi.from_buffer(src)
+        dest = ffi.from_buffer(dest)
+        if src_offset or dest_offset:
+            src = _offset(src, src_offset, MIN_HEADER_LENGTH, "src_offset")
+            dest = _offset(dest, dest_offset, destsize, "dest_offset")
+        if _observer is None:
+            return C.blosc_decompress_ctx(src, dest, destsize, self.nthreads)
+        return _observed("decompress", None, C.blosc_decompress_ctx,
+                         src, dest, destsize, self.nthreads)
@@ -0,0 +1,132 @@
+"""
+Pickling with compressed out-of-band buffers.
+
+With pickle protocol 5, objects holding large buffers (like NumPy arrays)
+hand them out as `pickle.PickleBuffer` objects instead of copying them into
+the pickle stream.  `dumps()` compresses every such buffer straight from the
+memory of its object, with the `typesize` of its items, and `loads()`
+decompresses every buffer into a fresh bytearray that becomes the memory of
+the unpickled object, so no copy is made besides the decompression itself.
+
+The serialized format is::
+
+    magic (b"BLPK"), version (uint8), 3 padding bytes, number of
+    buffers (LE uint32), pickle stream (a blosc chunk), buffers (a blosc
+    chunk each)
+"""
+
+import pickle
+import struct
+
+from .pycblosc import MAX_OVERHEAD, MIN_HEADER_LENGTH, SHUFFLE, cbuffer_sizes
+from .highlevel import _byte_view, compress_bytes, decompress_bytes
+from .batch import _default_codec
+
+
+_MAGIC = b"BLPK"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBxxxI")
+# C-Blosc only shuffles types of up to this size
+_MAX_TYPESIZE = 255
+
+
+def dumps(obj, clevel=5, shuffle=SHUFFLE, codec=None):
+    """
+    Pickle `obj` (with protocol 5), compressing its out-of-band buffers.
+
+    Args:
+        obj (object): The object to pickle.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        codec (Codec): If given, compress with this codec (and its
+            `clevel`, `shuffle` and threads) instead of using the global
+            compressor and blocksize.
+
+    Returns:
+        bytearray: The serialized object, to be passed to `loads()`.
+
+    Raises:
+        pickle.PicklingError: If `obj` cannot be pickled.
+        RuntimeError: If C-Blosc reports an internal error.
+    """
+    if codec is None:
+        codec = _default_codec(clevel, shuffle)
+    buffers = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    views = [stream]
+    typesizes = [1]
+    for buf in buffers:
+        # The raw view is flat, but the original one knows the item size
+        with memoryview(buf) as original:
+            itemsize = original.itemsize
+        views.append(buf.raw())
+        typesizes.append(itemsize if itemsize <= _MAX_TYPESIZE else 1)
+    # Compress everything straight into its place in the result
+    out = bytearray(_HEADER.size + sum(len(view) + MAX_OVERHEAD for view in views))
+    _HEADER.pack_into(out, 0, _MAGIC, _VERSION, len(buffers))
+    pos = _HEADER.size
+    with memoryview(out) as dest:
+        for view, typesize in zip(views, typesizes):
+            cbytes = len(compress_bytes(view, typesize=typesize, codec=codec,
+                                        out=dest[pos:pos + len(view) + MAX_OVERHEAD]))
+            pos += cbytes
+    for view, buf in zip(views[1:], buffers):
+        view.release()
+        buf.release()
+    del out[pos:]
+    return out
+
+
+def _chunks(view, n):
+    """Yield the `n` consecutive blosc chunks in `view`."""
+    pos = 0
+    for i in range(n):
+        if len(view) - pos < MIN_HEADER_LENGTH:
+            raise ValueError("Truncated serialized data")
+        cbytes = cbuffer_sizes(view[pos:pos + MIN_HEADER_LENGTH])[1]
+        if cbytes < MIN_HEADER_LENGTH or pos + cbytes > len(view):
+            raise ValueError("Truncated or corrupted serialized data")
+        yield view[pos:pos + cbytes]
+        pos += cbytes
+    if pos != len(view):
+        raise ValueError("Trailing bytes after the serialized data")
+
+
+def loads(data, codec=None):
+    """
+    Unpickle an object serialized with `dumps()`.
+
+    Every out-of-band buffer is decompressed into a new bytearray, which
+    the unpickled object uses as its memory (so, e.g., arrays come back
+    writeable unless they were read-only when pickled).
+
+    Args:
+        data (object): The serialized object.
+            Can be any Python object that supports the buffer protocol.
+        codec (Codec): If given, decompress with the threads of this codec
+            instead of using the global settings.
+
+    Returns:
+        object: The unpickled object.
+
+    Raises:
+        ValueError: If `data` is not valid serialized data.
+        RuntimeError: If C-Blosc reports an internal error.
+        Any exception raised by `pickle.loads()`.
+    """
+    view = _byte_view(data)
+    if len(view) < _HEADER.size:
+        raise ValueError("Buffer too small for serialized data")
+    magic, version, nbuffers = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not serialized data (or unsupported version)")
+    chunks = _chunks(view[_HEADER.size:], nbuffers + 1)
+    stream = decompress_bytes(next(chunks), codec)
+    buffers = []
+    for chunk in chunks:
+        nbytes = cbuffer_sizes(chunk)[0]
+        buf = bytearray(nbytes)
+        decompress_bytes(chunk, codec, out=buf)
+        buffers.append(buf)
+    return pickle.loads(stream, buffers=buffers)
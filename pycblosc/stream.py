@@ -0,0 +1,403 @@
+"""
+Compression of streams with overlapping read, compress and write stages.
+
+Reading a chunk, compressing it and writing it one after the other leaves the
+disk (or the network) idle while compressing, and the CPU idle while doing
+I/O.  `compress_stream()` and `decompress_stream()` run each stage in its own
+thread instead, with bounded queues between them, so the stages work on
+different chunks at the same time and the throughput approaches the one of
+the slowest stage.  The C calls release the GIL, so the compression thread
+really runs in parallel with the I/O ones.
+
+The compressed stream is just a sequence of blosc chunks (every header
+carries the length of its chunk), like the frames of `FramedWriter`.  The
+chunks in flight live in buffers taken from a `BufferPool`, so at most a few
+chunks are ever held in memory and buffers are reused between them.
+
+Both functions return a dict with statistics for tuning `chunksize` and
+`queue_size`: per stage, the `busy` time (spent doing its work) and the
+`wait` time (spent waiting on the queues), and per queue its maximum and
+mean depth.  The stage that never waits is the bottleneck.
+
+When a stage fails, the other ones are stopped and the error is raised, but
+the reading thread is not waited for: it may be blocked reading `src` (e.g. a
+pipe or a socket with no data coming), so it is left behind as a daemon
+thread, and it exits as soon as that read returns.
+"""
+
+import queue
+import threading
+import time
+
+from .pycblosc import MAX_OVERHEAD, MIN_HEADER_LENGTH, SHUFFLE, cbuffer_sizes
+from .highlevel import _byte_view, _check_result
+from .pool import BufferPool
+from .batch import _default_codec
+
+
+_DONE = object()
+# How often (in seconds) blocked stages check whether the pipeline was aborted
+_POLL_INTERVAL = 0.1
+
+
+class _Aborted(Exception):
+    pass
+
+
+class _Stage(object):
+    """The counters of a stage of the pipeline."""
+
+    def __init__(self):
+        self.busy = 0.0
+        self.wait = 0.0
+        self.items = 0
+        self.nbytes = 0
+
+    def as_dict(self):
+        return {"busy": self.busy, "wait": self.wait, "items": self.items,
+                "nbytes": self.nbytes}
+
+
+class _Queue(object):
+    """A bounded queue that records its depth and can be aborted."""
+
+    def __init__(self, maxsize, abort):
+        self._queue = queue.Queue(maxsize)
+        self._abort = abort
+        self.maxsize = maxsize
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._puts = 0
+
+    def put(self, item, stage):
+        t0 = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                break
+            except queue.Full:
+                pass
+        stage.wait += time.perf_counter() - t0
+        if item is _DONE:
+            return
+        depth = self._queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_sum += depth
+        self._puts += 1
+
+    def get(self, stage):
+        t0 = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                item = self._queue.get(timeout=_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                pass
+        stage.wait += time.perf_counter() - t0
+        return item
+
+    def as_dict(self):
+        return {"maxsize": self.maxsize, "max_depth": self.max_depth,
+                "mean_depth": self._depth_sum / self._puts if self._puts else 0.0}
+
+
+def _read_full(src, view):
+    """
+    Fill the memoryview `view` from the file-like `src`, returning less than
+    its size only at the end of the stream.
+    """
+    pos = 0
+    while pos < len(view):
+        if hasattr(src, "readinto"):
+            n = src.readinto(view[pos:])
+        else:
+            data = src.read(len(view) - pos)
+            n = len(data)
+            view[pos:pos + n] = data
+        if not n:
+            break
+        pos += n
+    return pos
+
+
+def _read_chunks(src, chunksize, pool, typesize):
+    """
+    Yield (buffer, view, release, typesize) for the chunks of `src`, where
+    `view` has the data and `release` tells whether `buffer` comes from
+    `pool`.
+    """
+    if hasattr(src, "readinto") or hasattr(src, "read"):
+        while True:
+            buf = pool.acquire(chunksize)
+            n = _read_full(src, memoryview(buf)[:chunksize])
+            if not n:
+                pool.release(buf)
+                return
+            yield buf, memoryview(buf)[:n], True, typesize or 1
+    else:
+        for data in src:
+            itemsize = typesize or memoryview(data).itemsize
+            view = _byte_view(data)
+            for start in range(0, len(view), chunksize):
+                yield data, view[start:start + chunksize], False, itemsize
+
+
+def _read_frames(src, max_frame_size, pool):
+    """
+    Yield (buffer, view, release, None) for the compressed chunks of `src`
+    (a file-like object or an iterable of buffers with whole chunks).
+    """
+    def check(header):
+        nbytes, cbytes, _ = cbuffer_sizes(header)
+        if cbytes < MIN_HEADER_LENGTH or max(nbytes, cbytes) > max_frame_size:
+            raise ValueError("Invalid chunk header (nbytes=%d, cbytes=%d)"
+                             % (nbytes, cbytes))
+        return cbytes
+
+    if hasattr(src, "readinto") or hasattr(src, "read"):
+        while True:
+            header = bytearray(MIN_HEADER_LENGTH)
+            n = _read_full(src, memoryview(header))
+            if not n:
+                return
+            if n < MIN_HEADER_LENGTH:
+                raise ValueError("The stream ends inside a chunk header")
+            cbytes = check(header)
+            frame = pool.acquire(cbytes)
+            view = memoryview(frame)[:cbytes]
+            view[:MIN_HEADER_LENGTH] = header
+            if _read_full(src, view[MIN_HEADER_LENGTH:]) < cbytes - MIN_HEADER_LENGTH:
+                pool.release(frame)
+                raise ValueError("The stream ends inside a chunk")
+            yield frame, view, True, None
+    else:
+        for data in src:
+            view = _byte_view(data)
+            pos = 0
+            while pos < len(view):
+                if len(view) - pos < MIN_HEADER_LENGTH:
+                    raise ValueError("Buffer ends inside a chunk header")
+                cbytes = check(view[pos:pos + MIN_HEADER_LENGTH])
+                if pos + cbytes > len(view):
+                    raise ValueError("Buffer ends inside a chunk")
+                yield data, view[pos:pos + cbytes], False, None
+                pos += cbytes
+
+
+def _run_pipeline(reader, transform, dest, queue_size, pool):
+    """
+    Run `reader` (an iterator of (buffer, view, release, typesize) items)
+    and `transform` (mapping a view and its typesize to (buffer, view)) in
+    threads, writing the results to `dest` from the calling thread.
+    """
+    abort = threading.Event()
+    inq = _Queue(queue_size, abort)
+    outq = _Queue(queue_size, abort)
+    stages = {"read": _Stage(), "transform": _Stage(), "write": _Stage()}
+    errors = []
+
+    def run_reader():
+        stage = stages["read"]
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = next(reader, None)
+                stage.busy += time.perf_counter() - t0
+                if item is None:
+                    break
+                stage.items += 1
+                stage.nbytes += len(item[1])
+                inq.put(item, stage)
+            inq.put(_DONE, stage)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+
+    def run_transform():
+        stage = stages["transform"]
+        try:
+            while True:
+                item = inq.get(stage)
+                if item is _DONE:
+                    break
+                buf, view, release, typesize = item
+                t0 = time.perf_counter()
+                try:
+                    result = transform(view, typesize)
+                finally:
+                    if release:
+                        pool.release(buf)
+                stage.busy += time.perf_counter() - t0
+                stage.items += 1
+                stage.nbytes += len(result[1])
+                outq.put(result, stage)
+            outq.put(_DONE, stage)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+
+    reader_thread = threading.Thread(target=run_reader, name="pycblosc-stream-read")
+    transform_thread = threading.Thread(target=run_transform,
+                                        name="pycblosc-stream-transform")
+    for thread in (reader_thread, transform_thread):
+        thread.daemon = True
+        thread.start()
+    stage = stages["write"]
+    t_start = time.perf_counter()
+    try:
+        while True:
+            item = outq.get(stage)
+            if item is _DONE:
+                break
+            buf, view = item
+            t0 = time.perf_counter()
+            dest.write(view)
+            stage.nbytes += len(view)
+            view.release()
+            pool.release(buf)
+            stage.busy += time.perf_counter() - t0
+            stage.items += 1
+    except _Aborted:
+        pass
+    except BaseException:
+        abort.set()
+        raise
+    finally:
+        transform_thread.join()
+        # After an abort, the reader may be stuck in a blocking read of `src`
+        if not abort.is_set():
+            reader_thread.join()
+    if errors:
+        raise errors[0]
+    return {"elapsed": time.perf_counter() - t_start,
+            "stages": {name: s.as_dict() for name, s in stages.items()},
+            "queues": {"read": inq.as_dict(), "write": outq.as_dict()}}
+
+
+def compress_stream(src, dest, chunksize=2**20, clevel=5, shuffle=SHUFFLE, typesize=None,
+                    codec=None, queue_size=2, pool=None):
+    """
+    Compress the data of `src` into a stream of chunks written to `dest`.
+
+    Reading, compressing and writing run concurrently (see the module
+    documentation).
+
+    Args:
+        src (object): Where the data comes from: a binary file-like object
+            (with `readinto()` or `read()`), like a file, a pipe or
+            `socket.makefile("rb")`, or an iterable of buffers.
+        dest (object): Where the chunks are written: any object with a
+            `write()` method accepting bytes-like objects.  It must not keep
+            references to them, as their memory is reused.
+        chunksize (int): The size of the uncompressed chunks.  Buffers
+            from an iterable are split at this size, but never merged.
+        clevel (int): The desired compression level (0 to 9).
+        shuffle (int): The shuffle filter to be applied (NOSHUFFLE, SHUFFLE
+            or BITSHUFFLE).
+        typesize (int): The size of the items in the data.  By default, 1
+            for file-like sources and the itemsize of every buffer for
+            iterables.
+        codec (Codec): If given, compress with this codec (and its
+            `clevel`, `shuffle` and threads) instead of using the global
+            compressor and blocksize.
+        queue_size (int): The maximum number of chunks waiting between two
+            stages.
+        pool (BufferPool): Where the buffers for the chunks in flight come
+            from.  By default, a new pool for the call.
+
+    Returns:
+        dict: The `elapsed` time, plus the `stages` (`read`, `transform`
+        and `write`) with their `busy` and `wait` seconds, `items` and
+        `nbytes` (produced), and the `queues` (`read` and `write`) with
+        their `maxsize`, `max_depth` and `mean_depth`.
+
+    Raises:
+        RuntimeError: If C-Blosc reports an internal error.
+        Any exception raised by `src` or `dest`, after stopping the other
+        stages.
+    """
+    if chunksize <= 0:
+        raise ValueError("`chunksize` must be positive")
+    if codec is None:
+        codec = _default_codec(clevel, shuffle)
+    if pool is None:
+        pool = BufferPool()
+
+    def transform(view, itemsize):
+        nbytes = len(view)
+        out = pool.acquire(nbytes + MAX_OVERHEAD)
+        try:
+            cbytes = codec.compress(itemsize, nbytes, view, out, nbytes + MAX_OVERHEAD)
+            _check_result(cbytes, "compressing")
+        except BaseException:
+            pool.release(out)
+            raise
+        return out, memoryview(out)[:cbytes]
+
+    return _run_pipeline(_read_chunks(src, chunksize, pool, typesize), transform, dest,
+                         queue_size, pool)
+
+
+def decompress_stream(src, dest, codec=None, queue_size=2, pool=None,
+                      max_frame_size=2**31 - 1):
+    """
+    Decompress a stream of chunks (as written by `compress_stream()` or
+    `FramedWriter`) from `src`, writing the data to `dest`.
+
+    Reading, decompressing and writing run concurrently (see the module
+    documentation).
+
+    Args:
+        src (object): Where the chunks come from: a binary file-like object
+            (with `readinto()` or `read()`), or an iterable of buffers, each
+            of them with one or more whole chunks.
+        dest (object): Where the data is written: any object with a
+            `write()` method accepting bytes-like objects.  It must not keep
+            references to them, as their memory is reused.
+        codec (Codec): If given, decompress with the threads of this codec
+            instead of using the global settings.
+        queue_size (int): The maximum number of chunks waiting between two
+            stages.
+        pool (BufferPool): Where the buffers for the chunks in flight come
+            from.  By default, a new pool for the call.
+        max_frame_size (int): The maximum size (compressed or not) accepted
+            for a chunk, as a protection against corrupted streams.
+
+    Returns:
+        dict: The statistics, like `compress_stream()`.
+
+    Raises:
+        ValueError: If the stream is truncated or a chunk header is not
+            valid.
+        RuntimeError: If C-Blosc reports an internal error.
+        Any exception raised by `src` or `dest`, after stopping the other
+        stages.
+    """
+    if codec is None:
+        codec = _default_codec(5, SHUFFLE)
+    if pool is None:
+        pool = BufferPool()
+
+    def transform(view, typesize):
+        nbytes = cbuffer_sizes(view)[0]
+        out = pool.acquire(nbytes)
+        try:
+            dbytes = codec.decompress(view, out, nbytes)
+            _check_result(dbytes, "decompressing")
+            if dbytes != nbytes:
+                raise ValueError("Not a valid compressed buffer")
+        except BaseException:
+            pool.release(out)
+            raise
+        return out, memoryview(out)[:nbytes]
+
+    return _run_pipeline(_read_frames(src, max_frame_size, pool), transform, dest,
+                         queue_size, pool)
@@ -0,0 +1,287 @@
+"""
+An in-memory, appendable container of compressed chunks.
+
+A `SuperChunk` keeps a sequence of blosc chunks compressed with the same
+codec, which can be of any size.  Chunks can be appended, replaced or
+deleted, and the uncompressed data can be sliced like a bytes object,
+decompressing only the chunks involved.  It serializes to a single
+contiguous buffer in the chunked format of `BloscFile` (with a chunksize of
+0 in the trailer when the chunks have different sizes).
+"""
+
+from array import array
+from bisect import bisect_right
+
+from .pycblosc import (MAX_OVERHEAD, SHUFFLE, Codec, get_blocksize, get_compressor,
+                       get_nthreads)
+from .highlevel import _byte_view, _check_result
+from .header import ChunkHeader
+from .bloscfile import (_TRAILER, _index_size, _pack_index, _read_range,
+                        _unpack_offsets, _unpack_trailer)
+
+
+class SuperChunk(object):
+    """
+    A sequence of compressed chunks sharing the same compression settings.
+
+    Appending or replacing a chunk is O(1) and no other chunk is ever
+    recompressed.  After a replacement or a deletion, the offsets table is
+    rebuilt (in O(n)) on the next access by offset.
+
+    Args:
+        clevel (int): The compression level.
+        shuffle (int): The shuffle filter.
+        typesize (int): The size of the atomic type in the data.  By
+            default, it is the itemsize of every buffer appended.
+        codec (Codec): A codec to use instead of `clevel` and `shuffle`
+            plus the global compressor, blocksize and number of threads.
+    """
+
+    def __init__(self, clevel=5, shuffle=SHUFFLE, typesize=None, codec=None):
+        if codec is None:
+            codec = Codec(clevel, shuffle, get_compressor(), get_blocksize(),
+                          get_nthreads())
+        self.codec = codec
+        self.typesize = typesize
+        self._chunks = []
+        self._sizes = []
+        # Uncompressed offsets of the chunks; None when they must be rebuilt
+        self._offsets = array('Q', [0])
+
+    @classmethod
+    def from_buffer(cls, buf, codec=None):
+        """
+        Create a super-chunk from the data serialized with `to_buffer()`.
+
+        The chunks are memoryviews on `buf`, so nothing is copied (and `buf`
+        must not change while they are in use).
+
+        Raises:
+            ValueError: If `buf` is not a valid serialized super-chunk.
+        """
+        view = _byte_view(buf)
+        end = len(view)
+        chunksize, nbytes, nchunks = _unpack_trailer(
+            bytes(view[max(end - _TRAILER.size, 0):]), variable=True)
+        index_start = end - _index_size(nchunks)
+        if index_start < 0:
+            raise ValueError("Truncated super-chunk index")
+        offsets = _unpack_offsets(view[index_start:end - _TRAILER.size])
+        base = index_start - offsets[-1]
+        if base < 0:
+            raise ValueError("Truncated super-chunk data")
+        schunk = cls(codec=codec)
+        for i in range(nchunks):
+            chunk = view[base + offsets[i]:base + offsets[i + 1]]
+            header = ChunkHeader(chunk)
+            if header.cbytes != len(chunk):
+                raise ValueError("Corrupted chunk %d in super-chunk" % i)
+            schunk._chunks.append(chunk)
+            schunk._sizes.append(header.nbytes)
+            schunk._offsets.append(schunk._offsets[-1] + header.nbytes)
+        if schunk.nbytes != nbytes:
+            raise ValueError("Super-chunk size mismatch (%d != %d bytes)"
+                             % (schunk.nbytes, nbytes))
+        return schunk
+
+    def _compress(self, data):
+        view = memoryview(data)
+        typesize = self.typesize or view.itemsize
+        view = _byte_view(view)
+        nbytes = len(view)
+        dest = bytearray(nbytes + MAX_OVERHEAD)
+        cbytes = self.codec.compress(typesize, nbytes, view, dest, len(dest))
+        _check_result(cbytes, "compressing")
+        del dest[cbytes:]
+        return dest, nbytes
+
+    def _get_offsets(self):
+        if self._offsets is None:
+            offsets = array('Q', [0])
+            for size in self._sizes:
+                offsets.append(offsets[-1] + size)
+            self._offsets = offsets
+        return self._offsets
+
+    def _check_index(self, i):
+        if i < 0:
+            i += len(self._chunks)
+        if not 0 <= i < len(self._chunks):
+            raise IndexError("Chunk index out of range")
+        return i
+
+    @property
+    def nchunks(self):
+        """The number of chunks."""
+        return len(self._chunks)
+
+    @property
+    def nbytes(self):
+        """The number of uncompressed bytes."""
+        return self._get_offsets()[-1]
+
+    @property
+    def cbytes(self):
+        """The number of compressed bytes (without the index)."""
+        return sum(len(chunk) for chunk in self._chunks)
+
+    @property
+    def offsets(self):
+        """
+        The uncompressed offsets of the chunks, as an array('Q') with
+        `nchunks` + 1 items (the last one being `nbytes`).
+        """
+        return array('Q', self._get_offsets())
+
+    def __len__(self):
+        return self.nbytes
+
+    def append(self, data):
+        """
+        Compress `data` as a new chunk at the end.
+
+        Returns:
+            int: The index of the new chunk.
+        """
+        cchunk, nbytes = self._compress(data)
+        self._chunks.append(cchunk)
+        self._sizes.append(nbytes)
+        if self._offsets is not None:
+            self._offsets.append(self._offsets[-1] + nbytes)
+        return len(self._chunks) - 1
+
+    def update(self, i, data):
+        """
+        Replace the chunk `i` with the compressed `data` (of any size).
+        """
+        i = self._check_index(i)
+        self._chunks[i], self._sizes[i] = self._compress(data)
+        self._offsets = None
+
+    def delete(self, i):
+        """
+        Remove the chunk `i`.
+        """
+        i = self._check_index(i)
+        del self._chunks[i]
+        del self._sizes[i]
+        self._offsets = None
+
+    def chunk(self, i):
+        """
+        Return the compressed chunk `i` (which must not be modified).
+        """
+        return self._chunks[self._check_index(i)]
+
+    def chunk_header(self, i):
+        """
+        Return the `ChunkHeader` (sizes, typesize, flags...) of chunk `i`.
+        """
+        return ChunkHeader(self.chunk(i))
+
+    def decompress_chunk(self, i, out=None):
+        """
+        Decompress the chunk `i` into `out` (or a new bytearray).
+
+        Returns:
+            bytearray or memoryview: The new bytearray, or a memoryview of
+            the chunk size on `out`.
+
+        Raises:
+            ValueError: If `out` is too small.
+        """
+        i = self._check_index(i)
+        nbytes = self._sizes[i]
+        if out is None:
+            dest = bytearray(nbytes)
+        else:
+            dest = _byte_view(out)
+            if len(dest) < nbytes:
+                raise ValueError("`out` is too small for the chunk (%d < %d bytes)"
+                                 % (len(dest), nbytes))
+        _check_result(self.codec.decompress(self._chunks[i], dest, nbytes),
+                      "decompressing")
+        return dest if out is None else dest[:nbytes]
+
+    def read_into(self, offset, out):
+        """
+        Decompress the bytes at the uncompressed `offset` into `out`.
+
+        Only the chunks overlapping the range are decompressed: whole chunks
+        straight into `out`, and partial ones with `getitem()`.
+
+        Returns:
+            int: The number of bytes read (less than the size of `out` only
+            at the end of the data).
+
+        Raises:
+            ValueError: If `offset` is negative.
+        """
+        if offset < 0:
+            raise ValueError("Negative offset %d" % offset)
+        offsets = self._get_offsets()
+        dest = _byte_view(out)
+        nbytes = min(len(dest), max(offsets[-1] - offset, 0))
+        done = 0
+        i = bisect_right(offsets, offset) - 1
+        while done < nbytes:
+            start = offset + done - offsets[i]
+            chunk_nbytes = self._sizes[i]
+            n = min(chunk_nbytes - start, nbytes - done)
+            if n > 0:
+                with dest[done:done + n] as out_i:
+                    if n == chunk_nbytes:
+                        _check_result(self.codec.decompress(self._chunks[i], out_i, n),
+                                      "decompressing")
+                    else:
+                        _read_range(self._chunks[i], chunk_nbytes, start, out_i,
+                                    self.codec)
+                done += n
+            i += 1
+        return nbytes
+
+    def __getitem__(self, key):
+        """
+        Return the uncompressed bytes at `key` (an int or a slice of step 1),
+        decompressing only the chunks involved.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.nbytes)
+            if step != 1:
+                raise ValueError("Only slices with step 1 are supported")
+            out = bytearray(max(stop - start, 0))
+            self.read_into(start, out)
+            return out
+        nbytes = self.nbytes
+        if key < 0:
+            key += nbytes
+        if not 0 <= key < nbytes:
+            raise IndexError("SuperChunk index out of range")
+        out = bytearray(1)
+        self.read_into(key, out)
+        return out[0]
+
+    def to_buffer(self):
+        """
+        Serialize the chunks, followed by their index, into a bytearray.
+
+        The format is the one of `BloscFile`, so if all the chunks but the
+        last one have the same size, the result can also be read with
+        `BloscFile` or `MappedBloscFile`.
+        """
+        sizes = set(self._sizes[:-1])
+        if len(sizes) == 1 and self._sizes[-1] <= min(sizes):
+            chunksize = sizes.pop()
+        elif not sizes and self._sizes:
+            chunksize = self._sizes[0]
+        else:
+            chunksize = 0
+        coffsets = array('Q', [0])
+        for chunk in self._chunks:
+            coffsets.append(coffsets[-1] + len(chunk))
+        index = _pack_index(coffsets, chunksize, self.nbytes)
+        buf = bytearray(coffsets[-1] + len(index))
+        for i, chunk in enumerate(self._chunks):
+            buf[coffsets[i]:coffsets[i + 1]] = chunk
+        buf[coffsets[-1]:] = index
+        return buf
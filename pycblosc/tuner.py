@@ -0,0 +1,178 @@
+"""
+Automatic selection of compression settings for a dataset.
+
+`tune()` times candidate settings (compressor, clevel, shuffle, blocksize and
+split mode) on a sample of the data and returns the best ones for the given
+goal.  The search is done in stages (first compressor and shuffle, then
+clevel, blocksize and split mode around the best candidate so far) and stops
+when the time budget is exhausted.  Results are cached by the format and
+shape of the sample, so later calls for similar data cost nothing.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from .pycblosc import (ALWAYS_SPLIT, AUTO_SPLIT, BITSHUFFLE, FORWARD_COMPAT_SPLIT,
+                       MAX_OVERHEAD, NEVER_SPLIT, NOSHUFFLE, SHUFFLE, Codec,
+                       get_splitmode, list_compressors, set_splitmode)
+from .highlevel import _byte_view
+
+
+GOALS = ("speed", "ratio", "balanced")
+CLEVELS = (1, 3, 5, 7, 9)
+SHUFFLES = (NOSHUFFLE, SHUFFLE, BITSHUFFLE)
+BLOCKSIZES = (0, 16 * 1024, 64 * 1024, 256 * 1024)
+SPLITMODES = (FORWARD_COMPAT_SPLIT, AUTO_SPLIT, ALWAYS_SPLIT, NEVER_SPLIT)
+
+_cache = {}
+# The split mode is global in C-Blosc, so tunings cannot run concurrently
+_lock = threading.Lock()
+
+
+class TuneResult(namedtuple("TuneResult", [
+        "compressor", "clevel", "shuffle", "blocksize", "splitmode",
+        "ratio", "cspeed", "dspeed"])):
+    """
+    The best settings found by `tune()`, plus their measured compression
+    ratio and compression/decompression speeds (in MB/s).
+    """
+
+    __slots__ = ()
+
+    def codec(self, nthreads=1):
+        """
+        Return a `Codec` with these settings.
+
+        The split mode is not part of a codec, so apply it separately with
+        `set_splitmode(result.splitmode)`.
+        """
+        return Codec(self.clevel, self.shuffle, self.compressor, self.blocksize, nthreads)
+
+
+def _score(goal, ratio, cspeed, dspeed):
+    speed = 2. / (1. / cspeed + 1. / dspeed)
+    if goal == "speed":
+        return speed
+    if goal == "ratio":
+        return ratio
+    return ratio * speed
+
+
+def _measure(settings, src, typesize, dest, out):
+    """Return (ratio, cspeed, dspeed) for `settings` on `src`."""
+    compressor, clevel, shuffle, blocksize, splitmode = settings
+    codec = Codec(clevel, shuffle, compressor, blocksize, 1)
+    nbytes = len(src)
+    set_splitmode(splitmode)
+    t0 = time.perf_counter()
+    cbytes = codec.compress(typesize, nbytes, src, dest, len(dest))
+    t1 = time.perf_counter()
+    if cbytes <= 0:
+        return None
+    codec.decompress(dest, out, nbytes)
+    t2 = time.perf_counter()
+    mbytes = nbytes / 2.**20
+    # Guard against timer resolution for tiny samples
+    return (nbytes / float(cbytes), mbytes / max(t1 - t0, 1e-9),
+            mbytes / max(t2 - t1, 1e-9))
+
+
+def tune(sample, goal="balanced", budget_ms=200, typesize=None, compressors=None,
+         use_cache=True):
+    """
+    Find the best compression settings for data like `sample`.
+
+    Args:
+        sample (object): A representative sample of the data.
+            Can be any Python object that supports the buffer protocol.
+        goal (str): What to optimize: "speed" (round-trip throughput),
+            "ratio" (compression ratio) or "balanced" (their product).
+        budget_ms (float): The time budget for the search in milliseconds.
+            The best candidate found when it runs out is returned (at least
+            one candidate is always measured).
+        typesize (int): The size of the atomic type in `sample`.  By default,
+            it is the `itemsize` of a memoryview on it.
+        compressors (sequence): The compressor names to try.  Defaults to
+            all the ones in this build.
+        use_cache (bool): Whether to reuse (and store) results cached by the
+            format and shape of `sample` and the goal.
+
+    Returns:
+        TuneResult: The best settings and their measurements.
+
+    Raises:
+        ValueError: If `goal` is not valid.
+        RuntimeError: If no candidate could compress the sample.
+
+    Note:
+        The split mode is global in C-Blosc, so it is changed during the
+        search (and restored at the end).  Avoid compressing from other
+        threads while tuning.
+    """
+    if goal not in GOALS:
+        raise ValueError("goal must be one of %s" % (GOALS,))
+    view = memoryview(sample)
+    key = (view.format, view.shape, typesize, goal,
+           tuple(compressors) if compressors is not None else None)
+    if use_cache and key in _cache:
+        return _cache[key]
+    if typesize is None:
+        typesize = view.itemsize
+    src = _byte_view(view)
+    if compressors is None:
+        compressors = list_compressors()
+        if not isinstance(compressors, str):
+            compressors = compressors.decode()
+        compressors = compressors.split(",")
+    dest = bytearray(len(src) + MAX_OVERHEAD)
+    out = bytearray(len(src))
+
+    deadline = time.perf_counter() + budget_ms / 1e3
+    measured = {}
+    best = [None, None]  # settings, score
+
+    def try_settings(candidates):
+        for settings in candidates:
+            if settings in measured:
+                continue
+            if best[0] is not None and time.perf_counter() > deadline:
+                return
+            result = _measure(settings, src, typesize, dest, out)
+            measured[settings] = result
+            if result is None:
+                continue
+            score = _score(goal, *result)
+            if best[1] is None or score > best[1]:
+                best[0], best[1] = settings, score
+
+    with _lock:
+        splitmode = get_splitmode()
+        try:
+            try_settings([(compressor, 5, shuffle, 0, FORWARD_COMPAT_SPLIT)
+                          for compressor in compressors for shuffle in SHUFFLES])
+            if best[0] is None:
+                raise RuntimeError("No candidate settings could compress the sample")
+            compressor, _, shuffle, _, _ = best[0]
+            try_settings([(compressor, clevel, shuffle, 0, FORWARD_COMPAT_SPLIT)
+                          for clevel in CLEVELS])
+            _, clevel, _, _, _ = best[0]
+            try_settings([(compressor, clevel, shuffle, blocksize, FORWARD_COMPAT_SPLIT)
+                          for blocksize in BLOCKSIZES])
+            _, _, _, blocksize, _ = best[0]
+            try_settings([(compressor, clevel, shuffle, blocksize, mode)
+                          for mode in SPLITMODES])
+        finally:
+            set_splitmode(splitmode)
+
+    result = TuneResult(*(best[0] + measured[best[0]]))
+    if use_cache:
+        _cache[key] = result
+    return result
+
+
+def clear_tune_cache():
+    """
+    Forget the settings cached by `tune()`.
+    """
+    _cache.clear()
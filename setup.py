@@ -1,7 +1,10 @@
+import os
 from subprocess import call
 from setuptools import setup
+from setuptools.command.build_ext import build_ext
 from setuptools_scm import get_version as scm_get_version
 from distutils.command.install import install
+from distutils.errors import CCompilerError, DistutilsExecError, DistutilsPlatformError
 
 
 class blosc_install(install):
@@ -18,6 +21,7 @@ class blosc_install(install):
           bin, *.dll -> ./pycblosc
           lib, *.dylib* -> ./pycblosc
           lib, *.so* -> ./pycblosc
+          include, *.h -> ./pycblosc/include
         """.format(blosc_version))
         # Copy the shared library for later install
         try:
@@ -31,6 +35,35 @@ class blosc_install(install):
         # Call parent
         install.run(self)
 
+
+class optional_build_ext(build_ext):
+    """
+    Build the API-mode extension if possible, but do not fail the install
+    without it: pycblosc falls back to ABI mode at run time.
+    """
+    def run(self):
+        try:
+            build_ext.run(self)
+        except (DistutilsPlatformError, OSError) as e:
+            self._skip(e)
+
+    def build_extension(self, ext):
+        try:
+            build_ext.build_extension(self, ext)
+        except (CCompilerError, DistutilsExecError, DistutilsPlatformError, OSError) as e:
+            self._skip(e)
+
+    def _skip(self, error):
+        print("WARNING: the compiled extension could not be built (%s); "
+              "pycblosc will use the C-Blosc library in ABI mode" % error)
+
+
+# Set PYCBLOSC_NO_EXTENSION=1 to skip the compiled extension altogether
+if os.environ.get("PYCBLOSC_NO_EXTENSION"):
+    cffi_modules = []
+else:
+    cffi_modules = ['pycblosc/_build_ffi.py:build_ffi']
+
 setup(
     name='pycblosc',
     version=scm_get_version(),
@@ -40,7 +73,12 @@ setup(
     author_email='francesc@blosc.org',
     license='BSD',
     packages=['pycblosc'],
-    cmdclass = {"install": blosc_install},
+    python_requires='>=3.8',
+    setup_requires=['cffi>=1.0.0'],
+    install_requires=['cffi>=1.0.0'],
+    extras_require={'numpy': ['numpy>=1.17']},
+    cffi_modules=cffi_modules,
+    cmdclass = {"install": blosc_install, "build_ext": optional_build_ext},
     package_data={'pycblosc': ['libblosc.*']},
     zip_safe=False,
 )
@@ -0,0 +1,82 @@
+import array
+import asyncio
+import unittest
+import pycblosc as cblosc
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestAsync(unittest.TestCase):
+    arr = array.array('i', range(100000))
+
+    def test_compress_decompress(self):
+        async def main():
+            cbuf = await cblosc.compress_async(self.arr, clevel=7)
+            return await cblosc.decompress_async(cbuf)
+        self.assertEqual(run(main()), self.arr.tobytes())
+
+    def test_concurrent(self):
+        codec = cblosc.AsyncCodec(cblosc.Codec(compressor="lz4"), max_pending=2)
+        arrays = [array.array('i', range(i, i + 10000)) for i in range(20)]
+
+        async def roundtrip(arr):
+            cbuf = await codec.compress(arr)
+            self.assertEqual(cblosc.cbuffer_complib(cbuf), b"LZ4")
+            return await codec.decompress(cbuf)
+
+        async def main():
+            return await asyncio.gather(*[roundtrip(arr) for arr in arrays])
+        self.assertEqual(run(main()), [arr.tobytes() for arr in arrays])
+        # Another loop can use the same codec
+        self.assertEqual(run(main()), [arr.tobytes() for arr in arrays])
+
+    def test_framed_stream(self):
+        messages = [self.arr.tobytes(), b"", b"hello" * 100, bytes(range(256))]
+
+        async def main():
+            received = []
+
+            async def handle(reader, writer):
+                async for data in cblosc.FramedReader(reader):
+                    received.append(bytes(data))
+                writer.close()
+
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            framed = cblosc.FramedWriter(writer)
+            for message in messages:
+                await framed.write(message)
+            await framed.close()
+            while len(received) < len(messages):
+                await asyncio.sleep(0.01)
+            server.close()
+            await server.wait_closed()
+            return received
+
+        self.assertEqual(run(asyncio.wait_for(main(), 10)), messages)
+
+    def test_framed_bad_header(self):
+        async def main():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"\x02\x01\x00\x01" + b"\xff" * 12)
+            reader.feed_eof()
+            return await cblosc.FramedReader(reader, max_frame_size=2**20).read()
+        self.assertRaises(ValueError, run, main())
+
+    def test_framed_eof(self):
+        async def main():
+            reader = asyncio.StreamReader()
+            reader.feed_eof()
+            return await cblosc.FramedReader(reader).read()
+        self.assertIsNone(run(main()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,6 +36,33 @@ class TestUM(unittest.TestCase):
         self.assertEqual(arr1, arr2)
 
 
+    def test_offsets(self):
+        # Compress the two halves of one buffer back to back into another one
+        half = self.nbytes // 2
+        size1 = cblosc.compress(self.clevel, self.shuffle, self.itemsize, half,
+                                self.arr1, self.carr, half)
+        size2 = cblosc.compress(self.clevel, self.shuffle, self.itemsize, half,
+                                self.arr1, self.carr, half, src_offset=half,
+                                dest_offset=size1)
+        self.assertEqual(cblosc.cbuffer_sizes(self.carr[size1:])[1], size2)
+        cblosc.decompress(self.carr, self.arr2, half, src_offset=size1, dest_offset=half)
+        cblosc.decompress(self.carr, self.arr2, half)
+        self.assertEqual(self.arr1, self.arr2)
+        out = array.array('f', [0] * 20)
+        cblosc.getitem(self.carr, 10, 10, out, src_offset=size1, dest_offset=40)
+        self.assertEqual(out[10:], self.arr1[self.N // 2 + 10:self.N // 2 + 20])
+        self.assertRaises(ValueError, cblosc.compress, self.clevel, self.shuffle,
+                          self.itemsize, half, self.arr1, self.carr, half, src_offset=half + 4)
+        self.assertRaises(ValueError, cblosc.decompress, self.carr, self.arr2, half,
+                          dest_offset=half + 4)
+        self.assertRaises(ValueError, cblosc.getitem, self.carr, 0, 1, out, src_offset=-1)
+        # `dest` too small for the items, with and without an offset
+        self.assertRaises(ValueError, cblosc.getitem, self.carr, 0, 21, out)
+        self.assertRaises(ValueError, cblosc.getitem, self.carr, 0, 11, out,
+                          dest_offset=40)
+        self.assertRaises(ValueError, cblosc.getitem, self.carr[:10], 0, 1, out)
+
+
     def test_threads(self):
         cblosc.set_nthreads(2)
         n = cblosc.get_nthreads()
@@ -97,6 +124,13 @@ class TestUM(unittest.TestCase):
         cname = clist.split(",")[0]
         self.assertEqual(cname, "blosclz")
 
+    def test_ffi_mode(self):
+        self.assertIn(cblosc.FFI_MODE, ("api", "abi"))
+        # The ABI-mode fallback must always be loadable
+        ffi, C = cblosc.pycblosc._dlopen_abi()
+        self.assertEqual(ffi.string(C.blosc_get_version_string()).decode(),
+                         cblosc.get_version_string())
+
 
 if __name__ == '__main__':
     print("Running tests for PyCBlosc {} (C-Blosc {})".format(
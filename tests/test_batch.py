@@ -0,0 +1,71 @@
+import array
+import unittest
+import pycblosc as cblosc
+
+
+class TestBatch(unittest.TestCase):
+    buffers = [array.array('i', range(i * 1000, i * 1000 + 1000 + i)) for i in range(50)]
+
+    def test_roundtrip(self):
+        cbufs = cblosc.compress_many(self.buffers, nworkers=4)
+        self.assertEqual(len(cbufs), len(self.buffers))
+        for buf, cbuf in zip(self.buffers, cbufs):
+            self.assertEqual(cblosc.decompress_bytes(cbuf), buf.tobytes())
+        bufs = cblosc.decompress_many(cbufs, nworkers=4)
+        self.assertEqual(bufs, [buf.tobytes() for buf in self.buffers])
+
+    def test_serial(self):
+        codec = cblosc.Codec(compressor="lz4")
+        cbufs = cblosc.compress_many(self.buffers, codec=codec, nworkers=1)
+        self.assertEqual(cblosc.cbuffer_complib(cbufs[0]), b"LZ4")
+        bufs = cblosc.decompress_many(cbufs, codec=codec, nworkers=1)
+        self.assertEqual(bufs, [buf.tobytes() for buf in self.buffers])
+
+    def test_contiguous(self):
+        data, offsets = cblosc.compress_many(self.buffers, contiguous=True)
+        self.assertEqual(len(offsets), len(self.buffers) + 1)
+        self.assertEqual(len(data), offsets[-1])
+        cbufs = [data[offsets[i]:offsets[i + 1]] for i in range(len(self.buffers))]
+        for buf, cbuf in zip(self.buffers, cbufs):
+            self.assertEqual(cblosc.cbuffer_sizes(cbuf)[1], len(cbuf))
+            self.assertEqual(cblosc.decompress_bytes(cbuf), buf.tobytes())
+        data, offsets = cblosc.decompress_many(cbufs, contiguous=True)
+        self.assertEqual(data, b"".join(buf.tobytes() for buf in self.buffers))
+        for i, buf in enumerate(self.buffers):
+            self.assertEqual(data[offsets[i]:offsets[i + 1]], buf.tobytes())
+
+    def test_out(self):
+        total = sum(len(buf) * buf.itemsize + cblosc.MAX_OVERHEAD for buf in self.buffers)
+        cout = bytearray(total)
+        cdata, coffsets = cblosc.compress_many(self.buffers, out=cout)
+        self.assertIs(cdata.obj, cout)
+        cbufs = [cdata[coffsets[i]:coffsets[i + 1]] for i in range(len(self.buffers))]
+        out = bytearray(total)
+        data, offsets = cblosc.decompress_many(cbufs, out=out)
+        self.assertEqual(data, b"".join(buf.tobytes() for buf in self.buffers))
+        self.assertRaises(ValueError, cblosc.compress_many, self.buffers, out=bytearray(10))
+        self.assertRaises(ValueError, cblosc.decompress_many, cbufs, out=bytearray(10))
+
+    def test_decompress_into(self):
+        cbufs = cblosc.compress_many(self.buffers)
+        expected = b"".join(buf.tobytes() for buf in self.buffers)
+        for nworkers in (1, 4):
+            out = array.array('i', [0]) * (len(expected) // 4)
+            offsets = cblosc.decompress_into(cbufs, out, nworkers=nworkers)
+            self.assertEqual(out.tobytes(), expected)
+            self.assertEqual(offsets[-1], len(expected))
+            self.assertEqual(offsets[1], len(self.buffers[0]) * 4)
+        self.assertEqual(list(cblosc.decompress_into([], bytearray())), [0])
+        self.assertRaises(ValueError, cblosc.decompress_into, cbufs, bytearray(10))
+        self.assertRaises(ValueError, cblosc.decompress_into, [cbufs[0][:-1]],
+                          bytearray(len(expected)))
+
+    def test_empty(self):
+        self.assertEqual(cblosc.compress_many([]), [])
+        data, offsets = cblosc.decompress_many([], contiguous=True)
+        self.assertEqual(len(data), 0)
+        self.assertEqual(list(offsets), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
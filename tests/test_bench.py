@@ -0,0 +1,67 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pycblosc import bench
+
+
+class TestBench(unittest.TestCase):
+
+    def run_quick(self):
+        return bench.run(nbytes=64 * 1024, repeats=3, compressors=["blosclz", "lz4"],
+                         typesizes=[4], threads=[1], ffi_iterations=100)
+
+    def test_patterns(self):
+        for pattern in bench.PATTERNS:
+            for typesize in (1, 2, 4, 8):
+                data = bench.make_data(pattern, 4096, typesize)
+                self.assertEqual(len(data), 4096)
+        self.assertRaises(ValueError, bench.make_data, "nonexistent", 4096, 4)
+
+    def test_run(self):
+        report = self.run_quick()
+        self.assertEqual(len(report["results"]), 2 * 3 * len(bench.PATTERNS))
+        self.assertGreater(report["ffi"]["call_ns"], 0)
+        for result in report["results"]:
+            self.assertGreater(result["ratio"], 0)
+            self.assertGreater(result["cspeed"], 0)
+            self.assertLessEqual(result["clatency"]["p50"], result["clatency"]["p99"])
+        json.dumps(report)
+
+    def test_compare(self):
+        base = self.run_quick()
+        self.assertEqual(bench.compare(base, base), [])
+        new = copy.deepcopy(base)
+        new["results"][0]["dspeed"] = base["results"][0]["dspeed"] / 2
+        regressions = bench.compare(base, new, threshold=0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0][1], "dspeed")
+        # A zero baseline is not compared
+        new["results"][0]["ratio"] = base["results"][0]["ratio"] = 0
+        self.assertEqual(len(bench.compare(base, new)), 1)
+
+    def test_main(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "results.json")
+            args = ["--nbytes", "16384", "--repeats", "2", "--compressors", "lz4",
+                    "--shuffles", "shuffle", "--typesizes", "4", "--threads", "1",
+                    "--patterns", "arange", "-o", path]
+            self.assertEqual(bench.main(args), 0)
+            with open(path) as f:
+                report = json.load(f)
+            self.assertEqual(len(report["results"]), 1)
+            self.assertEqual(bench.main(["--compare", path, path]), 0)
+            with contextlib.redirect_stderr(io.StringIO()):
+                for option in ("--shuffles", "--patterns"):
+                    self.assertRaises(SystemExit, bench.main, [option, "nonexistent"])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
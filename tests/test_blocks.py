@@ -0,0 +1,115 @@
+import array
+import random
+import unittest
+import pycblosc as cblosc
+
+
+class TestGetitemMany(unittest.TestCase):
+    arr = array.array('i', range(1000 * 1000))
+
+    def setUp(self):
+        self.codec = cblosc.Codec(blocksize=2**14)
+        self.cbuf = cblosc.compress_bytes(self.arr, codec=self.codec)
+
+    def reference(self, starts, counts):
+        ref = array.array('i')
+        for start, count in zip(starts, counts):
+            ref.extend(self.arr[start:start + count])
+        return ref.tobytes()
+
+    def test_ranges(self):
+        rnd = random.Random(0)
+        # Ranges inside, across and spanning several blocks, plus empty ones
+        starts = [rnd.randrange(len(self.arr) - 20000) for i in range(50)] + [0, 4095, 17]
+        counts = [rnd.randrange(1, 20) for i in range(50)] + [10000, 2, 0]
+        dest = bytearray(sum(counts) * 4)
+        self.assertEqual(cblosc.getitem_many(self.cbuf, starts, counts, dest), len(dest))
+        self.assertEqual(dest, self.reference(starts, counts))
+
+    def test_whole_chunk(self):
+        # Touching most blocks decompresses the whole chunk at once
+        starts = list(range(0, len(self.arr), 1000))
+        counts = [3] * len(starts)
+        dest = bytearray(sum(counts) * 4)
+        cblosc.getitem_many(self.cbuf, starts, counts, dest)
+        self.assertEqual(dest, self.reference(starts, counts))
+
+    def test_take(self):
+        rnd = random.Random(1)
+        indices = [rnd.randrange(len(self.arr)) for i in range(500)] + [7, 7, 0]
+        items = array.array('i', bytes(cblosc.take(self.cbuf, indices)))
+        self.assertEqual(list(items), [self.arr[i] for i in indices])
+        self.assertEqual(cblosc.take(self.cbuf, []), b"")
+
+    def test_decompressions(self):
+        # Many indices in the same block cost a single decompression
+        from pycblosc import instrument
+        instrument.reset()
+        instrument.enable()
+        try:
+            cblosc.take(self.cbuf, list(range(100, 1000, 3)))
+        finally:
+            instrument.disable()
+        stats = instrument.stats()
+        instrument.reset()
+        calls = sum(s["calls"] for op in stats.values() for s in op.values())
+        self.assertEqual(calls, 1)
+
+    def test_errors(self):
+        dest = bytearray(100)
+        self.assertRaises(ValueError, cblosc.getitem_many, self.cbuf, [len(self.arr)], [1], dest)
+        self.assertRaises(ValueError, cblosc.getitem_many, self.cbuf, [-1], [1], dest)
+        self.assertRaises(ValueError, cblosc.getitem_many, self.cbuf, [0], [26], dest)
+        self.assertRaises(ValueError, cblosc.getitem_many, self.cbuf, [0, 1], [1], dest)
+
+
+class TestBlockCache(unittest.TestCase):
+    arr = array.array('i', range(1000 * 1000))
+
+    def setUp(self):
+        self.cbuf = bytes(cblosc.compress_bytes(self.arr, codec=cblosc.Codec(blocksize=2**14)))
+
+    def test_hits(self):
+        cache = cblosc.BlockCache()
+        indices = [10, 20, 5000, 900000]
+        for i in range(3):
+            items = cblosc.take(self.cbuf, indices, cache=cache, key="a")
+            items = array.array('i', bytes(items))
+            self.assertEqual(list(items), indices)
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["hits"], 6)
+        self.assertEqual(stats["blocks"], 3)
+        self.assertEqual(stats["nbytes"], 3 * 2**14)
+
+    def test_eviction(self):
+        cache = cblosc.BlockCache(max_bytes=2 * 2**14)
+        for start in (0, 5000, 10000, 0):
+            cblosc.take(self.cbuf, [start], cache=cache, key="a")
+        self.assertEqual(cache.evictions, 2)
+        self.assertEqual(cache.misses, 4)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+        cache.clear()
+        self.assertEqual(cache.stats()["blocks"], 0)
+
+    def test_keys(self):
+        cache = cblosc.BlockCache()
+        self.assertRaises(ValueError, cblosc.take, self.cbuf, [0], cache)
+        cblosc.take(bytearray(self.cbuf), [0], cache, key="chunk-0")
+        cblosc.take(self.cbuf, [0], cache, key="chunk-1")
+        self.assertEqual(cache.stats()["blocks"], 2)
+        self.assertEqual(cache.get(("chunk-0", 0)), cache.get(("chunk-1", 0)))
+
+    def test_trailing_bytes(self):
+        # The last block of a chunk with a partial trailing item
+        data = bytes(range(256)) * 100 + b"xyz"
+        cbuf = bytes(cblosc.compress_bytes(data, typesize=4,
+                                           codec=cblosc.Codec(blocksize=4096)))
+        cache = cblosc.BlockCache()
+        dest = bytearray(8)
+        cblosc.getitem_many(cbuf, [6399], [1], dest, cache, "t")
+        self.assertEqual(dest[:4], data[6399 * 4:6400 * 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import array
+import gc
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+import pycblosc as cblosc
+
+
+class TestBloscFile(unittest.TestCase):
+    N = 100 * 1000
+    arr = array.array('i', range(N))
+    data = arr.tobytes()
+    chunksize = 64 * 1024
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "data.blosc")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, pieces):
+        with cblosc.BloscFile(self.path, "wb", chunksize=self.chunksize) as f:
+            for piece in pieces:
+                self.assertEqual(f.write(piece), len(memoryview(piece).cast('B')))
+        return os.path.getsize(self.path)
+
+    def test_roundtrip(self):
+        size = self.write([self.arr])
+        self.assertLess(size, len(self.data))
+        with cblosc.BloscFile(self.path) as f:
+            self.assertEqual(f.nbytes, len(self.data))
+            self.assertEqual(f.nchunks, -(-len(self.data) // self.chunksize))
+            self.assertEqual(f.read(), self.data)
+            self.assertEqual(f.read(), b"")
+
+    def test_small_writes(self):
+        view = memoryview(self.data)
+        self.write([view[i:i + 1000] for i in range(0, len(self.data), 1000)])
+        with cblosc.BloscFile(self.path) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_typesize(self):
+        self.write([self.arr])
+        with open(self.path, "rb") as f:
+            self.assertEqual(cblosc.cbuffer_metainfo(f.read(16))[0], 4)
+
+    def test_random_reads(self):
+        self.write([self.arr])
+        with cblosc.BloscFile(self.path) as f:
+            for start, n in [(0, 10), (3, 5), (1000, 70000), (65530, 20),
+                             (len(self.data) - 7, 100), (123457, 1)]:
+                f.seek(start)
+                self.assertEqual(f.read(n), self.data[start:start + n])
+                self.assertEqual(f.tell(), min(start + n, len(self.data)))
+            f.seek(-8, io.SEEK_END)
+            self.assertEqual(f.read(), self.data[-8:])
+            f.seek(len(self.data) + 10)
+            self.assertEqual(f.read(10), b"")
+
+    def test_block_cache(self):
+        # C-Blosc only honors the blocksize of unsplit blocks
+        splitmode = cblosc.get_splitmode()
+        cblosc.set_splitmode(cblosc.NEVER_SPLIT)
+        try:
+            with cblosc.BloscFile(self.path, "wb", chunksize=self.chunksize,
+                                  codec=cblosc.Codec(blocksize=4096)) as f:
+                f.write(self.arr)
+        finally:
+            cblosc.set_splitmode(splitmode)
+        cache = cblosc.BlockCache()
+        with cblosc.BloscFile(self.path, cache=cache) as f:
+            for i in range(2):
+                for start, n in [(10, 100), (5000, 3000), (len(self.data) - 7, 7)]:
+                    f.seek(start)
+                    self.assertEqual(f.read(n), self.data[start:start + n])
+            stats = cache.stats()
+            self.assertEqual(stats["misses"], 3)
+            self.assertEqual(stats["hits"], 3)
+
+    def test_sequential_reads(self):
+        self.write([self.arr])
+        with cblosc.BloscFile(self.path) as f:
+            pieces = []
+            while True:
+                piece = f.read(10000)
+                if not piece:
+                    break
+                pieces.append(piece)
+        self.assertEqual(b"".join(pieces), self.data)
+
+    def test_buffered(self):
+        self.write([self.arr])
+        with io.BufferedReader(cblosc.BloscFile(self.path)) as f:
+            self.assertEqual(f.read(100), self.data[:100])
+            f.seek(200000)
+            self.assertEqual(f.read(16), self.data[200000:200016])
+
+    def test_file_object(self):
+        fobj = io.BytesIO(b"prefix")
+        fobj.seek(0, io.SEEK_END)
+        with cblosc.BloscFile(fobj, "wb", chunksize=self.chunksize) as f:
+            f.write(self.data)
+        self.assertFalse(fobj.closed)
+        fobj.seek(0)
+        with cblosc.BloscFile(fobj) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_empty(self):
+        self.write([])
+        with cblosc.BloscFile(self.path) as f:
+            self.assertEqual(f.nchunks, 0)
+            self.assertEqual(f.read(), b"")
+
+    def test_not_a_blosc_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 100)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            self.assertRaises(ValueError, cblosc.BloscFile, self.path)
+            gc.collect()
+        # The file opened from the path is closed on the error
+        self.assertEqual([w for w in caught if issubclass(w.category, ResourceWarning)], [])
+
+    def test_modes(self):
+        self.write([self.arr])
+        with cblosc.BloscFile(self.path) as f:
+            self.assertRaises(io.UnsupportedOperation, f.write, b"x")
+        self.assertRaises(ValueError, cblosc.BloscFile, self.path, "a")
+        self.assertRaises(ValueError, cblosc.BloscFile, io.BytesIO(), "wb", chunksize=0)
+
+
+class TestMappedBloscFile(unittest.TestCase):
+    N = 100 * 1000
+    arr = array.array('i', range(N))
+    data = arr.tobytes()
+    chunksize = 64 * 1024
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmpdir, "data.blosc")
+        with cblosc.BloscFile(cls.path, "wb", chunksize=cls.chunksize) as f:
+            f.write(cls.arr)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_read_into(self):
+        with cblosc.MappedBloscFile(self.path) as f:
+            self.assertEqual(len(f), len(self.data))
+            out = array.array('i', [0] * self.N)
+            self.assertEqual(f.read_into(0, out), len(self.data))
+            self.assertEqual(out, self.arr)
+            out = array.array('i', [0] * 1000)
+            f.read_into(4 * 50000, out)
+            self.assertEqual(out, self.arr[50000:51000])
+            self.assertRaises(ValueError, f.read_into, -4, out)
+
+    def test_random_reads(self):
+        with cblosc.MappedBloscFile(self.path) as f:
+            for start, n in [(0, 10), (3, 5), (1000, 70000), (65530, 20),
+                             (len(self.data) - 7, 100), (123457, 1)]:
+                self.assertEqual(f.read(start, n), self.data[start:start + n])
+            self.assertEqual(f.read(len(self.data) + 1, 10), b"")
+
+    def test_block_cache(self):
+        cache = cblosc.BlockCache()
+        with cblosc.MappedBloscFile(self.path, cache=cache) as f:
+            for i in range(3):
+                self.assertEqual(f.read(1000, 50), self.data[1000:1050])
+                self.assertEqual(f.read(70000, 9), self.data[70000:70009])
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["hits"], 4)
+
+    def test_chunks(self):
+        with cblosc.MappedBloscFile(self.path) as f:
+            with f.chunk(0) as cchunk:
+                self.assertIsInstance(cchunk, memoryview)
+                nbytes, cbytes, _ = cblosc.cbuffer_sizes(cchunk)
+                self.assertEqual(nbytes, self.chunksize)
+                self.assertEqual(cbytes, len(cchunk))
+            self.assertEqual(f.chunk_nbytes(f.nchunks - 1),
+                             len(self.data) - (f.nchunks - 1) * self.chunksize)
+        self.assertTrue(f.closed)
+
+    def test_not_a_blosc_file(self):
+        path = os.path.join(self.tmpdir, "other")
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+        self.assertRaises(ValueError, cblosc.MappedBloscFile, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import array
+import threading
+import unittest
+import pycblosc as cblosc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestCompressedCache(unittest.TestCase):
+    arr = array.array('i', range(100000))
+    blob = arr.tobytes()
+
+    def test_mapping(self):
+        cache = cblosc.CompressedCache()
+        cache["a"] = self.blob
+        cache["b"] = bytearray(b"hello" * 1000)
+        cache["c"] = b""
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(sorted(cache), ["a", "b", "c"])
+        self.assertIn("a", cache)
+        self.assertEqual(cache["a"], self.blob)
+        self.assertEqual(cache["b"], b"hello" * 1000)
+        self.assertEqual(cache["c"], b"")
+        self.assertTrue(cache["a"].readonly)
+        self.assertIsNone(cache.get("x"))
+        self.assertRaises(KeyError, cache.__getitem__, "x")
+        cache["a"] = b"replaced"
+        self.assertEqual(cache["a"], b"replaced")
+        del cache["b"]
+        self.assertNotIn("b", cache)
+        self.assertRaises(KeyError, cache.__delitem__, "b")
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes, cache.cbytes), (0, 0, 0))
+
+    def test_stats(self):
+        cache = cblosc.CompressedCache(hot_keys=1)
+        cache["a"] = self.arr
+        cache["b"] = self.arr
+        cache["a"]
+        cache["a"]
+        cache["b"]
+        cache["a"]
+        cache.get("x")
+        stats = cache.stats()
+        self.assertEqual((stats["hot_hits"], stats["hits"], stats["misses"]), (1, 3, 1))
+        self.assertEqual(stats["hit_rate"], 4 / 5)
+        self.assertEqual(stats["hot_hit_rate"], 1 / 4)
+        self.assertEqual(stats["keys"], 2)
+        self.assertEqual(stats["hot_keys"], 1)
+        self.assertEqual(stats["hot_nbytes"], len(self.blob))
+        self.assertEqual(stats["nbytes"], 2 * len(self.blob))
+        self.assertGreater(stats["ratio"], 10)
+
+    def test_budget(self):
+        cbytes = len(cblosc.compress_bytes(self.arr))
+        cache = cblosc.CompressedCache(max_bytes=3 * cbytes)
+        for i in range(5):
+            cache[i] = self.arr
+            if i == 2:
+                cache[0]
+        self.assertEqual(sorted(cache), [0, 3, 4])
+        self.assertEqual(cache.evictions, 2)
+        self.assertLessEqual(cache.cbytes, 3 * cbytes)
+        # Too large to be cached at all
+        cache["big"] = bytes(range(256)) * 10000
+        self.assertNotIn("big", cache)
+
+    def test_pooled_buffers(self):
+        pool = cblosc.BufferPool()
+        cache = cblosc.CompressedCache(hot_keys=1, pool=pool)
+        cache["a"] = self.blob
+        cache["b"] = self.blob
+        cache["a"]
+        cache["b"]
+        # The buffer of "a" went back to the pool, and is used again
+        self.assertEqual(pool.stats()["buffers"], 1)
+        cache["a"]
+        self.assertEqual(pool.stats()["hits"], 1)
+        # A value still in use is never recycled
+        b = cache["b"][:10]
+        cache["a"]
+        self.assertEqual(pool.stats()["buffers"], 0)
+        cache["b"] = b"other"
+        self.assertEqual(bytes(b), self.blob[:10])
+
+    def test_threads(self):
+        cache = cblosc.CompressedCache(hot_keys=2)
+        blobs = [array.array('i', range(i, i + 10000)).tobytes() for i in range(8)]
+        for i, blob in enumerate(blobs):
+            cache[i] = blob
+        errors = []
+
+        def worker(n):
+            for j in range(200):
+                i = (j * n) % len(blobs)
+                if cache[i] != blobs[i]:
+                    errors.append(i)
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(1, 5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+    @unittest.skipIf(np is None, "NumPy is not available")
+    def test_pooled_arrays(self):
+        pool = cblosc.BufferPool()
+        cache = cblosc.CompressedCache(hot_keys=0, pool=pool)
+        a = np.arange(10000, dtype=np.int64).reshape(100, 100)
+        cache["a"] = a
+        cache["a"]
+        # The buffer of the previous value is reused
+        cache["a"]
+        self.assertEqual(pool.stats()["hits"], 1)
+        # Views of a value keep its buffer out of the pool
+        view = cache["a"][10:20, ::2]
+        cache["a"]
+        cache["a"]
+        self.assertEqual(pool.stats()["hits"], 3)
+        self.assertEqual(pool.stats()["misses"], 2)
+        np.testing.assert_array_equal(view, a[10:20, ::2])
+        del view
+        cache["a"]
+        self.assertEqual(pool.stats()["buffers"], 1)
+
+    @unittest.skipIf(np is None, "NumPy is not available")
+    def test_arrays(self):
+        cache = cblosc.CompressedCache()
+        a = np.linspace(0, 1, 10000).reshape(100, 100)
+        cache["a"] = a
+        cache["f"] = np.asfortranarray(a)
+        cache["e"] = np.zeros((0, 3), dtype=np.int16)
+        for key in ("a", "f", "e", "a"):
+            b = cache[key]
+            self.assertIsInstance(b, np.ndarray)
+            self.assertFalse(b.flags.writeable)
+            np.testing.assert_array_equal(b, cache[key])
+        np.testing.assert_array_equal(cache["a"], a)
+        self.assertTrue(cache["f"].flags.f_contiguous)
+        self.assertEqual(cache["e"].shape, (0, 3))
+        self.assertEqual(cache.nbytes, 2 * a.nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import array
+import threading
+import unittest
+import pycblosc as cblosc
+
+
+class TestCodec(unittest.TestCase):
+    N = 100 * 1000
+    itemsize = 4
+    nbytes = N * itemsize
+    arr = array.array('i', range(N))
+
+    def roundtrip(self, codec):
+        carr = bytearray(self.nbytes + cblosc.MAX_OVERHEAD)
+        cbytes = codec.compress(self.itemsize, self.nbytes, self.arr, carr, len(carr))
+        self.assertGreater(cbytes, 0)
+        arr2 = array.array('i', [0] * self.N)
+        dbytes = codec.decompress(carr, arr2, self.nbytes)
+        self.assertEqual(dbytes, self.nbytes)
+        self.assertEqual(self.arr, arr2)
+        return cbytes
+
+    def test_compress_decompress(self):
+        codec = cblosc.Codec(clevel=5, shuffle=cblosc.SHUFFLE, compressor="lz4")
+        self.roundtrip(codec)
+        carr = bytearray(self.nbytes + cblosc.MAX_OVERHEAD)
+        codec.compress(self.itemsize, self.nbytes, self.arr, carr, len(carr))
+        self.assertEqual(cblosc.cbuffer_complib(carr), b"LZ4")
+
+    def test_does_not_touch_globals(self):
+        cblosc.set_compressor("blosclz")
+        codec = cblosc.Codec(compressor=b"lz4hc", nthreads=2)
+        self.roundtrip(codec)
+        self.assertEqual(cblosc.get_compressor(), "blosclz")
+        self.assertEqual(cblosc.get_nthreads(), 1)
+
+    def test_offsets(self):
+        codec = cblosc.Codec(compressor="lz4")
+        carr = bytearray(100 + self.nbytes + cblosc.MAX_OVERHEAD)
+        cbytes = codec.compress(self.itemsize, self.nbytes - 400, self.arr, carr,
+                                len(carr) - 100, src_offset=400, dest_offset=100)
+        self.assertEqual(cblosc.cbuffer_sizes(carr[100:])[1], cbytes)
+        arr2 = array.array('i', [0] * self.N)
+        dbytes = codec.decompress(carr, arr2, self.nbytes - 400, src_offset=100,
+                                  dest_offset=400)
+        self.assertEqual(dbytes, self.nbytes - 400)
+        self.assertEqual(self.arr[100:], arr2[100:])
+        self.assertRaises(ValueError, codec.decompress, carr, arr2, self.nbytes,
+                          dest_offset=4)
+
+    def test_unknown_compressor(self):
+        self.assertRaises(ValueError, cblosc.Codec, compressor="nonexistent")
+
+    def test_threads(self):
+        codecs = [cblosc.Codec(compressor=cname)
+                  for cname in ("blosclz", "lz4", "lz4hc", "zlib")]
+        errors = []
+
+        def work(codec):
+            try:
+                for i in range(10):
+                    self.roundtrip(codec)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(codec,)) for codec in codecs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
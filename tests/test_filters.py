@@ -0,0 +1,130 @@
+import unittest
+import pycblosc as cblosc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not available")
+class TestFilters(unittest.TestCase):
+
+    def telemetry(self, n=100000, dtype=np.float64):
+        t = np.linspace(0, 20, n)
+        return (np.sin(t) * 100 + t).astype(dtype)
+
+    def check_roundtrip(self, a, filters, **kwargs):
+        packed = cblosc.compress_filtered(a, filters, **kwargs)
+        b = cblosc.decompress_filtered(packed)
+        self.assertEqual(b.dtype, a.dtype)
+        self.assertEqual(b.shape, a.shape)
+        np.testing.assert_array_equal(a, b)
+        return packed
+
+    def test_lossless(self):
+        a = self.telemetry()
+        for filters in ([], [cblosc.Delta()], [cblosc.Xor()],
+                        [cblosc.Delta(), cblosc.Xor()],
+                        [cblosc.Xor(), cblosc.Delta(), cblosc.Xor()]):
+            self.check_roundtrip(a, filters)
+        self.check_roundtrip(np.arange(10000, dtype=np.int16) * 7, [cblosc.Delta()])
+        self.check_roundtrip(np.arange(1000, dtype='>u4').reshape(10, 100),
+                             [cblosc.Delta()])
+        self.check_roundtrip(np.asfortranarray(self.telemetry().reshape(100, 1000)),
+                             [cblosc.Xor()])
+        self.check_roundtrip(self.telemetry()[::3], [cblosc.Delta()])
+        self.check_roundtrip(np.array(2.5), [cblosc.Xor()])
+        self.check_roundtrip(np.zeros((0, 4)), [cblosc.Delta()])
+
+    def test_ratio(self):
+        a = self.telemetry(dtype=np.float32)
+        plain = cblosc.pack_array(a)
+        xor = self.check_roundtrip(a, [cblosc.Xor()])
+        self.assertLess(len(xor), len(plain))
+
+    def test_truncate(self):
+        a = self.telemetry()
+        packed = cblosc.compress_filtered(a, [cblosc.Truncate(20), cblosc.Xor()])
+        b = cblosc.decompress_filtered(packed)
+        np.testing.assert_allclose(a, b, rtol=2.0**-20)
+        self.assertLess(len(packed), len(cblosc.pack_array(a)))
+        b = cblosc.decompress_filtered(cblosc.compress_filtered(a, [cblosc.Truncate(52)]))
+        np.testing.assert_array_equal(a, b)
+        a16 = a.astype('>f2')
+        b16 = cblosc.decompress_filtered(cblosc.compress_filtered(a16, [cblosc.Truncate(5)]))
+        np.testing.assert_allclose(a16, b16, rtol=2.0**-5)
+        self.assertRaises(ValueError, cblosc.compress_filtered,
+                          np.arange(10), [cblosc.Truncate(10)])
+        self.assertRaises(ValueError, cblosc.compress_filtered,
+                          np.arange(10.), [cblosc.Truncate(53)])
+
+    def test_input_untouched(self):
+        a = self.telemetry(1000)
+        copy = a.copy()
+        cblosc.compress_filtered(a, [cblosc.Truncate(3), cblosc.Delta()])
+        np.testing.assert_array_equal(a, copy)
+
+    def test_copies(self):
+        a = self.telemetry(10000).reshape(100, 100)
+        before = cblosc.array_copy_stats()
+        for filters in ([], [cblosc.Xor()]):
+            self.check_roundtrip(a, filters)
+            self.check_roundtrip(np.asfortranarray(a), filters)
+        self.assertEqual(cblosc.array_copy_stats(), before)
+        # Only arrays that are not contiguous are copied, once
+        for filters in ([], [cblosc.Xor()]):
+            self.check_roundtrip(a[::2, 1::3], filters)
+        after = cblosc.array_copy_stats()
+        self.assertEqual(after["count"], before["count"] + 2)
+        self.assertEqual(after["nbytes"], before["nbytes"] + 2 * a[::2, 1::3].nbytes)
+
+    def test_out_and_pool(self):
+        a = self.telemetry(10000).reshape(100, 100)
+        pool = cblosc.BufferPool()
+        packed = cblosc.compress_filtered(a, [cblosc.Delta(), cblosc.Xor()], pool=pool)
+        out = np.empty_like(a)
+        self.assertIs(cblosc.decompress_filtered(packed, out=out, pool=pool), out)
+        np.testing.assert_array_equal(a, out)
+        self.assertEqual(pool.stats()["hits"], 2)
+        self.assertRaises(ValueError, cblosc.decompress_filtered, packed,
+                          out=np.empty(10000))
+        self.assertRaises(ValueError, cblosc.decompress_filtered, packed,
+                          out=np.empty((100, 100)).T)
+
+    def test_custom_filter(self):
+        @cblosc.register_filter
+        class Negate(cblosc.Filter):
+            id = 200
+
+            def encode(self, src, dest):
+                np.invert(src, out=dest)
+
+            def decode(self, src, dest):
+                np.invert(src, out=dest)
+
+        try:
+            self.check_roundtrip(np.arange(1000), [Negate(), cblosc.Delta()])
+
+            class Other(Negate):
+                id = 200
+            self.assertRaises(ValueError, cblosc.register_filter, Other)
+            self.assertRaises(ValueError, cblosc.compress_filtered,
+                              np.arange(10), [Other()])
+        finally:
+            del cblosc.filters._filters[200]
+
+    def test_invalid(self):
+        packed = cblosc.compress_filtered(np.arange(100), [cblosc.Delta()])
+        self.assertRaises(ValueError, cblosc.decompress_filtered, packed[:5])
+        self.assertRaises(ValueError, cblosc.decompress_filtered, b"XXXX" + packed[4:])
+        packed[6] = 99
+        self.assertRaises(ValueError, cblosc.decompress_filtered, packed)
+        self.assertRaises(ValueError, cblosc.compress_filtered,
+                          np.zeros(3, dtype='S3'), [cblosc.Delta()])
+        self.assertRaises(ValueError, cblosc.Delta, 300)
+        self.assertRaises(ValueError, cblosc.Truncate, -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import array
+import unittest
+import pycblosc as cblosc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestChunkHeader(unittest.TestCase):
+    arr = array.array('i', range(200 * 1000))
+
+    def check_header(self, cbuf):
+        header = cblosc.ChunkHeader(cbuf)
+        self.assertEqual((header.nbytes, header.cbytes, header.blocksize),
+                         cblosc.cbuffer_sizes(cbuf))
+        typesize, flags = cblosc.cbuffer_metainfo(cbuf)
+        self.assertEqual(header.typesize, typesize)
+        self.assertEqual([header.bitshuffle, header.memcpyed, header.shuffle],
+                         flags[1:])
+        self.assertEqual((header.version, header.versionlz), cblosc.cbuffer_versions(cbuf))
+        self.assertEqual(header.complib, cblosc.cbuffer_complib(cbuf).decode())
+        return header
+
+    def test_fields(self):
+        for compressor in ("blosclz", "lz4", "zlib", "zstd"):
+            for shuffle in (cblosc.NOSHUFFLE, cblosc.SHUFFLE, cblosc.BITSHUFFLE):
+                codec = cblosc.Codec(shuffle=shuffle, compressor=compressor)
+                header = self.check_header(cblosc.compress_bytes(self.arr, codec=codec))
+                self.assertEqual(header.nbytes, len(self.arr) * 4)
+        header = self.check_header(cblosc.compress_bytes(self.arr, clevel=0))
+        self.assertTrue(header.memcpyed)
+        self.assertEqual(header.nblocks, -(-header.nbytes // header.blocksize))
+
+    def test_offset(self):
+        cbuf = cblosc.compress_bytes(self.arr)
+        header = cblosc.ChunkHeader(b"xyz" + cbuf, offset=3)
+        self.assertEqual(header.cbytes, len(cbuf))
+        self.assertIn("cbytes=%d" % len(cbuf), repr(header))
+        self.assertRaises(AttributeError, setattr, header, "other", 1)
+
+    def test_short(self):
+        self.assertRaises(ValueError, cblosc.ChunkHeader, b"x" * 15)
+
+    @unittest.skipIf(np is None, "NumPy is not available")
+    def test_scan_headers(self):
+        chunks = [cblosc.compress_bytes(self.arr[:n], codec=cblosc.Codec(compressor=name))
+                  for n, name in ((1000, "lz4"), (200000, "blosclz"), (5, "zstd"))]
+        offsets = [0]
+        for chunk in chunks:
+            offsets.append(offsets[-1] + len(chunk))
+        headers = cblosc.scan_headers(b"".join(chunks), offsets[:-1])
+        self.assertEqual(len(headers), 3)
+        self.assertEqual(list(headers["nbytes"]), [4000, 800000, 20])
+        self.assertEqual(list(headers["cbytes"]), [len(c) for c in chunks])
+        self.assertEqual(list(headers["typesize"]), [4, 4, 4])
+        for chunk, header in zip(chunks, headers):
+            self.assertEqual(header["blocksize"], cblosc.ChunkHeader(chunk).blocksize)
+            self.assertEqual(header["flags"], cblosc.ChunkHeader(chunk).flags)
+        self.assertEqual(len(cblosc.scan_headers(b"", [])), 0)
+        self.assertRaises(ValueError, cblosc.scan_headers, b"".join(chunks), [offsets[-1] - 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
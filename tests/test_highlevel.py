@@ -0,0 +1,61 @@
+import array
+import unittest
+import pycblosc as cblosc
+
+
+class TestHighLevel(unittest.TestCase):
+    N = 100 * 1000
+    arr = array.array('i', range(N))
+    nbytes = N * arr.itemsize
+
+    def test_roundtrip(self):
+        cbuf = cblosc.compress_bytes(self.arr)
+        self.assertIsInstance(cbuf, bytearray)
+        self.assertEqual(len(cbuf), cblosc.cbuffer_sizes(cbuf)[1])
+        self.assertLess(len(cbuf), self.nbytes)
+        self.assertEqual(cblosc.cbuffer_metainfo(cbuf)[0], self.arr.itemsize)
+        buf = cblosc.decompress_bytes(bytes(cbuf))
+        self.assertEqual(buf, self.arr.tobytes())
+
+    def test_typesize(self):
+        cbuf = cblosc.compress_bytes(self.arr.tobytes(), typesize=8)
+        self.assertEqual(cblosc.cbuffer_metainfo(cbuf)[0], 8)
+
+    def test_codec(self):
+        codec = cblosc.Codec(compressor="lz4")
+        cbuf = cblosc.compress_bytes(self.arr, codec=codec)
+        self.assertEqual(cblosc.cbuffer_complib(cbuf), b"LZ4")
+        self.assertEqual(cblosc.decompress_bytes(cbuf, codec=codec), self.arr.tobytes())
+
+    def test_out(self):
+        cout = bytearray(self.nbytes + cblosc.MAX_OVERHEAD)
+        cview = cblosc.compress_bytes(self.arr, out=cout)
+        self.assertIsInstance(cview, memoryview)
+        self.assertEqual(cview.obj, cout)
+        out = array.array('i', [0] * self.N)
+        view = cblosc.decompress_bytes(cview, out=out)
+        self.assertEqual(len(view), self.nbytes)
+        self.assertEqual(out, self.arr)
+
+    def test_out_too_small(self):
+        random = bytes(bytearray((i * 7919) % 251 for i in range(10000)))
+        cout = bytearray(100)
+        self.assertRaises(ValueError, cblosc.compress_bytes, random, out=cout)
+        cbuf = cblosc.compress_bytes(self.arr)
+        out = bytearray(self.nbytes - 1)
+        self.assertRaises(ValueError, cblosc.decompress_bytes, cbuf, out=out)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, cblosc.decompress_bytes, b"abc")
+        cbuf = cblosc.compress_bytes(self.arr)
+        # A truncated buffer, whose header claims more bytes than there are
+        self.assertRaises(ValueError, cblosc.decompress_bytes, cbuf[:len(cbuf) // 2])
+        self.assertRaises(ValueError, cblosc.decompress_bytes, b"\x02" * 32)
+
+    def test_empty(self):
+        cbuf = cblosc.compress_bytes(b"")
+        self.assertEqual(cblosc.decompress_bytes(cbuf), bytearray())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+# Run in a fresh interpreter so that the import is not cached
+IMPORT_SCRIPT = """
+import os, sys, time
+before = os.environ.get('LD_LIBRARY_PATH')
+t0 = time.perf_counter()
+import pycblosc
+t1 = time.perf_counter()
+print(t1 - t0)
+print(os.environ.get('LD_LIBRARY_PATH') == before)
+heavy = ('pkg_resources', 'distutils', 'setuptools_scm', 'asyncio', 'concurrent.futures',
+         'numpy')
+print(','.join(m for m in heavy if m in sys.modules))
+"""
+
+
+class TestImport(unittest.TestCase):
+    ntimes = 5
+
+    def import_pycblosc(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([root, env.get('PYTHONPATH', '')])
+        out = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], env=env)
+        elapsed, env_unchanged, heavy = out.decode().splitlines()
+        return float(elapsed), env_unchanged == "True", heavy
+
+    def test_import_time(self):
+        timings = []
+        for i in range(self.ntimes):
+            elapsed, env_unchanged, heavy = self.import_pycblosc()
+            timings.append(elapsed)
+            self.assertTrue(env_unchanged)
+            self.assertEqual(heavy, "")
+        best = min(timings)
+        self.assertLess(best, 0.5, "import pycblosc: best of %d: %.1f ms"
+                        % (self.ntimes, best * 1e3))
+
+    def test_version(self):
+        import pycblosc as cblosc
+        self.assertTrue(cblosc.__version__)
+        self.assertGreaterEqual(cblosc.blosc_version, cblosc.min_blosc_version)
+
+
+if __name__ == '__main__':
+    unittest.main()
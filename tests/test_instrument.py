@@ -0,0 +1,94 @@
+import array
+import unittest
+import pycblosc as cblosc
+from pycblosc import instrument
+
+
+class TestInstrument(unittest.TestCase):
+    arr = array.array('i', range(100000))
+    nbytes = len(arr) * arr.itemsize
+
+    def setUp(self):
+        instrument.reset()
+        instrument.enable()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_counters(self):
+        codec = cblosc.Codec(compressor="lz4")
+        cbuf = cblosc.compress_bytes(self.arr, codec=codec)
+        cblosc.decompress_bytes(cbuf)
+        out = bytearray(40)
+        cblosc.getitem(cbuf, 10, 10, out)
+        stats = instrument.stats()
+        compress = stats["compress"]["lz4"]
+        self.assertEqual(compress["calls"], 1)
+        self.assertEqual(compress["bytes_in"], self.nbytes)
+        self.assertEqual(compress["bytes_out"], len(cbuf))
+        self.assertAlmostEqual(compress["ratio"], self.nbytes / float(len(cbuf)))
+        self.assertEqual(sum(compress["histogram"]), 1)
+        self.assertEqual(len(compress["histogram"]), len(instrument.HISTOGRAM_BOUNDS_US))
+        decompress = stats["decompress"]["lz4"]
+        self.assertEqual(decompress["bytes_in"], len(cbuf))
+        self.assertEqual(decompress["bytes_out"], self.nbytes)
+        self.assertEqual(stats["getitem"]["lz4"]["bytes_out"], 40)
+
+    def test_same_keys(self):
+        # lz4hc chunks are recorded as lz4 ones, both ways
+        cbuf = cblosc.compress_bytes(self.arr, codec=cblosc.Codec(compressor="lz4hc"))
+        cblosc.decompress_bytes(cbuf)
+        stats = instrument.stats()
+        self.assertEqual(list(stats["compress"]), ["lz4"])
+        self.assertEqual(list(stats["decompress"]), ["lz4"])
+
+    def test_global_compressor(self):
+        cblosc.set_compressor("blosclz")
+        dest = bytearray(self.nbytes + cblosc.MAX_OVERHEAD)
+        cblosc.compress(5, cblosc.SHUFFLE, 4, self.nbytes, self.arr, dest, len(dest))
+        self.assertEqual(instrument.stats()["compress"]["blosclz"]["calls"], 1)
+
+    def test_errors(self):
+        cbuf = cblosc.compress_bytes(self.arr)
+        small = bytearray(10)
+        cblosc.decompress(cbuf, small, len(small))
+        stats = instrument.stats()["decompress"]["blosclz"]
+        self.assertEqual(stats["errors_zero"] + stats["errors_negative"], 1)
+        self.assertEqual(stats["bytes_out"], 0)
+
+    def test_corrupt_header(self):
+        # An unknown compressor code in the header
+        cbuf = bytes([2, 1, 0xe0, 4]) + (100).to_bytes(4, 'little') * 3 + bytes(100)
+        self.assertLess(cblosc.decompress(cbuf, bytearray(100), 100), 0)
+        self.assertLess(cblosc.getitem(cbuf, 0, 1, bytearray(4)), 0)
+        stats = instrument.stats()
+        self.assertEqual(stats["decompress"]["unknown"]["errors_negative"], 1)
+        self.assertEqual(stats["getitem"]["unknown"]["errors_negative"], 1)
+
+    def test_callbacks(self):
+        events = []
+
+        def callback(*args):
+            events.append(args)
+        instrument.add_callback(callback)
+        try:
+            cblosc.compress_bytes(self.arr, codec=cblosc.Codec(compressor="zlib"))
+        finally:
+            instrument.remove_callback(callback)
+        cblosc.compress_bytes(self.arr)
+        self.assertEqual(len(events), 1)
+        op, codec, nbytes_in, result, elapsed = events[0]
+        self.assertEqual((op, codec, nbytes_in), ("compress", "zlib", self.nbytes))
+        self.assertGreater(result, 0)
+        self.assertGreaterEqual(elapsed, 0)
+
+    def test_disabled(self):
+        instrument.disable()
+        self.assertFalse(instrument.is_enabled())
+        cblosc.compress_bytes(self.arr)
+        self.assertEqual(instrument.stats(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import pycblosc as cblosc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not available")
+class TestPackArray(unittest.TestCase):
+
+    def check_roundtrip(self, a, **kwargs):
+        packed = cblosc.pack_array(a, **kwargs)
+        b = cblosc.unpack_array(packed)
+        self.assertEqual(b.dtype, a.dtype)
+        self.assertEqual(b.shape, a.shape)
+        np.testing.assert_array_equal(a, b)
+        return packed, b
+
+    def test_dtypes(self):
+        self.check_roundtrip(np.arange(100000, dtype=np.int32))
+        self.check_roundtrip(np.linspace(0, 1, 10000).reshape(100, 100))
+        self.check_roundtrip(np.array(3.5))
+        self.check_roundtrip(np.zeros((0, 3), dtype=np.int16))
+        self.check_roundtrip(np.arange(1000, dtype='>u8'))
+        self.check_roundtrip(np.arange(20).astype('M8[s]'))
+        rec = np.zeros(50, dtype=[('x', 'f4'), ('y', 'i8', (2,))])
+        rec['x'] = np.arange(50)
+        self.check_roundtrip(rec)
+
+    def test_typesize(self):
+        a = np.arange(100000, dtype=np.float64)
+        packed = cblosc.pack_array(a)
+        offset = cblosc.ndarray._unpack_header(memoryview(packed))[3]
+        self.assertEqual(offset % 16, 0)
+        self.assertEqual(cblosc.cbuffer_metainfo(packed[offset:])[0], 8)
+        self.assertLess(len(packed), a.nbytes)
+
+    def test_order(self):
+        a = np.asfortranarray(np.arange(6000, dtype=np.int32).reshape(60, 100))
+        before = cblosc.array_copy_stats()
+        packed, b = self.check_roundtrip(a)
+        self.assertTrue(b.flags.f_contiguous)
+        self.assertEqual(cblosc.array_copy_stats(), before)
+
+    def test_non_contiguous(self):
+        a = np.arange(10000, dtype=np.int64).reshape(100, 100)[::2, 1::3]
+        before = cblosc.array_copy_stats()
+        self.check_roundtrip(a)
+        after = cblosc.array_copy_stats()
+        self.assertEqual(after["count"], before["count"] + 1)
+        self.assertEqual(after["nbytes"], before["nbytes"] + a.nbytes)
+
+    def test_aligned(self):
+        packed = cblosc.pack_array(np.arange(1001, dtype=np.int8))
+        b = cblosc.unpack_array(packed)
+        self.assertEqual(b.ctypes.data % cblosc.ndarray.ALIGNMENT, 0)
+
+    def test_out(self):
+        a = np.arange(5000, dtype=np.float32).reshape(50, 100)
+        packed = cblosc.pack_array(a)
+        out = np.empty_like(a)
+        self.assertIs(cblosc.unpack_array(bytes(packed), out=out), out)
+        np.testing.assert_array_equal(a, out)
+        self.assertRaises(ValueError, cblosc.unpack_array, packed, np.empty((100, 50), 'f4'))
+        self.assertRaises(ValueError, cblosc.unpack_array, packed, np.empty((50, 100), 'f8'))
+        self.assertRaises(ValueError, cblosc.unpack_array, packed,
+                          np.empty((50, 100), 'f4', order='F'))
+        readonly = np.empty_like(a)
+        readonly.flags.writeable = False
+        self.assertRaises(ValueError, cblosc.unpack_array, packed, readonly)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, cblosc.pack_array, np.array([object()]))
+        self.assertRaises(ValueError, cblosc.unpack_array, b"garbage" * 10)
+        packed = cblosc.pack_array(np.arange(100))
+        self.assertRaises(ValueError, cblosc.unpack_array, packed[:40])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import random
+import time
+import unittest
+import pycblosc as cblosc
+
+
+class TestMessagePacker(unittest.TestCase):
+
+    def records(self, n, seed=0):
+        rnd = random.Random(seed)
+        return [b'{"id": %d, "method": "get", "args": [%d, "%s"]}'
+                % (i, rnd.randrange(1000), b"x" * rnd.randrange(200)) for i in range(n)]
+
+    def test_roundtrip(self):
+        packer = cblosc.MessagePacker(max_bytes=10**9)
+        records = self.records(500)
+        for record in records:
+            self.assertIsNone(packer.add(record))
+        self.assertEqual(len(packer), 500)
+        self.assertEqual(packer.pending_bytes, sum(len(r) for r in records))
+        batch = packer.flush()
+        self.assertEqual(len(packer), 0)
+        self.assertIsNone(packer.flush())
+        # Much better than compressing the records one by one
+        single = sum(len(cblosc.compress_bytes(r)) for r in records)
+        self.assertLess(len(batch) * 4, single)
+        views = packer.unpack(batch)
+        self.assertTrue(all(isinstance(view, memoryview) for view in views))
+        self.assertEqual([bytes(view) for view in views], records)
+
+    def test_getitem(self):
+        packer = cblosc.MessagePacker(max_bytes=10**9, codec=cblosc.Codec(blocksize=4096))
+        records = self.records(1000) + [b""]
+        for record in records:
+            packer.add(record)
+        batch = packer.flush()
+        for i in (0, 1, 499, 998, 999, 1000, -2):
+            self.assertEqual(packer.getitem(batch, i), records[i])
+        self.assertRaises(IndexError, packer.getitem, batch, 1001)
+
+    def test_thresholds(self):
+        packer = cblosc.MessagePacker(max_bytes=1000)
+        batches = [packer.add(record) for record in self.records(100)]
+        batches = [batch for batch in batches if batch is not None]
+        self.assertGreater(len(batches), 3)
+        total = sum(len(packer.unpack(batch)) for batch in batches) + len(packer)
+        self.assertEqual(total, 100)
+
+        packer = cblosc.MessagePacker(max_delay=0.01)
+        self.assertIsNone(packer.add(b"first"))
+        self.assertIsNone(packer.poll())
+        time.sleep(0.02)
+        batch = packer.poll()
+        self.assertEqual([bytes(v) for v in packer.unpack(batch)], [b"first"])
+
+    def test_invalid(self):
+        packer = cblosc.MessagePacker()
+        cbuf = cblosc.compress_bytes(b"\xff" * 100)
+        self.assertRaises(ValueError, packer.unpack, cbuf)
+        self.assertRaises(ValueError, packer.getitem, cbuf, 0)
+
+    def test_failed_flush(self):
+        class FailingCodec(object):
+            def compress(self, typesize, nbytes, src, dest, destsize):
+                return -1
+
+        packer = cblosc.MessagePacker(max_bytes=10**9)
+        records = self.records(10)
+        for record in records:
+            packer.add(record)
+        codec, packer.codec = packer.codec, FailingCodec()
+        self.assertRaises(RuntimeError, packer.flush)
+        # The pending records are left untouched
+        self.assertEqual(len(packer), 10)
+        self.assertEqual(packer.pending_bytes, sum(len(r) for r in records))
+        packer.codec = codec
+        self.assertEqual([bytes(v) for v in packer.unpack(packer.flush())], records)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import array
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import pycblosc as cblosc
+
+
+class TestParallelCompress(unittest.TestCase):
+    N = 300 * 1000
+    arr = array.array('d', (i * 0.5 for i in range(N)))
+    data = arr.tobytes()
+    chunksize = 256 * 1024
+
+    def test_container(self):
+        container = cblosc.parallel_compress(self.arr, nworkers=2, chunksize=self.chunksize)
+        self.assertLess(len(container), len(self.data))
+        with cblosc.BloscFile(io.BytesIO(container)) as f:
+            self.assertEqual(f.nchunks, -(-len(self.data) // self.chunksize))
+            self.assertEqual(f.read(), self.data)
+            f.seek(1000003)
+            self.assertEqual(f.read(100), self.data[1000003:1000103])
+        with cblosc.BloscFile(io.BytesIO(container)) as f:
+            f.read(16)
+        cchunk = container[:cblosc.cbuffer_sizes(container)[1]]
+        self.assertEqual(cblosc.cbuffer_metainfo(cchunk)[0], 8)
+
+    def test_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "data.blosc")
+            written = cblosc.parallel_compress(self.arr, nworkers=3, chunksize=self.chunksize,
+                                               compressor="lz4", file=path)
+            self.assertEqual(written, os.path.getsize(path))
+            with cblosc.MappedBloscFile(path) as f:
+                out = array.array('d', [0]) * self.N
+                f.read_into(0, out)
+                self.assertEqual(out, self.arr)
+                with f.chunk(0) as cchunk:
+                    self.assertEqual(cblosc.cbuffer_complib(cchunk), b"LZ4")
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_serial_and_empty(self):
+        container = cblosc.parallel_compress(self.arr, nworkers=1, chunksize=self.chunksize)
+        with cblosc.BloscFile(io.BytesIO(container)) as f:
+            self.assertEqual(f.read(), self.data)
+        container = cblosc.parallel_compress(b"", nworkers=2)
+        with cblosc.BloscFile(io.BytesIO(container)) as f:
+            self.assertEqual(f.nchunks, 0)
+            self.assertEqual(f.read(), b"")
+
+    def test_invalid_chunksize(self):
+        for chunksize in (0, -1024):
+            self.assertRaises(ValueError, cblosc.parallel_compress, self.arr,
+                              nworkers=1, chunksize=chunksize)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import array
+import unittest
+import pycblosc as cblosc
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def test_size_class(self):
+        pool = cblosc.BufferPool(min_size=4096)
+        self.assertEqual(pool.size_class(1), 4096)
+        self.assertEqual(pool.size_class(4096), 4096)
+        self.assertEqual(pool.size_class(4096 + 16), 5120)
+        self.assertEqual(pool.size_class(8192), 8192)
+        for n in (5000, 12345, 1000000):
+            self.assertGreaterEqual(pool.size_class(n), n)
+            self.assertLess(pool.size_class(n), n * 1.25 + 1)
+
+    def test_reuse(self):
+        pool = cblosc.BufferPool()
+        buf = pool.acquire(10000)
+        pool.release(buf)
+        self.assertIs(pool.acquire(9000), buf)
+        self.assertEqual(pool.stats()["hits"], 1)
+        self.assertEqual(pool.stats()["misses"], 1)
+        self.assertIsNot(pool.acquire(9000), buf)
+        self.assertEqual(pool.misses, 2)
+
+    def test_eviction(self):
+        pool = cblosc.BufferPool(max_bytes=3 * 4096)
+        bufs = [pool.acquire(4096) for i in range(4)]
+        for buf in bufs:
+            pool.release(buf)
+        self.assertEqual(pool.evictions, 1)
+        self.assertEqual(pool.nbytes, 3 * 4096)
+        # The oldest one has been evicted
+        reused = [pool.acquire(4096) for i in range(3)]
+        self.assertEqual(set(map(id, reused)), set(map(id, bufs[1:])))
+
+    def test_foreign_buffer(self):
+        pool = cblosc.BufferPool()
+        self.assertRaises(ValueError, pool.release, bytearray(100))
+
+    def test_helpers(self):
+        pool = cblosc.BufferPool()
+        arr = array.array('i', range(100000))
+        for i in range(3):
+            cview = cblosc.compress_bytes(arr, pool=pool)
+            view = cblosc.decompress_bytes(cview, pool=pool)
+            self.assertEqual(view, arr.tobytes())
+            pool.release(cview)
+            pool.release(view)
+        self.assertEqual(pool.misses, 2)
+        self.assertEqual(pool.hits, 4)
+
+    def test_helpers_errors(self):
+        class BrokenCodec(object):
+            def compress(self, *args):
+                raise ValueError("broken")
+
+            def decompress(self, *args):
+                raise ValueError("broken")
+
+        pool = cblosc.BufferPool()
+        cbuf = cblosc.compress_bytes(b"x" * 1000)
+        for i in range(3):
+            self.assertRaises(ValueError, cblosc.compress_bytes, b"x" * 1000,
+                              codec=BrokenCodec(), pool=pool)
+            self.assertRaises(ValueError, cblosc.decompress_bytes, cbuf,
+                              codec=BrokenCodec(), pool=pool)
+        # The buffer went back to the pool every time
+        self.assertEqual(pool.stats()["buffers"], 1)
+        self.assertEqual(pool.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
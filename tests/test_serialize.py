@@ -0,0 +1,65 @@
+import array
+import pickle
+import unittest
+import pycblosc as cblosc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestSerialize(unittest.TestCase):
+
+    def test_plain_objects(self):
+        obj = {"a": [1, 2.5, "three"], "b": (None, True), "c": b"bytes" * 1000}
+        data = cblosc.dumps(obj)
+        self.assertEqual(data[:4], b"BLPK")
+        self.assertEqual(cblosc.loads(data), obj)
+        self.assertEqual(cblosc.loads(bytes(data)), obj)
+
+    def test_pickle_buffers(self):
+        buf = bytearray(array.array('d', range(100000)).tobytes())
+        data = cblosc.dumps([pickle.PickleBuffer(buf), pickle.PickleBuffer(b"")])
+        self.assertLess(len(data), len(buf) / 2)
+        loaded = cblosc.loads(data)
+        # Buffers come back as the bytearrays they were decompressed into
+        self.assertEqual(loaded, [buf, bytearray()])
+        self.assertIsInstance(loaded[0], bytearray)
+
+    def test_invalid(self):
+        data = cblosc.dumps({"x": pickle.PickleBuffer(bytearray(1000))})
+        self.assertRaises(ValueError, cblosc.loads, data[:6])
+        self.assertRaises(ValueError, cblosc.loads, b"XXXX" + data[4:])
+        self.assertRaises(ValueError, cblosc.loads, data[:-1])
+        self.assertRaises(ValueError, cblosc.loads, data + b"\0")
+
+    @unittest.skipIf(np is None, "NumPy is not available")
+    def test_arrays(self):
+        a = np.arange(1000000, dtype=np.int64).reshape(1000, 1000)
+        obj = {"a": a, "f": np.asfortranarray(a[:10]), "small": np.arange(3),
+               "rec": np.zeros(100, dtype=[('x', 'f4'), ('y', 'i8', (3,))])}
+        data = cblosc.dumps(obj)
+        self.assertLess(len(data), a.nbytes / 20)
+        loaded = cblosc.loads(data)
+        for key, value in obj.items():
+            np.testing.assert_array_equal(loaded[key], value)
+            self.assertEqual(loaded[key].dtype, value.dtype)
+        self.assertTrue(loaded["f"].flags.f_contiguous)
+        # The array uses the decompressed buffer as its memory
+        self.assertTrue(loaded["a"].flags.writeable)
+        base = loaded["a"]
+        while isinstance(base, np.ndarray):
+            base = base.base
+        self.assertIsInstance(base.obj, bytearray)
+
+    @unittest.skipIf(np is None, "NumPy is not available")
+    def test_typesize(self):
+        data = cblosc.dumps(np.arange(1000, dtype=np.int32))
+        offset = cblosc.serialize._HEADER.size
+        offset += cblosc.cbuffer_sizes(data[offset:])[1]
+        self.assertEqual(cblosc.cbuffer_metainfo(data[offset:])[0], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
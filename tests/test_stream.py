@@ -0,0 +1,144 @@
+import array
+import io
+import threading
+import time
+import unittest
+import pycblosc as cblosc
+
+
+class Unbuffered(object):
+    """A file-like object with only `read()`, returning short reads."""
+
+    def __init__(self, data, step=1000):
+        self.data = data
+        self.pos = 0
+        self.step = step
+
+    def read(self, n):
+        n = min(n, self.step)
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += len(chunk)
+        return chunk
+
+
+class Failing(object):
+
+    def write(self, data):
+        raise OSError("disk full")
+
+
+class Blocking(object):
+    """A file-like object whose reads block after the first one."""
+
+    def __init__(self, data):
+        self.data = data
+        self.unblock = threading.Event()
+
+    def read(self, n):
+        data, self.data = self.data, b""
+        if not data:
+            self.unblock.wait()
+        return data
+
+
+class TestStream(unittest.TestCase):
+    data = array.array('i', range(1000000)).tobytes()
+
+    def roundtrip(self, src, **kwargs):
+        cdest = io.BytesIO()
+        cstats = cblosc.compress_stream(src, cdest, **kwargs)
+        cdata = cdest.getvalue()
+        dest = io.BytesIO()
+        dstats = cblosc.decompress_stream(io.BytesIO(cdata), dest)
+        return cdata, dest.getvalue(), cstats, dstats
+
+    def test_file(self):
+        cdata, data, cstats, dstats = self.roundtrip(io.BytesIO(self.data),
+                                                     chunksize=100000, typesize=4)
+        self.assertEqual(data, self.data)
+        self.assertLess(len(cdata), len(self.data) / 10)
+        self.assertEqual(cstats["stages"]["read"]["items"], 40)
+        self.assertEqual(cstats["stages"]["read"]["nbytes"], len(self.data))
+        self.assertEqual(cstats["stages"]["write"]["nbytes"], len(cdata))
+        self.assertEqual(dstats["stages"]["write"]["nbytes"], len(self.data))
+        self.assertEqual(cstats["queues"]["read"]["maxsize"], 2)
+        self.assertLessEqual(cstats["queues"]["read"]["max_depth"], 2)
+        for stats in (cstats, dstats):
+            for stage in stats["stages"].values():
+                self.assertGreaterEqual(stage["busy"], 0)
+                self.assertGreaterEqual(stage["wait"], 0)
+        # The chunks are plain blosc frames, with the given typesize
+        self.assertEqual(cblosc.cbuffer_sizes(cdata)[0], 100000)
+        self.assertEqual(cblosc.cbuffer_metainfo(cdata)[0], 4)
+
+    def test_iterables(self):
+        arrays = [array.array('d', range(i, i + 10000)) for i in range(5)]
+        cdest = io.BytesIO()
+        cblosc.compress_stream(iter(arrays), cdest, chunksize=30000)
+        cdata = cdest.getvalue()
+        self.assertEqual(cblosc.cbuffer_metainfo(cdata)[0], 8)
+        dest = io.BytesIO()
+        cblosc.decompress_stream([cdata], dest)
+        self.assertEqual(dest.getvalue(), b"".join(a.tobytes() for a in arrays))
+
+    def test_short_reads(self):
+        cdata, data, _, _ = self.roundtrip(Unbuffered(self.data), chunksize=65536,
+                                           codec=cblosc.Codec(compressor="lz4"))
+        self.assertEqual(data, self.data)
+        dest = io.BytesIO()
+        cblosc.decompress_stream(Unbuffered(cdata, 100), dest)
+        self.assertEqual(dest.getvalue(), self.data)
+
+    def test_empty(self):
+        cdata, data, cstats, _ = self.roundtrip(io.BytesIO())
+        self.assertEqual((cdata, data), (b"", b""))
+        self.assertEqual(cstats["queues"]["write"]["mean_depth"], 0)
+
+    def test_errors(self):
+        self.assertRaises(OSError, cblosc.compress_stream, io.BytesIO(self.data),
+                          Failing(), chunksize=10000)
+        cdest = io.BytesIO()
+        cblosc.compress_stream(io.BytesIO(self.data), cdest, chunksize=100000)
+        cdata = cdest.getvalue()
+        self.assertRaises(ValueError, cblosc.decompress_stream,
+                          io.BytesIO(cdata[:-1]), io.BytesIO())
+        self.assertRaises(ValueError, cblosc.decompress_stream,
+                          io.BytesIO(cdata[:10]), io.BytesIO())
+        self.assertRaises(ValueError, cblosc.decompress_stream, [cdata[:-1]], io.BytesIO())
+        self.assertRaises(ValueError, cblosc.decompress_stream, io.BytesIO(cdata),
+                          io.BytesIO(), max_frame_size=1000)
+        self.assertRaises(ValueError, cblosc.compress_stream, io.BytesIO(), io.BytesIO(),
+                          chunksize=0)
+
+    def test_blocked_reader(self):
+        # A failed write does not wait for a read that never returns
+        src = Blocking(self.data[:10000])
+        try:
+            t0 = time.perf_counter()
+            self.assertRaises(OSError, cblosc.compress_stream, src, Failing(),
+                              chunksize=10000)
+            self.assertLess(time.perf_counter() - t0, 5)
+        finally:
+            src.unblock.set()
+
+    def test_framed_reader_compatible(self):
+        import asyncio
+
+        cdest = io.BytesIO()
+        cblosc.compress_stream(io.BytesIO(self.data), cdest, chunksize=300000)
+
+        async def main():
+            reader = asyncio.StreamReader()
+            reader.feed_data(cdest.getvalue())
+            reader.feed_eof()
+            return [frame async for frame in cblosc.FramedReader(reader)]
+        loop = asyncio.new_event_loop()
+        try:
+            frames = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        self.assertEqual(b"".join(frames), self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import array
+import os
+import shutil
+import tempfile
+import unittest
+import pycblosc as cblosc
+
+
+class TestSuperChunk(unittest.TestCase):
+
+    def make(self, sizes, typesize=None):
+        schunk = cblosc.SuperChunk(typesize=typesize)
+        pieces = []
+        start = 0
+        for size in sizes:
+            piece = array.array('i', range(start, start + size))
+            self.assertEqual(schunk.append(piece), len(pieces))
+            pieces.append(piece.tobytes())
+            start += size
+        return schunk, pieces
+
+    def test_append(self):
+        schunk, pieces = self.make([1000, 5000, 1, 20000])
+        data = b"".join(pieces)
+        self.assertEqual(schunk.nchunks, 4)
+        self.assertEqual(len(schunk), len(data))
+        self.assertEqual(list(schunk.offsets), [0, 4000, 24000, 24004, 104004])
+        self.assertLess(schunk.cbytes, len(data))
+        self.assertEqual(schunk.chunk_header(1).typesize, 4)
+        self.assertEqual(schunk.decompress_chunk(3), pieces[3])
+        self.assertEqual(schunk.decompress_chunk(-1), pieces[3])
+
+    def test_getitem(self):
+        schunk, pieces = self.make([1000, 5000, 1, 20000])
+        data = b"".join(pieces)
+        for start, stop in [(0, 10), (3999, 4001), (0, None), (100, 24010), (-50, None),
+                            (24000, 24004), (200000, None)]:
+            self.assertEqual(schunk[start:stop], data[start:stop])
+        self.assertEqual(schunk[4001], data[4001])
+        self.assertEqual(schunk[-1], data[-1])
+        self.assertRaises(IndexError, schunk.__getitem__, len(data))
+        self.assertRaises(ValueError, schunk.__getitem__, slice(0, 10, 2))
+        out = bytearray(10)
+        self.assertEqual(schunk.read_into(3998, out), 10)
+        self.assertEqual(out, data[3998:4008])
+        self.assertRaises(ValueError, schunk.read_into, -1, out)
+
+    def test_update_delete(self):
+        schunk, pieces = self.make([1000, 2000, 3000])
+        schunk.update(1, b"abc" * 10)
+        pieces[1] = b"abc" * 10
+        self.assertEqual(schunk[:], b"".join(pieces))
+        schunk.delete(0)
+        del pieces[0]
+        self.assertEqual(schunk.nchunks, 2)
+        self.assertEqual(list(schunk.offsets), [0, 30, 12030])
+        self.assertEqual(schunk[:], b"".join(pieces))
+        schunk.append(b"xyz")
+        self.assertEqual(schunk[-3:], b"xyz")
+        self.assertRaises(IndexError, schunk.delete, 3)
+        self.assertRaises(IndexError, schunk.update, -4, b"")
+
+    def test_serialize(self):
+        schunk, pieces = self.make([1000, 5000, 1, 20000])
+        buf = schunk.to_buffer()
+        other = cblosc.SuperChunk.from_buffer(buf)
+        self.assertEqual(other.nchunks, 4)
+        self.assertEqual(list(other.offsets), list(schunk.offsets))
+        self.assertEqual(other[:], b"".join(pieces))
+        empty = cblosc.SuperChunk.from_buffer(cblosc.SuperChunk().to_buffer())
+        self.assertEqual((empty.nchunks, len(empty)), (0, 0))
+        self.assertRaises(ValueError, cblosc.SuperChunk.from_buffer, buf[:-1])
+        self.assertRaises(ValueError, cblosc.SuperChunk.from_buffer, buf[100:])
+
+    def test_bloscfile_compat(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "data.blosc")
+            # Variable chunk sizes cannot be read by BloscFile
+            schunk, pieces = self.make([1000, 5000, 1])
+            with open(path, "wb") as f:
+                f.write(schunk.to_buffer())
+            self.assertRaises(ValueError, cblosc.BloscFile, path)
+            # Fixed-size chunks can
+            schunk, pieces = self.make([1000, 1000, 10])
+            with open(path, "wb") as f:
+                f.write(schunk.to_buffer())
+            with cblosc.BloscFile(path) as f:
+                self.assertEqual(f.read(), b"".join(pieces))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
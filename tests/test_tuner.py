@@ -0,0 +1,49 @@
+import array
+import random
+import unittest
+import pycblosc as cblosc
+
+
+class TestTune(unittest.TestCase):
+    arr = array.array('i', range(200 * 1000))
+
+    def setUp(self):
+        cblosc.clear_tune_cache()
+
+    def test_tune(self):
+        for goal in ("speed", "ratio", "balanced"):
+            result = cblosc.tune(self.arr, goal=goal, budget_ms=50)
+            self.assertIn(result.compressor, cblosc.list_compressors().decode().split(","))
+            # For speed, storing the data uncompressed may win
+            self.assertGreater(result.ratio, 1 if goal != "speed" else 0.9)
+            self.assertGreater(result.cspeed, 0)
+            self.assertGreater(result.dspeed, 0)
+            codec = result.codec()
+            cbuf = cblosc.compress_bytes(self.arr, codec=codec)
+            self.assertEqual(cblosc.decompress_bytes(cbuf), self.arr.tobytes())
+
+    def test_ratio_goal(self):
+        # With enough budget, the best ratio beats the default settings
+        result = cblosc.tune(self.arr, goal="ratio", budget_ms=10000)
+        default = cblosc.compress_bytes(self.arr, codec=cblosc.Codec())
+        self.assertGreaterEqual(result.ratio, len(self.arr) * 4. / len(default))
+
+    def test_cache(self):
+        result = cblosc.tune(self.arr, budget_ms=20)
+        other = array.array('i', [random.randint(0, 100) for i in range(len(self.arr))])
+        self.assertIs(cblosc.tune(other, budget_ms=20), result)
+        self.assertIsNot(cblosc.tune(other, budget_ms=20, use_cache=False), result)
+        self.assertIsNot(cblosc.tune(self.arr[:1000], budget_ms=20), result)
+
+    def test_splitmode_restored(self):
+        cblosc.set_splitmode(cblosc.AUTO_SPLIT)
+        cblosc.tune(self.arr, budget_ms=20, use_cache=False)
+        self.assertEqual(cblosc.get_splitmode(), cblosc.AUTO_SPLIT)
+        cblosc.set_splitmode(cblosc.FORWARD_COMPAT_SPLIT)
+
+    def test_bad_goal(self):
+        self.assertRaises(ValueError, cblosc.tune, self.arr, goal="fast")
+
+
+if __name__ == '__main__':
+    unittest.main()